@@ -11,22 +11,55 @@ python analytics.py --input_dir ../_scrap/a_inputs/ --output_dir ../_scrap/a_out
 """
 
 import argparse
-import json
 import os
+import sys
 from datetime import datetime
 
-from atlassian_lib import update_atlassian_page
+from atlassian_lib import UPLOAD_WORKERS, update_atlassian_page
+from batch_scaling import BATCH_SCALING_NAME, build_batch_scalings
+from derived_metrics import add_derived_metric_sets
 from obs_plotting import plot_observables
-from os_lib import get_input_runs
-from summary_parsing import parse_run_dir, ParsedRun
-
+from os_lib import get_input_runs, get_input_sweeps, get_run_name
+from parse_cache import ParseCache
+from pipeline_profiling import PipelineProfiler
+from regression_detection import (
+    DEFAULT_BASELINE_WINDOW,
+    DEFAULT_REGRESSION_THRESHOLD,
+    DEFAULT_Z_THRESHOLD,
+    detect_regressions,
+    write_regression_report,
+)
+from results_archive import open_results_archive
+from results_table import ResultsTable
+from run_configurations import (
+    DEFAULT_SEGMENT_KEYS,
+    configurations_by_workload,
+    parse_segment_keys,
+    unsegmented_varying_metaparameters,
+)
+from saturation_sweep import (
+    CAPACITY_METRIC_NAME,
+    SweepCurve,
+    SweepCurveKeyType,
+    add_capacity_metric_sets,
+    build_sweep_curves,
+    parse_sweep_dirs,
+)
+from scaling_curves import write_scaling_report
+from scaling_plotting import plot_scaling_curves
+from steady_state import TRIM_AUTO, TrimBound, TrimSpec
+from summary_parsing import ParsedRun, get_parsing_fingerprint
+from sweep_plotting import plot_sweeps
+from thread_scaling import THREAD_SCALING_NAME, build_thread_scalings
+from timeline_plotting import plot_run_timelines
 
 PLOTTABLE_JSON_FILETITLE = "full_plottable_output.json"
-DATETIME_FORMAT = "%Y-%m-%d_%H_%M_%S"
-
-
-def date_to_string(dt: datetime) -> str:
-    return dt.strftime(DATETIME_FORMAT)
+PARSE_CACHE_FILETITLE = "parse_cache.json"
+PUBLISH_MANIFEST_FILETITLE = "atlassian_publish_manifest.json"
+REGRESSION_REPORT_FILETITLE = "regression_report.json"
+PIPELINE_TIMINGS_FILETITLE = "pipeline_timings.json"
+PIPELINE_CPROFILE_FILETITLE = "pipeline_slowest_stage.prof"
+REGRESSION_EXIT_CODE = 3
 
 
 def main() -> None:
@@ -51,20 +84,283 @@ def main() -> None:
         action="store_true",
         help="Upload a summary page on Atlassian (requires access setup)",
     )
+    parser.add_argument(
+        "--rebuild_cache",
+        action="store_true",
+        help=(
+            "Ignore the existing parse cache and re-parse all run directories "
+            f"(the cache is '{PARSE_CACHE_FILETITLE}' in the output directory)"
+        ),
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of worker processes for parsing run directories and "
+            "rendering plots "
+            "(default: 1, i.e. serial; 0 means one per CPU)"
+        ),
+    )
+
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help=(
+            "Aggregate each metric CSV in a single streaming pass, in constant "
+            "memory (useful for very long runs). Results are unchanged"
+        ),
+    )
+
+    parser.add_argument(
+        "--no_plots",
+        action="store_true",
+        help=(
+            "JSON-only mode: write the plottable JSON and the reports, but no "
+            "plots (matplotlib is then not even imported)"
+        ),
+    )
+    parser.add_argument(
+        "--incremental_plots",
+        action="store_true",
+        help=(
+            "Only re-render plots whose data or settings changed since the "
+            "previous analysis in the same output directory"
+        ),
+    )
+    parser.add_argument(
+        "--upload_workers",
+        type=int,
+        default=UPLOAD_WORKERS,
+        help=(
+            "Max concurrent attachment uploads to Atlassian "
+            f"(default: {UPLOAD_WORKERS})"
+        ),
+    )
+
+    parser.add_argument(
+        "--archive",
+        type=str,
+        default=None,
+        help=(
+            "Path to a SQLite results archive: newly parsed runs are appended "
+            "to it and the analysis covers all archived runs"
+        ),
+    )
+    parser.add_argument(
+        "--archive_only",
+        action="store_true",
+        help="Work from the results archive alone, without reading input_dir",
+    )
+
+    parser.add_argument(
+        "--steady_state",
+        action="store_true",
+        help=(
+            "Within-run analysis: locate the steady state of each run in its "
+            "per-interval series and add steady-state observables (ss_*), "
+            "including the coefficient of variation of m1_rate"
+        ),
+    )
+    parser.add_argument(
+        "--trim_warmup",
+        type=str,
+        default=TRIM_AUTO,
+        help=(
+            "Warm-up to trim for the steady state: 'auto', a number of "
+            "intervals (e.g. '2') or of seconds (e.g. '90s') (default: 'auto')"
+        ),
+    )
+    parser.add_argument(
+        "--trim_cooldown",
+        type=str,
+        default=TRIM_AUTO,
+        help="Cool-down to trim for the steady state, as for --trim_warmup",
+    )
+    parser.add_argument(
+        "--timeline_plots",
+        action="store_true",
+        help=(
+            "Also render per-run timelines of the per-interval series, "
+            "showing the trimmed intervals (requires --steady_state)"
+        ),
+    )
+
+    parser.add_argument(
+        "--segment_by",
+        type=str,
+        default=",".join(DEFAULT_SEGMENT_KEYS),
+        help=(
+            "Comma-separated metaparameters defining the run configuration: "
+            "each configuration is plotted and checked for regressions as a "
+            "separate series ('' for a single series) "
+            f"(default: '{','.join(DEFAULT_SEGMENT_KEYS)}')"
+        ),
+    )
+
+    parser.add_argument(
+        "--regression_threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help=(
+            "Relative change (vs. the rolling baseline) beyond which a run is "
+            f"flagged as a regression (default: {DEFAULT_REGRESSION_THRESHOLD})"
+        ),
+    )
+    parser.add_argument(
+        "--regression_window",
+        type=int,
+        default=DEFAULT_BASELINE_WINDOW,
+        help=(
+            "Number of preceding runs forming the rolling baseline "
+            f"(default: {DEFAULT_BASELINE_WINDOW})"
+        ),
+    )
+    parser.add_argument(
+        "--regression_z_threshold",
+        type=float,
+        default=DEFAULT_Z_THRESHOLD,
+        help=(
+            "Minimum robust z-score (vs. the baseline spread) for a regression "
+            f"(default: {DEFAULT_Z_THRESHOLD})"
+        ),
+    )
+    parser.add_argument(
+        "--fail_on_regression",
+        action="store_true",
+        help=(
+            f"Exit with code {REGRESSION_EXIT_CODE} if the latest run of any "
+            "tracked series is flagged as a regression"
+        ),
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Measure wall time, CPU time, peak memory and item counts of each "
+            "stage of the analysis (and the time per file, figure and HTTP "
+            f"request) into '{PIPELINE_TIMINGS_FILETITLE}' in the output directory"
+        ),
+    )
+    parser.add_argument(
+        "--profile_cprofile",
+        action="store_true",
+        help=(
+            "With --profile, run each stage under cProfile and keep the profile "
+            f"of the slowest one as '{PIPELINE_CPROFILE_FILETITLE}' (this slows "
+            "the analysis down)"
+        ),
+    )
 
     args = parser.parse_args()
+    if args.archive_only and not args.archive:
+        parser.error("--archive_only requires --archive.")
+    if args.timeline_plots and not args.steady_state:
+        parser.error("--timeline_plots requires --steady_state.")
+    if args.no_plots and (args.atlassian or args.timeline_plots):
+        parser.error("--no_plots excludes --atlassian and --timeline_plots.")
+    if args.profile_cprofile and not args.profile:
+        parser.error("--profile_cprofile requires --profile.")
+    if args.upload_workers < 1:
+        parser.error("--upload_workers must be at least 1.")
+    trim_spec: TrimSpec | None = None
+    if args.steady_state:
+        try:
+            trim_spec = TrimSpec(
+                warmup=TrimBound.from_string(args.trim_warmup),
+                cooldown=TrimBound.from_string(args.trim_cooldown),
+            )
+        except ValueError as exc:
+            parser.error(str(exc))
+    num_workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    segment_keys = parse_segment_keys(args.segment_by)
 
     plottable_json_filename = os.path.join(args.output_dir, PLOTTABLE_JSON_FILETITLE)
+    parse_cache_filename = os.path.join(args.output_dir, PARSE_CACHE_FILETITLE)
+    regression_report_filename = os.path.join(
+        args.output_dir, REGRESSION_REPORT_FILETITLE
+    )
+
+    profiler = PipelineProfiler(enabled=args.profile, cprofile=args.profile_cprofile)
+    profiler.activate()
 
     print(f"Input directory: {args.input_dir}")
     print(f"Output plottable JSON: {plottable_json_filename}")
 
-    input_runs: dict[str, tuple[datetime, str]] = get_input_runs(args.input_dir)
+    parsed_runs: dict[tuple[datetime, str], ParsedRun]
+    if args.archive_only:
+        # no raw logs are read: the whole history comes from the archive
+        with profiler.stage("load_archive") as stage:
+            archive = open_results_archive(args.archive)
+            parsed_runs = archive.load_parsed_runs()
+            parsing_fingerprint = get_parsing_fingerprint(trim_spec)
+            num_stale = sum(
+                fingerprint != parsing_fingerprint
+                for fingerprint in archive.archived_fingerprints().values()
+            )
+            archive.close()
+            stage.count("runs", len(parsed_runs))
+            stage.count("stale_runs", num_stale)
+        print(f"Loaded {len(parsed_runs)} runs from the archive.")
+        if num_stale:
+            print(
+                f"    ({num_stale} of them parsed with different parsing settings: "
+                "run with the raw logs to re-ingest them.)"
+            )
+    else:
+        with profiler.stage("scan_input") as stage:
+            input_runs: dict[str, tuple[datetime, str]] = get_input_runs(args.input_dir)
+            stage.count("run_dirs", len(input_runs))
+
+        with profiler.stage("parse_runs") as stage:
+            parse_cache = ParseCache(
+                parse_cache_filename,
+                rebuild=args.rebuild_cache,
+                trim_spec=trim_spec,
+            )
+            parsed_dir_map = parse_cache.get_parsed_runs(
+                list(input_runs.keys()),
+                workers=num_workers,
+                streaming=args.streaming,
+            )
+            parsed_runs = {
+                dir_parsed_pair: parsed_dir_map[full_dir_name]
+                for full_dir_name, dir_parsed_pair in input_runs.items()
+            }
+            parse_cache.prune({get_run_name(dir_name) for dir_name in input_runs})
+            parse_cache.save()
+            stage.count("run_dirs", len(input_runs))
+            stage.count("cache_hits", parse_cache.hits)
+            stage.count("cache_misses", parse_cache.misses)
+        print(parse_cache.report())
 
-    parsed_runs: dict[tuple[datetime, str], ParsedRun] = {
-        dir_parsed_pair: parse_run_dir(full_dir_name)
-        for full_dir_name, dir_parsed_pair in input_runs.items()
-    }
+        if args.archive:
+            # ingest new runs, then work on the full archived history
+            with profiler.stage("archive") as stage:
+                archive = open_results_archive(args.archive)
+                # runs parsed with other settings than the current ones are
+                # replaced by their fresh parse
+                num_added, num_replaced = archive.ingest(
+                    {
+                        get_run_name(full_dir_name): (
+                            dir_parsed_pair,
+                            parsed_dir_map[full_dir_name],
+                        )
+                        for full_dir_name, dir_parsed_pair in input_runs.items()
+                    },
+                    parse_cache.parsing_fingerprint,
+                )
+                parsed_runs = archive.load_parsed_runs()
+                archive.close()
+                stage.count("ingested_runs", num_added)
+                stage.count("replaced_runs", num_replaced)
+                stage.count("runs", len(parsed_runs))
+            print(
+                f"Ingested {num_added} new runs into the archive, replaced "
+                f"{num_replaced} re-parsed ones (now {len(parsed_runs)} runs)."
+            )
 
     # sanity checks: I - do workloads from a dir match the workload tagging the dir?
     for (dir_d, wl0), prun in parsed_runs.items():
@@ -77,71 +373,154 @@ def main() -> None:
                 )
                 raise ValueError(msg)
 
-    # sanity checks: II - are metaparameters constant across runs?
-    # TODO
+    # sanity checks: II - are metaparameters constant across runs? Changes in
+    # the segmentation metaparameters start new series, others are reported
+    for wl0, config_counts in configurations_by_workload(
+        parsed_runs, segment_keys
+    ).items():
+        if len(config_counts) > 1:
+            print(f"Workload '{wl0}' ran in {len(config_counts)} configurations:")
+            for configuration, num_runs in config_counts.items():
+                print(f"    * {configuration}: {num_runs} runs")
+    for wl0, varying_keys in unsegmented_varying_metaparameters(
+        parsed_runs, segment_keys
+    ).items():
+        print(
+            f"** Workload '{wl0}': metaparameters {', '.join(varying_keys)} "
+            "changed across runs, but do not segment the series "
+            "(see --segment_by)."
+        )
 
     # sanity checks: III - are units consistent for a given observable?
     # TODO
 
-    # regroup for plottable curves. This is a map:
-    #   workload->scenario->activity->name->observable->[date->value, unit]
-    plottable_tree: dict[
-        str,
-        dict[str, dict[str, dict[str, dict[str, tuple[dict[datetime, float], str]]]]],
-    ] = {}
-    for (_date, _), _prun in parsed_runs.items():
-        for _mset in _prun.metric_sets:
-            _workload = _mset.workload
-            _scenario = _mset.scenario
-            _activity = _mset.activity
-            _name = _mset.name
-            for _observable, (_value, _unit) in _mset.metrics.items():
-                # add room to the tree if necessary
-                if _workload not in plottable_tree:
-                    plottable_tree[_workload] = {}
-                if _scenario not in plottable_tree[_workload]:
-                    plottable_tree[_workload][_scenario] = {}
-                if _activity not in plottable_tree[_workload][_scenario]:
-                    plottable_tree[_workload][_scenario][_activity] = {}
-                if _name not in plottable_tree[_workload][_scenario][_activity]:
-                    plottable_tree[_workload][_scenario][_activity][_name] = {}
-                if _name not in plottable_tree[_workload][_scenario][_activity]:
-                    plottable_tree[_workload][_scenario][_activity][_name] = {}
-                if (
-                    _observable
-                    not in plottable_tree[_workload][_scenario][_activity][_name]
-                ):
-                    plottable_tree[_workload][_scenario][_activity][_name][
-                        _observable
-                    ] = ({}, _unit)
-                # add data point
-                plottable_tree[_workload][_scenario][_activity][_name][_observable][0][
-                    _date
-                ] = _value
-    # dump as JSON (requires taming datetime keys into strings)
-    dumpable_tree = {
-        _wl: {
-            _sc: {
-                _ac: {
-                    _na: {
-                        _ob: (
-                            {date_to_string(_da): _va for _da, _va in v_ob.items()},
-                            _un,
-                        )
-                        for _ob, (v_ob, _un) in v_na.items()
-                    }
-                    for _na, v_na in v_ac.items()
-                }
-                for _ac, v_ac in v_sc.items()
+    # derived metric sets: error rate and goodput, from all vs. successful ops
+    with profiler.stage("derived_metrics") as stage:
+        parsed_runs = add_derived_metric_sets(parsed_runs)
+        stage.count("runs", len(parsed_runs))
+
+    # saturation sweeps (from the raw logs only): capacity metrics at the knee
+    # of each sweep become series tracked across runs, like the others
+    sweep_curves: dict[str, dict[SweepCurveKeyType, SweepCurve]] = {}
+    input_sweeps: dict[str, tuple[datetime, str]] = {}
+    if not args.archive_only:
+        with profiler.stage("sweeps") as stage:
+            input_sweeps = get_input_sweeps(args.input_dir)
+            parsed_sweeps = parse_sweep_dirs(
+                list(input_sweeps.keys()),
+                workers=num_workers,
+                streaming=args.streaming,
+            )
+            sweep_curves = {
+                sweep_dir: build_sweep_curves(parsed_steps)
+                for sweep_dir, parsed_steps in parsed_sweeps.items()
             }
-            for _sc, v_sc in v_wl.items()
-        }
-        for _wl, v_wl in plottable_tree.items()
-    }
-    with open(plottable_json_filename, "w") as o_file:
-        json.dump(dumpable_tree, o_file, indent=2, sort_keys=True)
+            parsed_runs = add_capacity_metric_sets(
+                parsed_runs,
+                {
+                    input_sweeps[sweep_dir]: curves
+                    for sweep_dir, curves in sweep_curves.items()
+                },
+            )
+            stage.count("sweeps", len(input_sweeps))
+        print(f"Found {len(input_sweeps)} saturation sweeps.")
+
+    # regroup into a flat results table, with one row per
+    #   (date, workload, scenario, activity, name, observable) -> (value, unit)
+    with profiler.stage("build_tree") as stage:
+        results = ResultsTable.from_parsed_runs(parsed_runs, segment_keys=segment_keys)
+        stage.count("rows", len(results))
+    print(f"Results table: {len(results)} rows.")
+    # dump as JSON (nested, as workload->...->observable->[date->value, unit])
+    with profiler.stage("dump_json") as stage:
+        results.dump_json(plottable_json_filename)
+        stage.count("bytes", os.path.getsize(plottable_json_filename))
 
-    generated_plot_map = plot_observables(plottable_tree, args.output_dir)
+    # regression detection against a rolling baseline of previous runs
+    with profiler.stage("regressions") as stage:
+        regressions = detect_regressions(
+            results.group_by_metric_set_and_configuration(),
+            window=args.regression_window,
+            threshold=args.regression_threshold,
+            z_threshold=args.regression_z_threshold,
+        )
+        write_regression_report(
+            regressions,
+            regression_report_filename,
+            window=args.regression_window,
+            threshold=args.regression_threshold,
+            z_threshold=args.regression_z_threshold,
+            segment_keys=segment_keys,
+        )
+        stage.count("regressions", len(regressions))
+    latest_regressions = [reg for reg in regressions if reg.is_latest]
+    print(
+        f"Regressions: {len(regressions)} flagged over the history, "
+        f"{len(latest_regressions)} in the latest runs "
+        f"(report: {regression_report_filename})."
+    )
+    for reg in latest_regressions:
+        print(f"    * {reg}")
+
+    # workload->scenario->activity->name->[(file name, file path), ...]
+    generated_plot_map: dict[
+        str, dict[str, dict[str, dict[str, list[tuple[str, str]]]]]
+    ] = {}
+    if not args.no_plots:
+        with profiler.stage("plot_observables") as stage:
+            generated_plot_map = plot_observables(
+                results.group_by_metric_set_and_configuration(),
+                args.output_dir,
+                workers=num_workers,
+                incremental=args.incremental_plots,
+            )
+            stage.count(
+                "figures",
+                sum(
+                    len(nalist)
+                    for wlmap in generated_plot_map.values()
+                    for scmap in wlmap.values()
+                    for acmap in scmap.values()
+                    for nalist in acmap.values()
+                ),
+            )
+        if sweep_curves:
+            with profiler.stage("plot_sweeps") as stage:
+                sweep_plot_map = plot_sweeps(
+                    sweep_curves, args.output_dir, workers=num_workers
+                )
+                stage.count("sweeps", len(sweep_plot_map))
+            # the latest sweep figure of each activity goes with its capacity plots
+            latest_sweep_figures: dict[SweepCurveKeyType, tuple[str, str]] = {}
+            for sweep_dir in sorted(sweep_plot_map, key=input_sweeps.__getitem__):
+                latest_sweep_figures.update(sweep_plot_map[sweep_dir])
+            for (_wl, _sc, _ac), fig_pair in latest_sweep_figures.items():
+                generated_plot_map.setdefault(_wl, {}).setdefault(_sc, {}).setdefault(
+                    _ac, {}
+                ).setdefault(CAPACITY_METRIC_NAME, []).append(fig_pair)
+
+    # scaling comparisons: batch size (from the latest run of each workload)
+    # and thread count (across the runs in different configurations)
+    with profiler.stage("scaling") as stage:
+        scaling_comparisons = {
+            BATCH_SCALING_NAME: build_batch_scalings(parsed_runs),
+            THREAD_SCALING_NAME: build_thread_scalings(parsed_runs, segment_keys),
+        }
+        for scaling_name, scaling_curves in scaling_comparisons.items():
+            stage.count(scaling_name, len(scaling_curves))
+            if scaling_curves:
+                write_scaling_report(
+                    scaling_curves,
+                    os.path.join(args.output_dir, f"{scaling_name}.json"),
+                )
+            if scaling_curves and not args.no_plots:
+                scaling_plot_map = plot_scaling_curves(
+                    scaling_curves, args.output_dir, scaling_name, workers=num_workers
+                )
+                for (_wl, _sc, _ac), fig_pair in scaling_plot_map.items():
+                    generated_plot_map.setdefault(_wl, {}).setdefault(
+                        _sc, {}
+                    ).setdefault(_ac, {}).setdefault(scaling_name, []).append(fig_pair)
     num_generated_plots = len(
         [
             plt_pair
@@ -152,17 +531,51 @@ def main() -> None:
             for plt_pair in nalist
         ]
     )
-    print(f"Generated {num_generated_plots} plots.")
+    if args.no_plots:
+        print("Plots skipped (--no_plots).")
+    else:
+        print(f"Generated {num_generated_plots} plots.")
+
+    if args.timeline_plots and trim_spec is not None and not args.archive_only:
+        with profiler.stage("timeline_plots") as stage:
+            plot_run_timelines(
+                list(input_runs.keys()),
+                args.output_dir,
+                trim_spec,
+                workers=num_workers,
+            )
+            stage.count("run_dirs", len(input_runs))
 
     # prepare and upload the Atlassian page
     if args.atlassian:
-        update_atlassian_page(
-            parsed_runs,
-            plottable_tree,
-            generated_plot_map,
-        )
+        with profiler.stage("atlassian") as stage:
+            update_atlassian_page(
+                parsed_runs,
+                results,
+                generated_plot_map,
+                upload_workers=args.upload_workers,
+                manifest_filename=os.path.join(
+                    args.output_dir, PUBLISH_MANIFEST_FILETITLE
+                ),
+            )
+            stage.count("plots", num_generated_plots)
         print("Page updated to Atlassian.")
 
+    if args.profile:
+        print(f"\n{profiler.report()}")
+        profiler.write(
+            os.path.join(args.output_dir, PIPELINE_TIMINGS_FILETITLE),
+            cprofile_filename=(
+                os.path.join(args.output_dir, PIPELINE_CPROFILE_FILETITLE)
+                if args.profile_cprofile
+                else None
+            ),
+        )
+
+    if args.fail_on_regression and latest_regressions:
+        print(f"** {len(latest_regressions)} regressions in the latest runs.")
+        sys.exit(REGRESSION_EXIT_CODE)
+
 
 if __name__ == "__main__":
     main()
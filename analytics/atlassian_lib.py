@@ -1,14 +1,32 @@
+import hashlib
 import json
 import os
-import requests
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from requests.auth import HTTPBasicAuth
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
 from zoneinfo import ZoneInfo
 
+from pipeline_profiling import record_item
+from results_table import ResultsTable
 from summary_parsing import ParsedRun
 
+if TYPE_CHECKING:
+    import requests
+
 IMAGE_WIDTH_ON_PAGE_PX = 1024
 REPORT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+UPLOAD_WORKERS = 8
+RETRY_TOTAL = 5
+RETRY_BACKOFF_FACTOR = 1.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# responses on which a (non-idempotent) POST is known not to have been processed
+POST_RETRY_STATUS_CODES = (429, 503)
+ATTACHMENT_LIST_PAGE_SIZE = 200
+# the content hash of uploaded attachments is stored in their 'comment' field
+CONTENT_HASH_COMMENT_PREFIX = "sha256:"
+GENERATED_AT_LINE_PATTERN = re.compile(r"^<p>Generated at: .*</p>$", re.MULTILINE)
 
 # settings from env
 ATLASSIAN_EMAIL = os.getenv("ATLASSIAN_EMAIL")
@@ -17,86 +35,213 @@ ATLASSIAN_BASE_URL = os.getenv("ATLASSIAN_BASE_URL")
 ATLASSIAN_PAGE_ID = os.getenv("ATLASSIAN_PAGE_ID")
 
 
-def upsert_attachment_to_atlassian(
-    f_title: str, f_path: str, mime_type: str = "image/png"
-) -> None:
+def make_atlassian_session(pool_size: int = UPLOAD_WORKERS) -> "requests.Session":
+    """
+    A Session with auth, a connection pool sized for concurrent use
+    and automatic retries (with exponential backoff) on 429/5xx responses.
+    POSTs (attachment uploads, not idempotent) are only retried on connection
+    errors and on 429/503 responses, lest a retried upload add a duplicate
+    attachment version.
+    """
+    # requests is only imported when publishing
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.auth import HTTPBasicAuth
+    from urllib3.util.retry import Retry
+
     if ATLASSIAN_EMAIL is None or ATLASSIAN_API_TOKEN is None:
         raise ValueError("Atlassian auth secrets not provided.")
     if ATLASSIAN_BASE_URL is None or ATLASSIAN_PAGE_ID is None:
         raise ValueError("Atlassian page coordinates not provided.")
-    atlassian_auth = HTTPBasicAuth(ATLASSIAN_EMAIL, ATLASSIAN_API_TOKEN)
-    attach_url = f"{ATLASSIAN_BASE_URL}/content/{ATLASSIAN_PAGE_ID}/child/attachment"
-    # Check if filename is there already
-    file_get_response = requests.get(
-        attach_url,
-        params={"filename": f_title},
-        auth=atlassian_auth,
-        headers={"Accept": "application/json"},
+
+    class AtlassianRetry(Retry):
+        def is_retry(
+            self, method: str, status_code: int, has_retry_after: bool = False
+        ) -> bool:
+            if method.upper() == "POST" and status_code in POST_RETRY_STATUS_CODES:
+                # not processed: as safe to retry as an idempotent request
+                return super().is_retry("GET", status_code, has_retry_after)
+            return super().is_retry(method, status_code, has_retry_after)
+
+    session = requests.Session()
+    session.auth = HTTPBasicAuth(ATLASSIAN_EMAIL, ATLASSIAN_API_TOKEN)
+    # the default allowed_methods: idempotent ones only (POST excluded), while
+    # connection errors are retried whatever the method
+    retry = AtlassianRetry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
     )
-    data_file_get = file_get_response.json()
-    attachment_id: str | None
-    if data_file_get["results"]:
-        attachment = data_file_get["results"][0]
-        attachment_id = attachment["id"]
-    else:
-        attachment_id = None
-
-    # if existing, delete it first
-    if attachment_id is not None:
-        delete_url = f"{ATLASSIAN_BASE_URL}/content/{attachment_id}"
-        delete_response = requests.delete(
-            delete_url,
-            auth=atlassian_auth,
-            headers={"X-Atlassian-Token": "no-check"},
-        )
-        print(
-            f"    * deleting older '{f_title}' returned: {delete_response.status_code}."
-        )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks["response"].append(_record_request_timing)
+    return session
+
+
+def _record_request_timing(
+    response: "requests.Response", *args: Any, **kwargs: Any
+) -> None:
+    # response hook: the time to the response headers (of the last attempt)
+    record_item(
+        "http_request",
+        f"{response.request.method} {urlsplit(response.url).path} "
+        f"({response.status_code})",
+        response.elapsed.total_seconds(),
+    )
+
 
+def _print_lines(lines: list[str]) -> None:
+    # a single write, so that lines from concurrent threads do not get mixed
+    print("".join(f"{line}\n" for line in lines), end="", flush=True)
+
+
+def file_content_tag(f_path: str) -> str:
     with open(f_path, "rb") as f_data:
-        files = {"file": (f_title, f_data, mime_type)}
-        upload_response = requests.post(
+        digest = hashlib.sha256(f_data.read()).hexdigest()
+    return f"{CONTENT_HASH_COMMENT_PREFIX}{digest}"
+
+
+def page_body_digest(page_body: str) -> str:
+    """A digest of the page body, insensitive to the generation timestamp."""
+    stable_body = GENERATED_AT_LINE_PATTERN.sub("", page_body)
+    return hashlib.sha256(stable_body.encode()).hexdigest()
+
+
+def list_atlassian_attachments(
+    session: "requests.Session",
+) -> dict[str, dict[str, Any]]:
+    """Return all attachments currently on the page, as a title -> attachment map."""
+    attach_url = f"{ATLASSIAN_BASE_URL}/content/{ATLASSIAN_PAGE_ID}/child/attachment"
+    attachments: dict[str, dict[str, Any]] = {}
+    start: int = 0
+    while True:
+        list_response = session.get(
             attach_url,
-            auth=atlassian_auth,
-            headers={"X-Atlassian-Token": "no-check"},
-            files=files,
+            params={
+                "start": str(start),
+                "limit": str(ATTACHMENT_LIST_PAGE_SIZE),
+                "expand": "metadata",
+            },
+            headers={"Accept": "application/json"},
         )
-    print(f"    * upload '{f_title}' returned: {upload_response.status_code}.")
+        list_response.raise_for_status()
+        results = list_response.json()["results"]
+        for attachment in results:
+            attachments[attachment["title"]] = attachment
+        if len(results) < ATTACHMENT_LIST_PAGE_SIZE:
+            break
+        start += len(results)
+    return attachments
 
 
-def update_atlassian_page(
-    runs: dict[tuple[datetime, str], ParsedRun],
-    tree: dict[
-        str,
-        dict[str, dict[str, dict[str, dict[str, tuple[dict[datetime, float], str]]]]],
-    ],
-    image_map: dict[str, dict[str, dict[str, dict[str, list[tuple[str, str]]]]]],
-) -> None:
-    print("\nAtlassian update starting.")
-    generation_timestamp_str = datetime.now(ZoneInfo("UTC")).strftime(REPORT_DATE_FORMAT)
-    latest_run_str: str | None
-    if runs:
-        latest_run = max([run_date for run_date, _ in runs.keys()])
-        latest_run_str = latest_run.strftime(REPORT_DATE_FORMAT)
+def upsert_attachment_to_atlassian(
+    f_title: str,
+    f_path: str,
+    mime_type: str = "image/png",
+    session: "requests.Session | None" = None,
+    known_attachments: dict[str, dict[str, Any]] | None = None,
+) -> bool:
+    """
+    Upload a file as attachment, as a new version of any older one by the same
+    title (so the page never lacks the image, even if the upload fails).
+
+    Nothing is done if the existing attachment has the same content (as per
+    the content hash stored in its comment). The lookup for the existing
+    attachment is done on `known_attachments`, if provided, instead of
+    querying the API. Return whether an upload took place; raise if it failed.
+    """
+    _session = session or make_atlassian_session(pool_size=1)
+    attach_url = f"{ATLASSIAN_BASE_URL}/content/{ATLASSIAN_PAGE_ID}/child/attachment"
+    content_tag = file_content_tag(f_path)
+    # Check if filename is there already
+    attachment: dict[str, Any] | None
+    if known_attachments is not None:
+        attachment = known_attachments.get(f_title)
     else:
-        latest_run_str = None
-    if ATLASSIAN_EMAIL is None or ATLASSIAN_API_TOKEN is None:
-        raise ValueError("Atlassian auth secrets not provided.")
-    if ATLASSIAN_BASE_URL is None or ATLASSIAN_PAGE_ID is None:
-        raise ValueError("Atlassian page coordinates not provided.")
-    atlassian_auth = HTTPBasicAuth(ATLASSIAN_EMAIL, ATLASSIAN_API_TOKEN)
+        file_get_response = _session.get(
+            attach_url,
+            params={"filename": f_title, "expand": "metadata"},
+            headers={"Accept": "application/json"},
+        )
+        data_file_get = file_get_response.json()
+        if data_file_get["results"]:
+            attachment = data_file_get["results"][0]
+        else:
+            attachment = None
 
-    # get current version of page
-    getpage_response = requests.get(
-        f"{ATLASSIAN_BASE_URL}/content/{ATLASSIAN_PAGE_ID}?expand=body.storage,version,space,title",
-        auth=atlassian_auth,
-        headers={"Accept": "application/json"},
+    if attachment is not None:
+        if attachment.get("metadata", {}).get("comment") == content_tag:
+            _print_lines([f"    * '{f_title}' unchanged, skipping."])
+            return False
+        # if existing (and different), upload its new data
+        upload_url = f"{attach_url}/{attachment['id']}/data"
+    else:
+        upload_url = attach_url
+
+    with open(f_path, "rb") as f_data:
+        files = {"file": (f_title, f_data.read(), mime_type)}
+    upload_response = _session.post(
+        upload_url,
+        headers={"X-Atlassian-Token": "no-check"},
+        files=files,
+        data={"comment": content_tag},
     )
-    getpage_data = getpage_response.json()
-    page_current_version = getpage_data["version"]["number"]
-    print(f"Current version detected on Atlassian: {page_current_version}")
+    # a single print, as this may run in a thread
+    _print_lines([f"    * upload '{f_title}' returned: {upload_response.status_code}."])
+    # a failed upload must not be taken as published
+    upload_response.raise_for_status()
+    return True
 
-    # prepare html while sending images along the way
+
+def upload_attachments_to_atlassian(
+    attachments: list[tuple[str, str]],
+    session: "requests.Session",
+    workers: int = UPLOAD_WORKERS,
+) -> None:
+    """
+    Upsert a list of (title, path) attachments concurrently,
+    with at most `workers` uploads in flight at any time.
+    Attachments whose content is unchanged are skipped.
+    """
+    known_attachments = list_atlassian_attachments(session)
+    print(
+        f"Upserting {len(attachments)} attachments ({workers} workers, "
+        f"{len(known_attachments)} found on page)."
+    )
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        upload_futures = [
+            executor.submit(
+                upsert_attachment_to_atlassian,
+                a_title,
+                a_path,
+                session=session,
+                known_attachments=known_attachments,
+            )
+            for a_title, a_path in attachments
+        ]
+        # surface any exception raised in the threads
+        num_uploaded = sum(upload_future.result() for upload_future in upload_futures)
+    num_skipped = len(attachments) - num_uploaded
+    print(f"Uploaded {num_uploaded}, skipped {num_skipped} (unchanged).")
+
+
+def build_atlassian_page_body(
+    image_map: dict[str, dict[str, dict[str, dict[str, list[tuple[str, str]]]]]],
+    latest_run_str: str | None,
+    generation_timestamp_str: str,
+) -> tuple[str, list[tuple[str, str]]]:
+    """
+    Prepare the storage-format page body. Return it along with the list of
+    (title, path) images it references (which are to be attached to the page).
+    """
+    attachments: list[tuple[str, str]] = []
     page_doc_parts = []
     if latest_run_str:
         page_doc_parts.append(f"<p>Last reported test run at: {latest_run_str}</p>\n")
@@ -128,14 +273,82 @@ def update_atlassian_page(
                                             f'  <ri:attachment ri:filename="{img_title}" />',
                                         )
                                         page_doc_parts.append("</ac:image>")
-                                        # upload (upsert) attached image
-                                        upsert_attachment_to_atlassian(
-                                            img_title, img_path
-                                        )
+                                        attachments.append((img_title, img_path))
 
-    # upload page (with version increase)
     print(f"Preparing page body from {len(page_doc_parts)} lines.")
-    page_body = "\n".join(page_doc_parts)
+    return "\n".join(page_doc_parts), attachments
+
+
+def load_publish_manifest(manifest_filename: str | None) -> dict[str, Any] | None:
+    if manifest_filename is None or not os.path.isfile(manifest_filename):
+        return None
+    with open(manifest_filename) as m_file:
+        return json.load(m_file)
+
+
+def save_publish_manifest(
+    manifest_filename: str | None, manifest: dict[str, Any]
+) -> None:
+    if manifest_filename is not None:
+        with open(manifest_filename, "w") as m_file:
+            json.dump(manifest, m_file, indent=2, sort_keys=True)
+
+
+def update_atlassian_page(
+    runs: dict[tuple[datetime, str], ParsedRun],
+    results: ResultsTable,
+    image_map: dict[str, dict[str, dict[str, dict[str, list[tuple[str, str]]]]]],
+    upload_workers: int = UPLOAD_WORKERS,
+    manifest_filename: str | None = None,
+) -> None:
+    """
+    Upload changed images and update the page body. The page update is skipped
+    if the body is unchanged since the last publish recorded in the manifest
+    file (and the page was not touched since, as checked on its version).
+    """
+    print("\nAtlassian update starting.")
+    generation_timestamp_str = datetime.now(ZoneInfo("UTC")).strftime(
+        REPORT_DATE_FORMAT
+    )
+    latest_run_str: str | None
+    if runs:
+        latest_run = max([run_date for run_date, _ in runs])
+        latest_run_str = latest_run.strftime(REPORT_DATE_FORMAT)
+    else:
+        latest_run_str = None
+    session = make_atlassian_session(pool_size=upload_workers)
+
+    # get current version of page
+    getpage_response = session.get(
+        f"{ATLASSIAN_BASE_URL}/content/{ATLASSIAN_PAGE_ID}?expand=body.storage,version,space,title",
+        headers={"Accept": "application/json"},
+    )
+    getpage_data = getpage_response.json()
+    page_current_version = getpage_data["version"]["number"]
+    print(f"Current version detected on Atlassian: {page_current_version}")
+
+    # prepare html and the list of images to attach
+    page_body, attachments = build_atlassian_page_body(
+        image_map,
+        latest_run_str=latest_run_str,
+        generation_timestamp_str=generation_timestamp_str,
+    )
+
+    # upload (upsert) attached images, concurrently
+    upload_attachments_to_atlassian(attachments, session, workers=upload_workers)
+
+    # skip the page update if nothing changed since last time
+    body_digest = page_body_digest(page_body)
+    manifest = load_publish_manifest(manifest_filename)
+    if manifest == {
+        "page_id": ATLASSIAN_PAGE_ID,
+        "page_version": page_current_version,
+        "body_digest": body_digest,
+    }:
+        print("Page body unchanged, skipping update.")
+        return
+
+    # upload page (with version increase)
     update_data = {
         "id": ATLASSIAN_PAGE_ID,
         "type": "page",
@@ -144,10 +357,18 @@ def update_atlassian_page(
         "body": {"storage": {"value": page_body, "representation": "storage"}},
         "version": {"number": page_current_version + 1},
     }
-    update_response = requests.put(
+    update_response = session.put(
         f"{ATLASSIAN_BASE_URL}/content/{ATLASSIAN_PAGE_ID}",
         data=json.dumps(update_data),
-        auth=atlassian_auth,
         headers={"Content-Type": "application/json"},
     )
     print(f"Update returned status: {update_response.status_code}")
+    if update_response.ok:
+        save_publish_manifest(
+            manifest_filename,
+            {
+                "page_id": ATLASSIAN_PAGE_ID,
+                "page_version": page_current_version + 1,
+                "body_digest": body_digest,
+            },
+        )
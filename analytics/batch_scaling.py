@@ -0,0 +1,60 @@
+"""
+Batched writes: the same documents are written by several activities, each
+with its own number of documents per operation ('<group>_batch<N>'). The
+latest run of each workload yields a batch-size vs. throughput comparison.
+"""
+
+from datetime import datetime
+
+from results_table import date_to_string
+from scaling_curves import ScalingCurve, ScalingKeyType
+from summary_parsing import BATCH_ACTIVITY_PATTERN, BATCH_SIZE_OBS, ParsedRun
+
+BATCH_SCALING_NAME = "batch_scaling"
+BATCH_SCALING_METRIC_NAME = "result"
+
+
+def build_batch_scalings(
+    parsed_runs: dict[tuple[datetime, str], ParsedRun],
+) -> dict[ScalingKeyType, ScalingCurve]:
+    """
+    For each group of batched activities, collect the results of the latest
+    run having them into a batch-size comparison (rates in documents/s).
+    """
+    # (workload, scenario, group) -> (latest date, batch points)
+    group_points: dict[
+        ScalingKeyType, tuple[datetime, list[tuple[float, float, float, float]]]
+    ] = {}
+    units: dict[ScalingKeyType, tuple[str, str]] = {}
+    for (run_date, _), prun in sorted(parsed_runs.items()):
+        for pmset in prun.metric_sets:
+            if pmset.name != BATCH_SCALING_METRIC_NAME:
+                continue
+            match = BATCH_ACTIVITY_PATTERN.match(pmset.activity)
+            if not match:
+                continue
+            if not {"rate_mean", "P500", "P990"} <= set(pmset.metrics):
+                continue
+            g_key = (pmset.workload, pmset.scenario, match.group("group"))
+            if g_key not in group_points or group_points[g_key][0] != run_date:
+                # runs are visited in date order: later runs replace earlier ones
+                group_points[g_key] = (run_date, [])
+            group_points[g_key][1].append(
+                (
+                    float(match.group("batch_size")),
+                    pmset.metrics["rate_mean"][0],
+                    pmset.metrics["P500"][0],
+                    pmset.metrics["P990"][0],
+                )
+            )
+            units[g_key] = (pmset.metrics["rate_mean"][1], pmset.metrics["P990"][1])
+    return {
+        g_key: ScalingCurve(
+            parameter=BATCH_SIZE_OBS,
+            points=points,
+            rate_unit=units[g_key][0],
+            latency_unit=units[g_key][1],
+            description=f"run {date_to_string(run_date)}",
+        )
+        for g_key, (run_date, points) in sorted(group_points.items())
+    }
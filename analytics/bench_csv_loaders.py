@@ -0,0 +1,200 @@
+"""
+Benchmark of the CSV metric loaders on large synthetic nb5 CSV files.
+
+Usage:
+    python bench_csv_loaders.py [--rows N] [--files N] [--repeat N]
+
+Compares the reference row-by-row loader with the columnar and streaming ones
+(and checks that they all produce identical results).
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections.abc import Callable
+
+from os_lib import open_run_file
+from summary_parsing import (
+    OBS_NAME_MAP,
+    OBS_TO_UNIT_TYPE,
+    OBS_UNIT_MAP,
+    UNIT_LABELS,
+    load_csv_metrics,
+    load_csv_metrics_streaming,
+)
+
+NB5_CSV_HEADER = (
+    "t,count,max,mean,min,stddev,p50,p75,p95,p98,p99,p999,"
+    "mean_rate,m1_rate,m5_rate,m15_rate,rate_unit,duration_unit"
+)
+
+LoaderType = Callable[[str], dict[str, tuple[float, str]] | None]
+
+
+def write_synthetic_csv(fpath: str, num_rows: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with open(fpath, "w") as o_file:
+        o_file.write(f"{NB5_CSV_HEADER}\n")
+        for row_i in range(num_rows):
+            count = rng.randint(100, 5000)
+            base = rng.uniform(1.0e6, 5.0e7)
+            percentiles = sorted(rng.uniform(base, 5 * base) for _ in range(6))
+            values = [
+                1700000000 + 10 * row_i,
+                count,
+                percentiles[-1] * 1.2,
+                base * 1.5,
+                base,
+                base * 0.3,
+                *percentiles,
+                *(rng.uniform(25.0, 35.0) for _ in range(4)),
+            ]
+            o_file.write(
+                ",".join(str(val) for val in values) + ",calls/SECONDS,NANOSECONDS\n"
+            )
+
+
+def load_csv_metrics_rowwise(fpath: str) -> dict[str, tuple[float, str]] | None:
+    """
+    Read a CSV with metrics, pick relevant columns, return map
+        name -> (value, unit)
+    also dealing with filtering/average of rows. Return None if unsuitable data.
+
+    This is the original row-by-row implementation, the reference for the
+    benchmark (see summary_parsing.load_csv_metrics for the one in use).
+    """
+    with open_run_file(fpath) as ofile:
+        lines = list(ofile.readlines())
+        if not lines:
+            print(f"** No lines found in file {fpath}.File will not be loaded.")
+            return None
+        header, rows = lines[0], [_line.strip() for _line in lines[1:] if _line.strip()]
+        if not rows:
+            print(f"** No data lines found in file {fpath}.File will not be loaded.")
+            return None
+        column_labels = [lab.strip() for lab in header.split(",")]
+        value_columns: dict[str, list[str]] = {lab: [] for lab in column_labels}
+        for _line_no, row in enumerate(rows):
+            line_no = _line_no + 2
+            val_strings = [val_str.strip() for val_str in row.split(",")]
+            if len(val_strings) != len(column_labels):
+                print(
+                    f"** Row/label mismatch in file {fpath} at line "
+                    f"{line_no}. File will not be loaded."
+                )
+                return None
+            for col_lab, val_str in zip(column_labels, val_strings):
+                value_columns[col_lab] += [val_str]
+        # post-processing
+        unit_map = {
+            c_label: c_vals
+            for c_label, c_vals in value_columns.items()
+            if c_label in UNIT_LABELS
+        }
+        if any(len(set(um_val)) > 1 for um_val in unit_map.values()):
+            print(
+                f"** Inhomogeneous unit labels found in file {fpath}: "
+                f"{unit_map}. File will not be loaded."
+            )
+            return None
+        obs_lists = {
+            c_label: [float(c_val) for c_val in c_vals]
+            for c_label, c_vals in value_columns.items()
+            if c_label in OBS_NAME_MAP
+        }
+        # TODO: improve this logic!
+        rows_to_keep = [row_i for row_i, row in enumerate(obs_lists["count"])]
+        if not rows_to_keep:
+            print(
+                f"** No admissible data lines found in file {fpath}."
+                f"File will not be loaded."
+            )
+            return None
+
+        # averages are weighted on 'counts'
+        counts = [obs_lists["count"][row_i] for row_i in rows_to_keep]
+        total_counts = sum(counts)
+
+        def _average(val_list):
+            return (
+                sum(val_list[row_i] * cnt for row_i, cnt in zip(rows_to_keep, counts))
+                / total_counts
+            )
+
+        averages = {
+            c_label: _average(c_obslist) for c_label, c_obslist in obs_lists.items()
+        }
+        # overwrite 'count' average
+        final_values = {
+            **averages,
+            "count": total_counts,
+        }
+        # unit management
+        obs_name_to_unit = {
+            **{c_unn: OBS_UNIT_MAP[c_uns[0]] for c_unn, c_uns in unit_map.items()},
+            "": "",
+        }
+        values_with_unit = {
+            OBS_NAME_MAP[c_label]: (
+                c_value,
+                obs_name_to_unit[OBS_TO_UNIT_TYPE[c_label]],
+            )
+            for c_label, c_value in final_values.items()
+        }
+        return values_with_unit
+
+
+def time_loader(loader: LoaderType, fpaths: list[str], repeat: int) -> float:
+    best_time = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for fpath in fpaths:
+            loader(fpath)
+        best_time = min(best_time, time.perf_counter() - t0)
+    return best_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the CSV loaders.")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows per file")
+    parser.add_argument("--files", type=int, default=10, help="Number of files")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions (best)")
+    args = parser.parse_args()
+
+    loaders: dict[str, LoaderType] = {
+        "rowwise": load_csv_metrics_rowwise,
+        "columnar": load_csv_metrics,
+        "streaming": load_csv_metrics_streaming,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"Generating {args.files} files x {args.rows} rows ...")
+        fpaths = []
+        for file_i in range(args.files):
+            fpath = os.path.join(tmp_dir, f"synthetic_{file_i}.csv")
+            write_synthetic_csv(fpath, args.rows, seed=file_i)
+            fpaths.append(fpath)
+
+        # correctness first
+        for fpath in fpaths:
+            results = {l_name: loader(fpath) for l_name, loader in loaders.items()}
+            if len({repr(result) for result in results.values()}) > 1:
+                raise ValueError(f"Loader results differ for {fpath}: {results}")
+        print("Results identical across loaders.")
+
+        timings = {
+            l_name: time_loader(loader, fpaths, args.repeat)
+            for l_name, loader in loaders.items()
+        }
+        ref_time = timings["rowwise"]
+        for l_name, l_time in timings.items():
+            print(
+                f"    * {l_name:<10} {l_time:8.3f} s  "
+                f"({ref_time / l_time:5.2f}x vs. rowwise)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Benchmark of the analytics pipeline stages on synthetic run archives.
+
+Usage:
+    python bench_pipeline.py [--sizes 10,1000] [--workers N] [--work_dir DIR]
+                             [--baseline FILE] [--update_baseline]
+
+For each archive size (a number of run directories, see synthetic_runs.py)
+the stages of analytics.py are timed in turn, in a fresh process, recording
+the peak resident memory of the process at the end of each stage:
+    get_input_runs, parse_run_dirs, build_tree (derived metrics, results
+    table, JSON tree), dump_json, plot_observables, atlassian_page (page
+    body and attachment upload, with the Atlassian API calls stubbed).
+
+The results are compared with a stored baseline and the script exits with
+code 3 if any stage got slower, or needs more memory, beyond the tolerances.
+The peak memory is a high-water mark, hence it never decreases from a stage
+to the next: an increase is attributed to the first stage showing it.
+Memory used by worker processes (--workers > 1) is not included.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, TypeVar
+from unittest import mock
+
+import atlassian_lib
+from derived_metrics import add_derived_metric_sets
+from obs_plotting import plot_observables
+from os_lib import get_input_runs
+from pipeline_profiling import peak_rss_mb
+from results_table import ResultsTable
+from summary_parsing import parse_run_dirs
+from synthetic_runs import generate_synthetic_archive
+
+BENCH_BASELINE_FORMAT_VERSION = 1
+DEFAULT_BENCH_SIZES = "10,1000"
+DEFAULT_BASELINE_FILENAME = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "bench_pipeline_baseline.json"
+)
+DEFAULT_TIME_TOLERANCE = 0.5
+DEFAULT_MEMORY_TOLERANCE = 0.2
+# differences below these are noise, whatever the relative change
+MIN_TIME_REGRESSION_SECONDS = 0.05
+MIN_MEMORY_REGRESSION_MB = 1.0
+BENCH_REGRESSION_EXIT_CODE = 3
+
+StageResultType = TypeVar("StageResultType")
+
+
+class StageMeasurement:
+    """Wall time, peak memory (so far) and number of processed items of a stage."""
+
+    stage: str
+    seconds: float
+    peak_mb: float
+    items: int
+
+    def __init__(self, *, stage: str, seconds: float, peak_mb: float, items: int):
+        self.stage = stage
+        self.seconds = seconds
+        self.peak_mb = peak_mb
+        self.items = items
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.stage:<18} {self.seconds:9.3f} s {self.peak_mb:9.1f} MB "
+            f"({self.items} items)"
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "seconds": self.seconds,
+            "peak_mb": self.peak_mb,
+            "items": self.items,
+        }
+
+
+class StubAtlassianResponse:
+    status_code: int
+    ok: bool
+
+    def __init__(self, payload: dict[str, Any]) -> None:
+        self.payload = payload
+        self.status_code = 200
+        self.ok = True
+
+    def json(self) -> dict[str, Any]:
+        return self.payload
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+class StubAtlassianSession:
+    """Answers the Atlassian API calls locally (an empty page, no attachments)."""
+
+    num_calls: int
+
+    def __init__(self) -> None:
+        self.num_calls = 0
+
+    def get(self, url: str, **kwargs: Any) -> StubAtlassianResponse:
+        self.num_calls += 1
+        if url.endswith("/child/attachment"):
+            return StubAtlassianResponse({"results": []})
+        return StubAtlassianResponse(
+            {"version": {"number": 1}, "title": "Benchmark", "space": {"key": "B"}}
+        )
+
+    def post(self, url: str, **kwargs: Any) -> StubAtlassianResponse:
+        self.num_calls += 1
+        return StubAtlassianResponse({})
+
+    def put(self, url: str, **kwargs: Any) -> StubAtlassianResponse:
+        self.num_calls += 1
+        return StubAtlassianResponse({})
+
+    def delete(self, url: str, **kwargs: Any) -> StubAtlassianResponse:
+        self.num_calls += 1
+        return StubAtlassianResponse({})
+
+
+def measure_stage(
+    stage: str,
+    stage_function: Callable[[], StageResultType],
+    measurements: list[StageMeasurement],
+) -> StageResultType:
+    """
+    Run a stage (silencing its output), append its measurement (with the
+    item count to be filled by the caller) and return its result.
+    """
+    gc.collect()
+    t0 = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = stage_function()
+    elapsed = time.perf_counter() - t0
+    measurements.append(
+        StageMeasurement(
+            stage=stage,
+            seconds=elapsed,
+            peak_mb=peak_rss_mb(),
+            items=0,
+        )
+    )
+    return result
+
+
+def benchmark_pipeline(
+    input_dir: str, output_dir: str, workers: int = 1
+) -> list[StageMeasurement]:
+    """Run all pipeline stages on a run archive, return their measurements."""
+    measurements: list[StageMeasurement] = []
+    input_runs = measure_stage(
+        "get_input_runs", lambda: get_input_runs(input_dir), measurements
+    )
+    measurements[-1].items = len(input_runs)
+
+    parsed_dir_map = measure_stage(
+        "parse_run_dirs",
+        lambda: parse_run_dirs(list(input_runs.keys()), workers=workers),
+        measurements,
+    )
+    measurements[-1].items = sum(
+        len(prun.metric_sets) for prun in parsed_dir_map.values()
+    )
+
+    def _build_tree() -> tuple[ResultsTable, dict[str, Any]]:
+        parsed_runs = add_derived_metric_sets(
+            {
+                dir_parsed_pair: parsed_dir_map[full_dir_name]
+                for full_dir_name, dir_parsed_pair in input_runs.items()
+            }
+        )
+        _results = ResultsTable.from_parsed_runs(parsed_runs)
+        return _results, _results.to_json_tree()
+
+    results, _ = measure_stage("build_tree", _build_tree, measurements)
+    measurements[-1].items = len(results)
+
+    json_filename = os.path.join(output_dir, "full_plottable_output.json")
+    measure_stage("dump_json", lambda: results.dump_json(json_filename), measurements)
+    measurements[-1].items = os.path.getsize(json_filename)
+
+    generated_plot_map = measure_stage(
+        "plot_observables",
+        lambda: plot_observables(
+            results.group_by_metric_set_and_configuration(),
+            output_dir,
+            workers=workers,
+        ),
+        measurements,
+    )
+    measurements[-1].items = sum(
+        len(nalist)
+        for wlmap in generated_plot_map.values()
+        for scmap in wlmap.values()
+        for acmap in scmap.values()
+        for nalist in acmap.values()
+    )
+
+    stub_session = StubAtlassianSession()
+    with mock.patch.object(
+        atlassian_lib, "make_atlassian_session", return_value=stub_session
+    ):
+        measure_stage(
+            "atlassian_page",
+            lambda: atlassian_lib.update_atlassian_page(
+                {
+                    dir_parsed_pair: parsed_dir_map[full_dir_name]
+                    for full_dir_name, dir_parsed_pair in input_runs.items()
+                },
+                results,
+                generated_plot_map,
+                manifest_filename=os.path.join(output_dir, "manifest.json"),
+            ),
+            measurements,
+        )
+    measurements[-1].items = stub_session.num_calls
+    return measurements
+
+
+def find_regressions(
+    measurements: dict[str, list[StageMeasurement]],
+    baseline: dict[str, Any],
+    time_tolerance: float,
+    memory_tolerance: float,
+) -> list[str]:
+    """Describe the stages slower/larger than in the baseline beyond tolerance."""
+    regressions: list[str] = []
+    for size_str, size_measurements in measurements.items():
+        size_baseline = baseline.get("sizes", {}).get(size_str)
+        if size_baseline is None:
+            print(f"** No baseline for {size_str} runs.")
+            continue
+        for meas in size_measurements:
+            if meas.stage not in size_baseline:
+                print(f"** No baseline for stage '{meas.stage}' ({size_str} runs).")
+                continue
+            base_seconds = size_baseline[meas.stage]["seconds"]
+            base_peak_mb = size_baseline[meas.stage]["peak_mb"]
+            if (
+                meas.seconds > base_seconds * (1 + time_tolerance)
+                and meas.seconds - base_seconds > MIN_TIME_REGRESSION_SECONDS
+            ):
+                regressions.append(
+                    f"{meas.stage} ({size_str} runs): {meas.seconds:.3f} s "
+                    f"vs. {base_seconds:.3f} s in the baseline"
+                )
+            if (
+                meas.peak_mb > base_peak_mb * (1 + memory_tolerance)
+                and meas.peak_mb - base_peak_mb > MIN_MEMORY_REGRESSION_MB
+            ):
+                regressions.append(
+                    f"{meas.stage} ({size_str} runs): peak {meas.peak_mb:.1f} MB "
+                    f"vs. {base_peak_mb:.1f} MB in the baseline"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the pipeline stages.")
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        default=DEFAULT_BENCH_SIZES,
+        help=(
+            "Comma-separated numbers of runs in the synthetic archives "
+            f"(default: '{DEFAULT_BENCH_SIZES}'; e.g. '10,1000,10000')"
+        ),
+    )
+    parser.add_argument(
+        "--rows", type=int, default=6, help="Reporting intervals per CSV"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for parsing and plotting (default: 1)",
+    )
+    parser.add_argument(
+        "--work_dir",
+        type=str,
+        default=None,
+        help=(
+            "Directory for the synthetic archives, which are kept and reused "
+            "across invocations (default: a temporary directory)"
+        ),
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=DEFAULT_BASELINE_FILENAME,
+        help="Baseline file (default: 'bench_pipeline_baseline.json')",
+    )
+    parser.add_argument(
+        "--update_baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--time_tolerance",
+        type=float,
+        default=DEFAULT_TIME_TOLERANCE,
+        help=(
+            "Relative slowdown of a stage tolerated vs. the baseline "
+            f"(default: {DEFAULT_TIME_TOLERANCE})"
+        ),
+    )
+    parser.add_argument(
+        "--memory_tolerance",
+        type=float,
+        default=DEFAULT_MEMORY_TOLERANCE,
+        help=(
+            "Relative increase of the peak memory of a stage tolerated vs. the "
+            f"baseline (default: {DEFAULT_MEMORY_TOLERANCE})"
+        ),
+    )
+    args = parser.parse_args()
+    sizes = [int(size_str) for size_str in args.sizes.split(",") if size_str.strip()]
+    # results are only comparable for the same settings
+    bench_settings = {"rows": args.rows, "workers": args.workers}
+
+    measurements: dict[str, list[StageMeasurement]] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.work_dir or tmp_dir
+        for num_runs in sizes:
+            input_dir = os.path.join(work_dir, f"runs_{num_runs}_rows_{args.rows}")
+            if os.path.isdir(input_dir):
+                print(f"Reusing the synthetic archive in '{input_dir}'.")
+            else:
+                os.makedirs(input_dir)
+                generate_synthetic_archive(input_dir, num_runs, num_rows=args.rows)
+            # a fresh process for each size, for its own peak memory
+            with (
+                tempfile.TemporaryDirectory() as output_dir,
+                ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn")
+                ) as executor,
+            ):
+                size_measurements = executor.submit(
+                    benchmark_pipeline, input_dir, output_dir, args.workers
+                ).result()
+            print(f"\nStages for {num_runs} runs:")
+            for meas in size_measurements:
+                print(f"    * {meas}")
+            measurements[str(num_runs)] = size_measurements
+
+    if args.update_baseline:
+        baseline: dict[str, Any] = {}
+        if os.path.isfile(args.baseline):
+            with open(args.baseline) as b_file:
+                baseline = json.load(b_file)
+        baseline["format_version"] = BENCH_BASELINE_FORMAT_VERSION
+        baseline["settings"] = bench_settings
+        baseline.setdefault("sizes", {}).update(
+            {
+                size_str: {meas.stage: meas.to_dict() for meas in size_measurements}
+                for size_str, size_measurements in measurements.items()
+            }
+        )
+        with open(args.baseline, "w") as b_file:
+            json.dump(baseline, b_file, indent=2, sort_keys=True)
+        print(f"\nBaseline written to '{args.baseline}'.")
+        return
+
+    if not os.path.isfile(args.baseline):
+        print(f"\nNo baseline at '{args.baseline}' (see --update_baseline).")
+        return
+    with open(args.baseline) as b_file:
+        baseline = json.load(b_file)
+    if baseline.get("format_version") != BENCH_BASELINE_FORMAT_VERSION:
+        print(f"\n** Baseline '{args.baseline}' has an outdated format, ignored.")
+        return
+    if baseline.get("settings") != bench_settings:
+        print(
+            f"\n** Baseline '{args.baseline}' was measured with different "
+            f"settings ({baseline.get('settings')}), ignored."
+        )
+        return
+    regressions = find_regressions(
+        measurements, baseline, args.time_tolerance, args.memory_tolerance
+    )
+    if regressions:
+        print(f"\n** {len(regressions)} stage regressions vs. the baseline:")
+        for regression in regressions:
+            print(f"    * {regression}")
+        sys.exit(BENCH_REGRESSION_EXIT_CODE)
+    print("\nNo stage regressions vs. the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark of the start-up cost of analytics.py, and check of the JSON-only
+mode (--no_plots) not loading the heavy modules (matplotlib, requests).
+
+Usage:
+    python bench_startup.py [--repeat N] [--runs N]
+
+Each case runs in a fresh interpreter (best of `--repeat`):
+    * import: importing analytics.py
+    * import_eager: the same, plus matplotlib and requests (i.e. the start-up
+      cost when these were imported at module load)
+    * json_only: a whole `analytics.py --no_plots` on a small synthetic archive
+      (with a warm parse cache after the first repetition)
+Exits with code 3 if heavy modules are loaded in the 'import' or 'json_only'
+cases.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from synthetic_runs import generate_synthetic_archive
+
+HEAVY_MODULES = ["matplotlib", "requests", "urllib3"]
+BENCH_FAILURE_EXIT_CODE = 3
+ANALYTICS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# run in the child interpreter: time the snippet, report the heavy modules
+CASE_TEMPLATE = """
+import contextlib, io, json, sys, time
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{snippet}
+elapsed = time.perf_counter() - t0
+heavy = sorted({{m.split(".")[0] for m in sys.modules}} & set({heavy_modules!r}))
+print(json.dumps({{"seconds": elapsed, "heavy_modules": heavy}}))
+"""
+
+
+def run_case(snippet: str, repeat: int) -> tuple[float, list[str]]:
+    """Best time and loaded heavy modules of a snippet, in fresh interpreters."""
+    code = CASE_TEMPLATE.format(
+        snippet="\n".join(f"    {line}" for line in snippet.splitlines()),
+        heavy_modules=HEAVY_MODULES,
+    )
+    best_time = float("inf")
+    heavy_modules: list[str] = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ANALYTICS_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        case_result = json.loads(completed.stdout.splitlines()[-1])
+        best_time = min(best_time, case_result["seconds"])
+        heavy_modules = case_result["heavy_modules"]
+    return best_time, heavy_modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the start-up cost.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions (best)")
+    parser.add_argument(
+        "--runs", type=int, default=10, help="Runs in the synthetic archive"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_dir = os.path.join(tmp_dir, "logs")
+        output_dir = os.path.join(tmp_dir, "output")
+        os.makedirs(input_dir)
+        os.makedirs(output_dir)
+        generate_synthetic_archive(input_dir, args.runs)
+        cases = {
+            "import": "import analytics",
+            "import_eager": (
+                "import analytics\nimport matplotlib.figure\nimport requests"
+            ),
+            "json_only": (
+                "import analytics\n"
+                f"sys.argv = ['analytics.py', '--input_dir', {input_dir!r}, "
+                f"'--output_dir', {output_dir!r}, '--no_plots']\n"
+                "analytics.main()"
+            ),
+        }
+        results = {
+            case_name: run_case(snippet, args.repeat)
+            for case_name, snippet in cases.items()
+        }
+
+    print(f"\nStart-up times (best of {args.repeat}):")
+    for case_name, (seconds, heavy_modules) in results.items():
+        print(
+            f"    * {case_name:<14} {seconds:7.3f} s  "
+            f"(heavy modules: {', '.join(heavy_modules) or 'none'})"
+        )
+    failed_cases = [
+        case_name for case_name in ("import", "json_only") if results[case_name][1]
+    ]
+    if failed_cases:
+        print(f"** Heavy modules loaded in: {', '.join(failed_cases)}.")
+        sys.exit(BENCH_FAILURE_EXIT_CODE)
+    print(
+        "No heavy modules loaded in JSON-only mode "
+        f"({results['import_eager'][0] - results['import'][0]:.3f} s saved "
+        "at import)."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from summary_parsing import ParsedMetricSet, ParsedRun
+
+# all operations (including failed ones) vs. successful operations only
+ALL_OPS_METRIC_NAME = "result"
+SUCCESSFUL_OPS_METRIC_NAME = "result_success"
+ERROR_RATE_METRIC_NAME = "error_rate"
+GOODPUT_METRIC_NAME = "goodput"
+# rate observables carried over to the goodput metric set, with their
+# counterpart from the successful-ops metric set
+GOODPUT_RATE_OBSERVABLES = {
+    "rate_mean": ("throughput", "goodput"),
+    "ss_rate": ("ss_throughput", "ss_goodput"),
+}
+
+
+def derive_outcome_metric_sets(
+    all_ops: ParsedMetricSet,
+    successful_ops: ParsedMetricSet,
+) -> list[ParsedMetricSet]:
+    """
+    Compare the metric sets for all and for successful operations of an
+    activity and return two derived metric sets:
+        error_rate: failed operations, as count and as percentage of the total
+        goodput: throughput (all ops/s) and goodput (successful ops/s)
+    """
+    derived_sets: list[ParsedMetricSet] = []
+    all_count = all_ops.metrics.get("count", (0.0, ""))[0]
+    success_count = successful_ops.metrics.get("count", (0.0, ""))[0]
+    if all_count > 0:
+        error_count = max(all_count - success_count, 0.0)
+        derived_sets.append(
+            ParsedMetricSet(
+                workload=all_ops.workload,
+                scenario=all_ops.scenario,
+                activity=all_ops.activity,
+                name=ERROR_RATE_METRIC_NAME,
+                metrics={
+                    "error_count": (error_count, ""),
+                    "error_rate": (100.0 * error_count / all_count, "%"),
+                },
+            )
+        )
+    goodput_metrics: dict[str, tuple[float, str]] = {}
+    for rate_obs, (all_obs, success_obs) in GOODPUT_RATE_OBSERVABLES.items():
+        if rate_obs in all_ops.metrics and rate_obs in successful_ops.metrics:
+            goodput_metrics[all_obs] = all_ops.metrics[rate_obs]
+            goodput_metrics[success_obs] = successful_ops.metrics[rate_obs]
+    if goodput_metrics:
+        derived_sets.append(
+            ParsedMetricSet(
+                workload=all_ops.workload,
+                scenario=all_ops.scenario,
+                activity=all_ops.activity,
+                name=GOODPUT_METRIC_NAME,
+                metrics=goodput_metrics,
+            )
+        )
+    return derived_sets
+
+
+def add_derived_metric_sets(
+    parsed_runs: dict[tuple[datetime, str], ParsedRun],
+) -> dict[tuple[datetime, str], ParsedRun]:
+    """
+    Return the parsed runs with, for each activity having both the all-ops and
+    the successful-ops metric sets, the derived error-rate and goodput sets.
+    Derived sets are computed on the fly (never cached nor archived).
+    """
+    enriched_runs: dict[tuple[datetime, str], ParsedRun] = {}
+    for run_key, prun in parsed_runs.items():
+        by_activity: dict[tuple[str, str, str], dict[str, ParsedMetricSet]] = {}
+        for pmset in prun.metric_sets:
+            by_activity.setdefault(
+                (pmset.workload, pmset.scenario, pmset.activity), {}
+            )[pmset.name] = pmset
+        derived_sets = [
+            derived_set
+            for name_map in by_activity.values()
+            if ALL_OPS_METRIC_NAME in name_map
+            if SUCCESSFUL_OPS_METRIC_NAME in name_map
+            for derived_set in derive_outcome_metric_sets(
+                name_map[ALL_OPS_METRIC_NAME],
+                name_map[SUCCESSFUL_OPS_METRIC_NAME],
+            )
+        ]
+        enriched_runs[run_key] = ParsedRun(
+            metric_sets=prun.metric_sets + derived_sets,
+            metaparameters=prun.metaparameters,
+        )
+    return enriched_runs
@@ -0,0 +1,194 @@
+"""
+Minimal reader for HdrHistogram interval logs, as written by nb5
+with the `--log-histograms` option.
+
+Only what is needed to merge the interval histograms of a run and extract
+exact whole-run percentiles is implemented (V2 encoding, compressed or not).
+"""
+
+import base64
+import math
+import struct
+import zlib
+
+from os_lib import open_run_file
+
+V2_ENCODING_COOKIE_BASE = 0x1C849303
+V2_COMPRESSED_ENCODING_COOKIE_BASE = 0x1C849304
+V2_HEADER_FORMAT = ">iiiiqqd"  # cookie, payload len, offset, digits, low, high, ratio
+V2_HEADER_SIZE = struct.calcsize(V2_HEADER_FORMAT)
+HISTOGRAM_LOG_TAG_PREFIX = "Tag="
+
+
+def _cookie_base(cookie: int) -> int:
+    # the cookie carries the word size in bits 4-7, which are masked away
+    return cookie & ~0xF0
+
+
+def _decode_zigzag_leb128(payload: bytes) -> list[int]:
+    """Decode a sequence of ZigZag-LEB128 encoded 64-bit signed integers."""
+    values: list[int] = []
+    pos = 0
+    payload_len = len(payload)
+    while pos < payload_len:
+        raw_value = 0
+        shift = 0
+        while True:
+            byte = payload[pos]
+            pos += 1
+            if shift == 56:
+                # the ninth byte contributes all of its eight bits
+                raw_value |= byte << 56
+                break
+            raw_value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        values.append((raw_value >> 1) ^ -(raw_value & 1))
+    return values
+
+
+class HdrHistogram:
+    """
+    A histogram in the HdrHistogram bucket layout, with sparse counts
+    (index -> count). Histograms with the same layout can be merged.
+    """
+
+    lowest_discernible_value: int
+    significant_digits: int
+    unit_magnitude: int
+    sub_bucket_half_count_magnitude: int
+    sub_bucket_half_count: int
+    counts: dict[int, int]
+    total_count: int
+
+    def __init__(
+        self, *, lowest_discernible_value: int, significant_digits: int
+    ) -> None:
+        self.lowest_discernible_value = lowest_discernible_value
+        self.significant_digits = significant_digits
+        largest_single_unit_value = 2 * 10**significant_digits
+        sub_bucket_count_magnitude = (largest_single_unit_value - 1).bit_length()
+        self.sub_bucket_half_count_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self.sub_bucket_half_count = 1 << self.sub_bucket_half_count_magnitude
+        self.unit_magnitude = lowest_discernible_value.bit_length() - 1
+        self.counts = {}
+        self.total_count = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"HdrHistogram(total_count={self.total_count}, "
+            f"digits={self.significant_digits})"
+        )
+
+    @property
+    def layout(self) -> tuple[int, int]:
+        return (self.lowest_discernible_value, self.significant_digits)
+
+    @staticmethod
+    def from_encoded(encoded: bytes) -> "HdrHistogram":
+        cookie = struct.unpack_from(">i", encoded)[0]
+        if _cookie_base(cookie) == V2_COMPRESSED_ENCODING_COOKIE_BASE:
+            compressed_len = struct.unpack_from(">i", encoded, 4)[0]
+            encoded = zlib.decompress(encoded[8 : 8 + compressed_len])
+            cookie = struct.unpack_from(">i", encoded)[0]
+        if _cookie_base(cookie) != V2_ENCODING_COOKIE_BASE:
+            raise ValueError(f"Unsupported histogram encoding (cookie {cookie:#x}).")
+        (
+            _,
+            payload_len,
+            normalizing_index_offset,
+            significant_digits,
+            lowest_discernible_value,
+            _,
+            _,
+        ) = struct.unpack_from(V2_HEADER_FORMAT, encoded)
+        if normalizing_index_offset != 0:
+            raise ValueError("Normalized (shifted) histograms are not supported.")
+        histogram = HdrHistogram(
+            lowest_discernible_value=lowest_discernible_value,
+            significant_digits=significant_digits,
+        )
+        payload = encoded[V2_HEADER_SIZE : V2_HEADER_SIZE + payload_len]
+        index = 0
+        for value in _decode_zigzag_leb128(payload):
+            if value < 0:
+                # a run of zero counts
+                index -= value
+            else:
+                if value > 0:
+                    histogram.counts[index] = value
+                    histogram.total_count += value
+                index += 1
+        return histogram
+
+    @staticmethod
+    def from_base64(encoded_b64: str) -> "HdrHistogram":
+        return HdrHistogram.from_encoded(base64.b64decode(encoded_b64))
+
+    def add(self, other: "HdrHistogram") -> None:
+        if other.layout != self.layout:
+            raise ValueError(
+                f"Cannot merge histograms with layouts {self.layout}, {other.layout}."
+            )
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+
+    def _value_range_from_index(self, index: int) -> tuple[int, int]:
+        # lowest and highest values equivalent to those in the index's bucket
+        bucket_index = (index >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket_index = (index & (self.sub_bucket_half_count - 1)) + (
+            self.sub_bucket_half_count
+        )
+        if bucket_index < 0:
+            sub_bucket_index -= self.sub_bucket_half_count
+            bucket_index = 0
+        lowest_value = sub_bucket_index << (bucket_index + self.unit_magnitude)
+        range_size = 1 << (bucket_index + self.unit_magnitude)
+        return lowest_value, lowest_value + range_size - 1
+
+    def value_at_percentile(self, percentile: float) -> int:
+        """Same semantics as HdrHistogram's getValueAtPercentile."""
+        # nudged down to avoid floating-point artifacts, e.g. for 99.9% of 20000
+        requested_percentile = min(
+            max(math.nextafter(percentile, -math.inf), 0.0), 100.0
+        )
+        count_at_percentile = max(
+            math.ceil((requested_percentile / 100.0) * self.total_count), 1
+        )
+        running_total = 0
+        for index in sorted(self.counts):
+            running_total += self.counts[index]
+            if running_total >= count_at_percentile:
+                lowest_value, highest_value = self._value_range_from_index(index)
+                return lowest_value if percentile == 0.0 else highest_value
+        return 0
+
+
+def load_histogram_log(fpath: str) -> dict[str, HdrHistogram]:
+    """
+    Read a (possibly tagged) HdrHistogram interval log and return, for each
+    tag, the merge of all its interval histograms. Untagged histograms
+    are filed under the empty-string tag.
+    """
+    merged_histograms: dict[str, HdrHistogram] = {}
+    with open_run_file(fpath) as h_file:
+        for _line in h_file:
+            line = _line.strip()
+            if not line or line[0] == "#" or line[0] == '"':
+                # comments and the legend line
+                continue
+            fields = line.split(",")
+            tag = ""
+            if fields[0].startswith(HISTOGRAM_LOG_TAG_PREFIX):
+                tag = fields[0][len(HISTOGRAM_LOG_TAG_PREFIX) :]
+                fields = fields[1:]
+            if len(fields) != 4:
+                continue
+            histogram = HdrHistogram.from_base64(fields[3])
+            if tag in merged_histograms:
+                merged_histograms[tag].add(histogram)
+            else:
+                merged_histograms[tag] = histogram
+    return merged_histograms
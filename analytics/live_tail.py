@@ -0,0 +1,414 @@
+"""
+Live view of a run while nb5 is still writing its metric CSVs.
+
+Usage:
+    python live_tail.py --csv_dir DIR [--poll_seconds S] [--max_p99_ms MS]
+        [--max_error_percent P] [--breach_intervals N] [--idle_timeout S]
+
+Follows a <RUN_TAG>_CSV_<workload> directory: metric CSVs are picked up as nb5
+creates them, and at each poll only the lines appended since the previous one
+are read (each file is followed from its last offset) and added to running
+aggregates (see CSVMetricAccumulator in summary_parsing). After each poll
+bringing new intervals, a compact summary is printed: per activity, the ops/s
+and P99 of the latest interval and the failed operations so far.
+
+With thresholds, an activity breaching them in `--breach_intervals`
+consecutive intervals aborts the run: the reason is written to an ABORT file
+in the directory (on which run_tests.py stops the job) and the script exits
+with code 3.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from typing import Any
+
+from summary_parsing import (
+    CSVMetricAccumulator,
+    csv_filename_to_activity_desc,
+    is_useful_activity,
+)
+
+ABORT_FILENAME = "ABORT"
+ABORT_EXIT_CODE = 3
+DEFAULT_POLL_SECONDS = 15.0
+DEFAULT_BREACH_INTERVALS = 3
+# no error-rate verdict before this many operations of an activity
+DEFAULT_MIN_OPERATIONS = 100
+# nb5 reports durations in nanoseconds
+DURATION_UNIT_TO_MS = {"ns": 1.0e-6}
+ALL_OPERATIONS_NAME = "result"
+SUCCESSFUL_OPERATIONS_NAME = "result_success"
+
+
+class CSVFollower:
+    """
+    A metric CSV being written: each poll reads the complete lines appended
+    since the previous one and feeds them to a CSVMetricAccumulator. A file
+    found shorter than already read (i.e. rewritten) is followed anew.
+    """
+
+    fpath: str
+    offset: int
+    pending: bytes
+    accumulator: CSVMetricAccumulator | None
+    unsuitable: bool
+    # per interval: cumulative count and P99 (a float each, per minute of run)
+    cumulative_counts: list[float]
+    p99_values: list[float]
+
+    def __init__(self, *, fpath: str) -> None:
+        self.fpath = fpath
+        self._reset()
+
+    def _reset(self) -> None:
+        self.offset = 0
+        self.pending = b""
+        self.accumulator = None
+        self.unsuitable = False
+        self.cumulative_counts = []
+        self.p99_values = []
+
+    def poll(self) -> int:
+        """Read the new complete lines. Return the number of new intervals."""
+        if self.unsuitable:
+            return 0
+        try:
+            file_size = os.path.getsize(self.fpath)
+        except FileNotFoundError:
+            return 0
+        if file_size < self.offset:
+            print(f"** File {self.fpath} was rewritten: following it anew.")
+            self._reset()
+        if file_size == self.offset:
+            return 0
+        with open(self.fpath, "rb") as i_file:
+            i_file.seek(self.offset)
+            new_bytes = i_file.read()
+        self.offset += len(new_bytes)
+        # the last line may be still incomplete: kept for the next poll
+        *new_lines, self.pending = (self.pending + new_bytes).split(b"\n")
+
+        num_new_intervals = 0
+        for new_line in new_lines:
+            line = new_line.decode()
+            if self.accumulator is None:
+                self.accumulator = CSVMetricAccumulator(fpath=self.fpath, header=line)
+                continue
+            num_rows = self.accumulator.num_rows
+            if not self.accumulator.add_line(line):
+                self.unsuitable = True
+                break
+            if self.accumulator.num_rows > num_rows:
+                self.cumulative_counts.append(self.accumulator.total_counts)
+                self.p99_values.append(self.accumulator.last_row()["p99"])
+                num_new_intervals += 1
+        return num_new_intervals
+
+    def p99_ms(self, interval_i: int) -> float:
+        assert self.accumulator is not None
+        p99_unit = self.accumulator.unit("p99")
+        return self.p99_values[interval_i] * DURATION_UNIT_TO_MS.get(p99_unit, 1.0e-6)
+
+    def current_rate(self) -> float:
+        """The ops/s of the latest interval (its one-minute rate)."""
+        if self.accumulator is None:
+            return 0.0
+        return self.accumulator.last_row().get("m1_rate", 0.0)
+
+
+class ActivityStatus:
+    """Where an activity stands, as of its latest interval."""
+
+    activity: str
+    intervals: int
+    ops_per_second: float
+    p99_ms: float
+    operations: int
+    errors: int
+
+    def __init__(
+        self,
+        *,
+        activity: str,
+        intervals: int,
+        ops_per_second: float,
+        p99_ms: float,
+        operations: int,
+        errors: int,
+    ) -> None:
+        self.activity = activity
+        self.intervals = intervals
+        self.ops_per_second = ops_per_second
+        self.p99_ms = p99_ms
+        self.operations = operations
+        self.errors = errors
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.activity:<26} {self.ops_per_second:8.1f} ops/s  "
+            f"P99 {self.p99_ms:8.1f} ms  errors {self.errors} "
+            f"({self.error_percent():.2f}%)  [{self.intervals} intervals]"
+        )
+
+    def error_percent(self) -> float:
+        if self.operations == 0:
+            return 0.0
+        return 100.0 * self.errors / self.operations
+
+
+class LiveRunMonitor:
+    """
+    Follows the tracked metric CSVs of a run directory, checking each new
+    interval of an activity against the thresholds (None: not checked).
+    """
+
+    csv_dir: str
+    max_p99_ms: float | None
+    max_error_percent: float | None
+    breach_intervals: int
+    min_operations: int
+    # activity -> metric name -> follower
+    followers: dict[str, dict[str, CSVFollower]]
+    # activity -> intervals checked so far, current streak of breaches
+    checked_intervals: dict[str, int]
+    breach_streaks: dict[str, int]
+
+    def __init__(
+        self,
+        *,
+        csv_dir: str,
+        max_p99_ms: float | None = None,
+        max_error_percent: float | None = None,
+        breach_intervals: int = DEFAULT_BREACH_INTERVALS,
+        min_operations: int = DEFAULT_MIN_OPERATIONS,
+    ) -> None:
+        self.csv_dir = csv_dir
+        self.max_p99_ms = max_p99_ms
+        self.max_error_percent = max_error_percent
+        self.breach_intervals = breach_intervals
+        self.min_operations = min_operations
+        self.followers = {}
+        self.checked_intervals = {}
+        self.breach_streaks = {}
+
+    def _discover_files(self) -> None:
+        if not os.path.isdir(self.csv_dir):
+            return
+        for fname in sorted(os.listdir(self.csv_dir)):
+            a_desc = csv_filename_to_activity_desc(fname)
+            if a_desc is None or not is_useful_activity(a_desc):
+                continue
+            activity_followers = self.followers.setdefault(a_desc["activity"], {})
+            if a_desc["name"] not in activity_followers:
+                activity_followers[a_desc["name"]] = CSVFollower(
+                    fpath=os.path.join(self.csv_dir, fname)
+                )
+
+    def poll(self) -> int:
+        """Pick up new files and lines. Return the number of new intervals."""
+        self._discover_files()
+        return sum(
+            follower.poll()
+            for activity_followers in self.followers.values()
+            for follower in activity_followers.values()
+        )
+
+    def _errors(self, activity: str, interval_i: int) -> tuple[int, int]:
+        # (operations, failed operations) up to an interval of both files
+        activity_followers = self.followers[activity]
+        all_counts = activity_followers[ALL_OPERATIONS_NAME].cumulative_counts
+        operations = int(all_counts[interval_i])
+        success_follower = activity_followers.get(SUCCESSFUL_OPERATIONS_NAME)
+        if success_follower is None:
+            return operations, 0
+        success_counts = success_follower.cumulative_counts
+        if interval_i >= len(success_counts):
+            return operations, 0
+        return operations, max(operations - int(success_counts[interval_i]), 0)
+
+    def _num_intervals(self, activity: str) -> int:
+        # the intervals present in all the files of the activity
+        return min(
+            len(follower.cumulative_counts)
+            for follower in self.followers[activity].values()
+        )
+
+    def statuses(self) -> list[ActivityStatus]:
+        activity_statuses: list[ActivityStatus] = []
+        for activity, activity_followers in sorted(self.followers.items()):
+            all_follower = activity_followers.get(ALL_OPERATIONS_NAME)
+            if all_follower is None or not all_follower.cumulative_counts:
+                continue
+            last_i = len(all_follower.cumulative_counts) - 1
+            # errors as of the latest interval found in all files
+            num_intervals = self._num_intervals(activity)
+            errors = 0
+            if num_intervals > 0:
+                errors = self._errors(activity, num_intervals - 1)[1]
+            activity_statuses.append(
+                ActivityStatus(
+                    activity=activity,
+                    intervals=last_i + 1,
+                    ops_per_second=all_follower.current_rate(),
+                    p99_ms=all_follower.p99_ms(last_i),
+                    operations=int(all_follower.cumulative_counts[last_i]),
+                    errors=errors,
+                )
+            )
+        return activity_statuses
+
+    def check_thresholds(self) -> str | None:
+        """
+        Check the intervals that are new since the previous check. Return the
+        reason for aborting, if some activity breached the thresholds in
+        `breach_intervals` consecutive intervals.
+        """
+        for activity, activity_followers in sorted(self.followers.items()):
+            if ALL_OPERATIONS_NAME not in activity_followers:
+                continue
+            all_follower = activity_followers[ALL_OPERATIONS_NAME]
+            num_intervals = self._num_intervals(activity)
+            for interval_i in range(
+                self.checked_intervals.get(activity, 0), num_intervals
+            ):
+                breaches: list[str] = []
+                p99_ms = all_follower.p99_ms(interval_i)
+                if self.max_p99_ms is not None and p99_ms > self.max_p99_ms:
+                    breaches.append(f"P99 {p99_ms:.1f} ms > {self.max_p99_ms:g} ms")
+                operations, errors = self._errors(activity, interval_i)
+                error_percent = 100.0 * errors / operations if operations else 0.0
+                if (
+                    self.max_error_percent is not None
+                    and operations >= self.min_operations
+                    and error_percent > self.max_error_percent
+                ):
+                    breaches.append(
+                        f"errors {error_percent:.2f}% > {self.max_error_percent:g}%"
+                    )
+                if breaches:
+                    self.breach_streaks[activity] = (
+                        self.breach_streaks.get(activity, 0) + 1
+                    )
+                else:
+                    self.breach_streaks[activity] = 0
+                self.checked_intervals[activity] = interval_i + 1
+                if self.breach_streaks[activity] >= self.breach_intervals:
+                    return (
+                        f"{activity}: {', '.join(breaches)} for "
+                        f"{self.breach_streaks[activity]} consecutive intervals "
+                        f"(up to interval {interval_i + 1})"
+                    )
+        return None
+
+    def summary(self) -> str:
+        lines = [
+            (
+                f"[{datetime.now().strftime('%H:%M:%S')}] "
+                f"{os.path.basename(os.path.normpath(self.csv_dir))}:"
+            )
+        ]
+        lines += [f"    * {a_status}" for a_status in self.statuses()]
+        return "\n".join(lines)
+
+
+def write_abort_file(csv_dir: str, reason: str) -> str:
+    abort_path = os.path.join(csv_dir, ABORT_FILENAME)
+    with open(abort_path, "w") as a_file:
+        a_file.write(f"{reason}\n")
+    return abort_path
+
+
+def _raise_keyboard_interrupt(signum: int, frame: Any) -> None:
+    raise KeyboardInterrupt
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Follow a run being written.")
+    parser.add_argument(
+        "--csv_dir",
+        type=str,
+        required=True,
+        help="The <RUN_TAG>_CSV_<workload> directory nb5 writes to",
+    )
+    parser.add_argument(
+        "--poll_seconds",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help=f"Time between polls (default: {DEFAULT_POLL_SECONDS:g})",
+    )
+    parser.add_argument(
+        "--max_p99_ms",
+        type=float,
+        default=None,
+        help="P99 latency (ms) of an interval above which an activity is breaching",
+    )
+    parser.add_argument(
+        "--max_error_percent",
+        type=float,
+        default=None,
+        help="Percentage of failed operations above which an activity is breaching",
+    )
+    parser.add_argument(
+        "--breach_intervals",
+        type=int,
+        default=DEFAULT_BREACH_INTERVALS,
+        help=(
+            "Consecutive breaching intervals that abort the run "
+            f"(default: {DEFAULT_BREACH_INTERVALS})"
+        ),
+    )
+    parser.add_argument(
+        "--min_operations",
+        type=int,
+        default=DEFAULT_MIN_OPERATIONS,
+        help=(
+            "Operations of an activity before its error rate is checked "
+            f"(default: {DEFAULT_MIN_OPERATIONS})"
+        ),
+    )
+    parser.add_argument(
+        "--idle_timeout",
+        type=float,
+        default=None,
+        help="Stop after this many seconds without new intervals (default: never)",
+    )
+    args = parser.parse_args()
+
+    monitor = LiveRunMonitor(
+        csv_dir=args.csv_dir,
+        max_p99_ms=args.max_p99_ms,
+        max_error_percent=args.max_error_percent,
+        breach_intervals=args.breach_intervals,
+        min_operations=args.min_operations,
+    )
+    print(f"Following '{args.csv_dir}' (every {args.poll_seconds:g} s).")
+    # stopped by run_tests.py (SIGTERM) once the job is over
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    last_new_interval_time = time.perf_counter()
+    try:
+        while True:
+            if monitor.poll() > 0:
+                last_new_interval_time = time.perf_counter()
+                print(monitor.summary(), flush=True)
+                abort_reason = monitor.check_thresholds()
+                if abort_reason is not None:
+                    abort_path = write_abort_file(args.csv_dir, abort_reason)
+                    print(f"** Aborting the run: {abort_reason} (see {abort_path}).")
+                    sys.exit(ABORT_EXIT_CODE)
+            idle_seconds = time.perf_counter() - last_new_interval_time
+            if args.idle_timeout is not None and idle_seconds > args.idle_timeout:
+                print(f"No new intervals in {idle_seconds:.0f} s, stopping.")
+                break
+            time.sleep(args.poll_seconds)
+    except KeyboardInterrupt:
+        pass
+    monitor.poll()
+    print(f"Final status:\n{monitor.summary()}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
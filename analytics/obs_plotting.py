@@ -1,7 +1,15 @@
+import hashlib
+import json
 import os
-from datetime import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any
 
-import matplotlib.pyplot as plt
+from pipeline_profiling import record_item
+from results_table import ConfigObsMapType, MetricSetKeyType
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
 
 
 OBSERVABLES_TO_PRINT = [
@@ -15,90 +23,228 @@ OBSERVABLES_TO_PRINT = [
     "max",
     "mean",
 ]
+OBSERVABLES_TO_PRINT_BY_NAME = {
+    "result": OBSERVABLES_TO_PRINT,
+    # derived metric sets (see derived_metrics): throughput (all operations,
+    # including failed ones) is shown separately from goodput
+    "goodput": ["throughput", "goodput"],
+    "error_rate": ["error_rate"],
+    # capacity from the saturation sweeps (see saturation_sweep)
+    "capacity": ["max_throughput", "knee_throughput"],
+}
 OBS_STYLE_MAP = {
     "mean": "--",
     "median": ":",
+    "throughput": "--",
+    "max_throughput": "--",
 }
-OBS_STYLE_DEFAULT = "*-"
+OBS_MARKER_DEFAULT = "*"
+OBS_STYLE_DEFAULT = f"{OBS_MARKER_DEFAULT}-"
+# markers telling apart the configurations of a segmented series
+CONFIG_MARKERS = [OBS_MARKER_DEFAULT, "o", "s", "^", "v", "D", "P", "X"]
 FIGURE_FORMAT = (20, 8)
-METRIC_NAMES_TO_PLOT = {"result"}  # "result_success" not plotted
-
-def _plot_obs_map(omap: dict[str, tuple[dict[datetime, float], str]]) -> None:
-    for obs in OBSERVABLES_TO_PRINT:
-        if obs in omap and omap[obs][0]:
-            obs_series, obs_unit0 = omap[obs]
-            o_x, o_y0 = list(zip(*(sorted(obs_series.items()))))
-            # apply nanoseconds->milliseconds here.
-            obs_unit: str
-            o_y: list[float]
-            if obs_unit0 == "ns":
-                obs_unit = "ms"
-                o_y = [yval / 1000000.0 for yval in o_y0]
-            else:
-                obs_unit = obs_unit0
-                o_y = o_y0  # type: ignore[assignment]
-            obs_style = OBS_STYLE_MAP.get(obs, OBS_STYLE_DEFAULT)
-            plt.plot(o_x, o_y, obs_style, label=f"{obs} ({obs_unit})")
-    plt.legend()
-    plt.xlabel("Run datetime")
-    plt.ylabel(obs_unit)
+METRIC_NAMES_TO_PLOT = set(OBSERVABLES_TO_PRINT_BY_NAME)  # not "result_success"
+LOG_SCALE_METRIC_NAMES = {"result"}
+PLOT_FINGERPRINTS_FILETITLE = "plot_fingerprints.json"
+# bump this whenever the rendering logic changes (constants are accounted for):
+PLOTTING_LOGIC_VERSION = 2
+
+# title, configuration -> obs_map, log scale, output path
+FigureJobType = tuple[str, ConfigObsMapType, bool, str]
+
+
+def _plot_config_obs_map(ax: "Axes", comap: ConfigObsMapType) -> None:
+    # observables are plotted in the order found in the map. With several
+    # configurations, an observable keeps its color across them and each
+    # configuration has its own marker
+    obs_colors: dict[str, Any] = {}
+    for config_i, (configuration, omap) in enumerate(comap.items()):
+        for obs, (obs_series, obs_unit0) in omap.items():
+            if obs_series:
+                o_x, o_y0 = list(zip(*(sorted(obs_series.items()))))
+                # apply nanoseconds->milliseconds here.
+                obs_unit: str
+                o_y: list[float]
+                if obs_unit0 == "ns":
+                    obs_unit = "ms"
+                    o_y = [yval / 1000000.0 for yval in o_y0]
+                else:
+                    obs_unit = obs_unit0
+                    o_y = o_y0  # type: ignore[assignment]
+                obs_style = OBS_STYLE_MAP.get(obs, OBS_STYLE_DEFAULT)
+                if len(comap) > 1:
+                    config_marker = CONFIG_MARKERS[config_i % len(CONFIG_MARKERS)]
+                    obs_lines = ax.plot(
+                        o_x,
+                        o_y,
+                        f"{config_marker}{obs_style.lstrip(OBS_MARKER_DEFAULT)}",
+                        label=f"{obs} ({obs_unit}) [{configuration}]",
+                        color=obs_colors.get(obs),
+                    )
+                    obs_colors.setdefault(obs, obs_lines[0].get_color())
+                else:
+                    ax.plot(o_x, o_y, obs_style, label=f"{obs} ({obs_unit})")
+    ax.legend()
+    ax.set_xlabel("Run datetime")
+    ax.set_ylabel(obs_unit)
+
+
+def render_figure(figure_job: FigureJobType) -> float:
+    """
+    Render a figure to file, returning the elapsed time (seconds).
+
+    This uses the object-oriented API only (no pyplot global state), hence
+    can run in worker processes; the figure is freed as soon as it is saved.
+    """
+    # matplotlib is only imported when rendering (its import is slow, and
+    # not needed at all when plots are skipped)
+    from matplotlib.figure import Figure
+
+    t0 = time.perf_counter()
+    plot_title, config_obs_map, log_scale, fig_path = figure_job
+    fig = Figure(figsize=FIGURE_FORMAT)
+    ax = fig.add_subplot()
+    _plot_config_obs_map(ax, config_obs_map)
+    if log_scale:
+        ax.set_title(f"{plot_title} -- Log scale")
+        ax.set_yscale("log")
+        ax.grid(True, which="both", axis="y")
+    else:
+        ax.set_title(plot_title)
+        ax.set_ylim(bottom=0)
+        ax.grid()
+    fig.savefig(fig_path, bbox_inches="tight")
+    fig.clear()
+    return time.perf_counter() - t0
+
+
+def figure_job_fingerprint(figure_job: FigureJobType) -> str:
+    """
+    A digest of everything that determines the figure produced by a job:
+    data points, units, title, scale and plotting settings.
+    """
+    plot_title, config_obs_map, log_scale, _ = figure_job
+    fingerprint_data = {
+        "logic_version": PLOTTING_LOGIC_VERSION,
+        "observables_to_print": OBSERVABLES_TO_PRINT_BY_NAME,
+        "obs_style_map": OBS_STYLE_MAP,
+        "obs_style_default": OBS_STYLE_DEFAULT,
+        "config_markers": CONFIG_MARKERS,
+        "figure_format": list(FIGURE_FORMAT),
+        "title": plot_title,
+        "log_scale": log_scale,
+        "config_obs_map": {
+            _co: {
+                _ob: [
+                    [[_da.isoformat(), _va] for _da, _va in sorted(ob_series.items())],
+                    ob_unit,
+                ]
+                for _ob, (ob_series, ob_unit) in obs_map.items()
+            }
+            for _co, obs_map in config_obs_map.items()
+        },
+    }
+    fingerprint_json = json.dumps(fingerprint_data, sort_keys=True)
+    return hashlib.sha256(fingerprint_json.encode()).hexdigest()
+
+
+def _load_plot_fingerprints(fingerprints_filename: str) -> dict[str, str]:
+    if not os.path.isfile(fingerprints_filename):
+        return {}
+    with open(fingerprints_filename) as f_file:
+        return json.load(f_file)
 
 
 def plot_observables(
-    tree: dict[
-        str,
-        dict[str, dict[str, dict[str, dict[str, tuple[dict[datetime, float], str]]]]],
-    ],
+    config_series_map: dict[MetricSetKeyType, ConfigObsMapType],
     out_dir: str,
+    workers: int = 1,
+    incremental: bool = False,
 ) -> dict[str, dict[str, dict[str, dict[str, list[tuple[str, str]]]]]]:
+    """
+    Render the plots for all (workload, scenario, activity, name) in the
+    series map (as grouped by the results table, split by configuration:
+    each configuration is plotted as a separate series) and return a map
+        workload->scenario->activity->name->[(file name, file path), ...]
+
+    The fingerprints of all figures are stored in the output directory: with
+    `incremental`, figures whose fingerprint is unchanged (and whose file
+    exists) are not rendered again.
+    """
     gen_files: dict[str, dict[str, dict[str, dict[str, list[tuple[str, str]]]]]] = {}
+    figure_jobs: list[FigureJobType] = []
     print(f"\nPlotting to '{out_dir}' ...")
-    # workload->scenario->activity->name->observable->[date->value, unit]
-    for _wl, v_wl in tree.items():
-        if _wl not in gen_files:
-            gen_files[_wl] = {}
-        for _sc, v_sc in v_wl.items():
-            if _sc not in gen_files[_wl]:
-                gen_files[_wl][_sc] = {}
-            for _ac, v_ac in v_sc.items():
-                if _ac not in gen_files[_wl][_sc]:
-                    gen_files[_wl][_sc][_ac] = {}
-                for _na, v_na in v_ac.items():
-                    if _na in METRIC_NAMES_TO_PLOT:
-                        if _na not in gen_files[_wl][_sc][_ac]:
-                            gen_files[_wl][_sc][_ac][_na] = []
-                        # this becomes a single plot with the various curves at once.
-                        # select the observables actually to print
-                        obs_map = {
-                            _ob: v_ob
-                            for _ob, v_ob in v_na.items()
-                            if _ob in OBSERVABLES_TO_PRINT
-                            if v_ob[0]
-                        }
-                        if obs_map:
-                            plot_title = f"{_wl} / {_sc} / {_ac} / {_na}"
-                            plot_fileroot = f"{_wl}~{_sc}~{_ac}~{_na}"
-
-                            fig0 = plt.figure(figsize=FIGURE_FORMAT)
-                            _plot_obs_map(obs_map)
-                            plt.title(plot_title)
-                            plt.ylim((0, None))
-                            plt.grid()
-                            fig_name0 = f"{plot_fileroot}.png"
-                            fig_path0 = os.path.join(out_dir, fig_name0)
-                            fig0.savefig(fig_path0, bbox_inches="tight")
-                            print(f"    * {fig_name0}")
-                            gen_files[_wl][_sc][_ac][_na].append((fig_name0, fig_path0))
-
-                            fig1 = plt.figure(figsize=FIGURE_FORMAT)
-                            _plot_obs_map(obs_map)
-                            plt.title(f"{plot_title} -- Log scale")
-                            plt.yscale("log")
-                            plt.grid(True, which="both", axis="y")
-                            fig_name1 = f"{plot_fileroot}_LOG.png"
-                            fig_path1 = os.path.join(out_dir, fig_name1)
-                            fig1.savefig(fig_path1, bbox_inches="tight")
-                            print(f"    * {fig_name1}")
-                            gen_files[_wl][_sc][_ac][_na].append((fig_name1, fig_path1))
+    for (_wl, _sc, _ac, _na), co_na in config_series_map.items():
+        ac_files = gen_files.setdefault(_wl, {}).setdefault(_sc, {}).setdefault(_ac, {})
+        if _na in METRIC_NAMES_TO_PLOT:
+            na_files = ac_files.setdefault(_na, [])
+            # this becomes a single plot with the various curves at once.
+            # select the observables actually to print (in print order)
+            config_obs_map: ConfigObsMapType = {}
+            for _co, v_na in co_na.items():
+                obs_map = {
+                    _ob: v_na[_ob]
+                    for _ob in OBSERVABLES_TO_PRINT_BY_NAME[_na]
+                    if _ob in v_na
+                    if v_na[_ob][0]
+                }
+                if obs_map:
+                    config_obs_map[_co] = obs_map
+            if config_obs_map:
+                plot_title = f"{_wl} / {_sc} / {_ac} / {_na}"
+                plot_fileroot = f"{_wl}~{_sc}~{_ac}~{_na}"
+
+                fig_name0 = f"{plot_fileroot}.png"
+                fig_path0 = os.path.join(out_dir, fig_name0)
+                figure_jobs.append((plot_title, config_obs_map, False, fig_path0))
+                na_files.append((fig_name0, fig_path0))
+
+                if _na in LOG_SCALE_METRIC_NAMES:
+                    fig_name1 = f"{plot_fileroot}_LOG.png"
+                    fig_path1 = os.path.join(out_dir, fig_name1)
+                    figure_jobs.append((plot_title, config_obs_map, True, fig_path1))
+                    na_files.append((fig_name1, fig_path1))
+
+    # determine what needs rendering
+    fingerprints_filename = os.path.join(out_dir, PLOT_FINGERPRINTS_FILETITLE)
+    fingerprints = {
+        os.path.basename(figure_job[3]): figure_job_fingerprint(figure_job)
+        for figure_job in figure_jobs
+    }
+    jobs_to_render: list[FigureJobType]
+    if incremental:
+        old_fingerprints = _load_plot_fingerprints(fingerprints_filename)
+        jobs_to_render = [
+            figure_job
+            for figure_job in figure_jobs
+            if (fig_name := os.path.basename(figure_job[3])) not in old_fingerprints
+            or old_fingerprints[fig_name] != fingerprints[fig_name]
+            or not os.path.isfile(figure_job[3])
+        ]
+        print(
+            f"    Reusing {len(figure_jobs) - len(jobs_to_render)} unchanged "
+            f"figures, {len(jobs_to_render)} to render."
+        )
+    else:
+        jobs_to_render = figure_jobs
+
+    # render figures (in a pool of processes if so requested)
+    render_times: list[float]
+    t0 = time.perf_counter()
+    if workers == 1 or len(jobs_to_render) <= 1:
+        render_times = [render_figure(figure_job) for figure_job in jobs_to_render]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            render_times = list(executor.map(render_figure, jobs_to_render))
+    for (_, _, _, fig_path), render_time in zip(jobs_to_render, render_times):
+        print(f"    * {os.path.basename(fig_path)} ({render_time:.2f} s)")
+        record_item("figure", os.path.basename(fig_path), render_time)
+    print(
+        f"Rendered {len(jobs_to_render)} figures in {time.perf_counter() - t0:.2f} s "
+        f"({sum(render_times):.2f} s total render time, {workers} workers)."
+    )
+
+    with open(fingerprints_filename, "w") as f_file:
+        json.dump(fingerprints, f_file, indent=2, sort_keys=True)
 
     return gen_files
@@ -1,9 +1,25 @@
+import hashlib
+import io
 import os
+import tarfile
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import datetime
+from typing import TextIO
 
 DATE_FORMAT = "%Y-%m-%d_%H_%M_%S_"
 DATE_TAG_LEN = 20
 METAPARAMETERS_FILENAME = "metaparameters.log"
+HISTOGRAM_LOG_FILENAME = "histograms.hlog"
+# kinds of run directories: <date>_<kind>_<workload>
+RUN_DIR_KIND = "CSV"
+SWEEP_DIR_KIND = "SWEEP"
+SWEEP_STEP_DIR_PREFIX = "step_"
+# a run directory packed as a single file (see run_tests.py --pack_runs)
+RUN_ARCHIVE_SUFFIX = ".tar.gz"
+
+# (archive path, file name -> contents) of the run archive being read, if any
+_loaded_run_archive: tuple[str, dict[str, bytes]] | None = None
 
 
 def try_parse_date_tag(dtag) -> datetime | None:
@@ -13,12 +29,15 @@ def try_parse_date_tag(dtag) -> datetime | None:
         return None
 
 
-def try_parse_dir_name(dir_name: str) -> tuple[datetime, str] | None:
+def try_parse_dir_name(
+    dir_name: str, dir_kind: str = RUN_DIR_KIND
+) -> tuple[datetime, str] | None:
     dir_date = try_parse_date_tag(dir_name[:DATE_TAG_LEN])
     if dir_date:
         dir_residual = dir_name[DATE_TAG_LEN:]
-        if dir_residual[:4] == "CSV_":
-            dir_run_name = dir_residual[4:]
+        kind_prefix = f"{dir_kind}_"
+        if dir_residual[: len(kind_prefix)] == kind_prefix:
+            dir_run_name = dir_residual[len(kind_prefix) :]
             if dir_run_name:
                 return (dir_date, dir_run_name)
             else:
@@ -30,17 +49,179 @@ def try_parse_dir_name(dir_name: str) -> tuple[datetime, str] | None:
 
 
 def get_input_runs(src_dir: str) -> dict[str, tuple[datetime, str]]:
+    """
+    The run directories, and run archives, found in src_dir. A run found as
+    both directory and archive is taken from the directory.
+    """
     ls_full = os.listdir(src_dir)
-    return {
+    input_runs = {
         full_dir_name: dir_parsed_pair
         for dir_name in ls_full
         if os.path.isdir(full_dir_name := os.path.join(src_dir, dir_name))
         if (dir_parsed_pair := try_parse_dir_name(dir_name)) is not None
     }
+    for archive_name in ls_full:
+        if not archive_name.endswith(RUN_ARCHIVE_SUFFIX):
+            continue
+        run_name = archive_name[: -len(RUN_ARCHIVE_SUFFIX)]
+        if os.path.join(src_dir, run_name) in input_runs:
+            continue
+        full_archive_name = os.path.join(src_dir, archive_name)
+        if (
+            is_run_archive(full_archive_name)
+            and (archive_parsed_pair := try_parse_dir_name(run_name)) is not None
+        ):
+            input_runs[full_archive_name] = archive_parsed_pair
+    return input_runs
+
+
+def get_input_sweeps(src_dir: str) -> dict[str, tuple[datetime, str]]:
+    ls_full = os.listdir(src_dir)
+    return {
+        full_dir_name: dir_parsed_pair
+        for dir_name in ls_full
+        if os.path.isdir(full_dir_name := os.path.join(src_dir, dir_name))
+        if (dir_parsed_pair := try_parse_dir_name(dir_name, SWEEP_DIR_KIND)) is not None
+    }
+
+
+def get_sweep_step_dirs(sweep_dir: str) -> list[str]:
+    """The step subdirectories of a sweep directory, in step order."""
+    return [
+        full_dir_name
+        for dir_name in sorted(os.listdir(sweep_dir))
+        if dir_name.startswith(SWEEP_STEP_DIR_PREFIX)
+        if os.path.isdir(full_dir_name := os.path.join(sweep_dir, dir_name))
+    ]
+
+
+def is_run_archive(src_path: str) -> bool:
+    return src_path.endswith(RUN_ARCHIVE_SUFFIX) and os.path.isfile(src_path)
+
+
+def get_run_name(src_path: str) -> str:
+    """The name of a run directory, also when given as a run archive."""
+    run_name = os.path.basename(os.path.normpath(src_path))
+    if run_name.endswith(RUN_ARCHIVE_SUFFIX):
+        return run_name[: -len(RUN_ARCHIVE_SUFFIX)]
+    return run_name
+
+
+def _archive_file_name(member: tarfile.TarInfo) -> str | None:
+    # the files of the run are found at the top level, or one directory down
+    # (when packed along with the run directory itself)
+    name_parts = member.name.strip("/").split("/")
+    if member.isfile() and len(name_parts) <= 2:
+        return name_parts[-1]
+    return None
+
+
+def read_run_archive(archive_path: str) -> dict[str, bytes]:
+    """All files of a run archive, read in a single sequential pass."""
+    archive_files: dict[str, bytes] = {}
+    with tarfile.open(archive_path, "r|gz") as tar:
+        for member in tar:
+            fname = _archive_file_name(member)
+            if fname is not None and (f_data := tar.extractfile(member)) is not None:
+                archive_files[fname] = f_data.read()
+    return archive_files
+
+
+@contextmanager
+def reading_run_archive(src_path: str) -> Iterator[None]:
+    """
+    If src_path is a run archive, read it whole (in memory, no extraction)
+    and serve its files from there within the block. No-op for directories.
+    """
+    global _loaded_run_archive
+    if not is_run_archive(src_path):
+        yield
+        return
+    _loaded_run_archive = (src_path, read_run_archive(src_path))
+    try:
+        yield
+    finally:
+        _loaded_run_archive = None
+
+
+def list_run_files(src_path: str) -> list[str]:
+    """The names of the files of a run directory (or run archive)."""
+    if is_run_archive(src_path):
+        if _loaded_run_archive is not None and _loaded_run_archive[0] == src_path:
+            return sorted(_loaded_run_archive[1])
+        with tarfile.open(src_path, "r:gz") as tar:
+            return sorted(
+                fname
+                for member in tar.getmembers()
+                if (fname := _archive_file_name(member)) is not None
+            )
+    return sorted(
+        fname
+        for fname in os.listdir(src_path)
+        if os.path.isfile(os.path.join(src_path, fname))
+    )
+
+
+def open_run_file(fpath: str) -> TextIO:
+    """
+    Open a file of a run for reading: a regular file, or a file of a run
+    archive (addressed as '<archive path>/<file name>').
+    """
+    archive_path, fname = os.path.split(fpath)
+    if not is_run_archive(archive_path):
+        return open(fpath)
+    if _loaded_run_archive is not None and _loaded_run_archive[0] == archive_path:
+        f_bytes = _loaded_run_archive[1].get(fname)
+    else:
+        # outside reading_run_archive: look the file up (slower)
+        with tarfile.open(archive_path, "r:gz") as tar:
+            f_bytes = None
+            for member in tar.getmembers():
+                if _archive_file_name(member) == fname:
+                    if (f_data := tar.extractfile(member)) is not None:
+                        f_bytes = f_data.read()
+                    break
+    if f_bytes is None:
+        raise FileNotFoundError(f"No file '{fname}' in run archive {archive_path}")
+    return io.StringIO(f_bytes.decode())
+
+
+def run_file_exists(src_path: str, fname: str) -> bool:
+    if is_run_archive(src_path):
+        return fname in list_run_files(src_path)
+    return os.path.isfile(os.path.join(src_path, fname))
 
 
 def locate_metaparameters_filename(src_dir: str) -> str | None:
-    if os.path.isfile(os.path.join(src_dir, METAPARAMETERS_FILENAME)):
+    if run_file_exists(src_dir, METAPARAMETERS_FILENAME):
         return METAPARAMETERS_FILENAME
     else:
         return None
+
+
+def locate_histogram_log_filename(src_dir: str) -> str | None:
+    if run_file_exists(src_dir, HISTOGRAM_LOG_FILENAME):
+        return HISTOGRAM_LOG_FILENAME
+    else:
+        return None
+
+
+def get_dir_fingerprint(src_dir: str) -> str:
+    """
+    A digest of the (top-level) files in a directory, based on their
+    names, sizes and modification times. Contents are not read.
+    For a run archive, this is based on the archive file itself.
+    """
+    file_stats: list[tuple[str, int, int]] = []
+    if is_run_archive(src_dir):
+        a_stat = os.stat(src_dir)
+        file_stats.append(
+            (os.path.basename(src_dir), a_stat.st_size, a_stat.st_mtime_ns)
+        )
+        return hashlib.sha256(repr(file_stats).encode()).hexdigest()
+    for fname in sorted(os.listdir(src_dir)):
+        fpath = os.path.join(src_dir, fname)
+        if os.path.isfile(fpath):
+            f_stat = os.stat(fpath)
+            file_stats.append((fname, f_stat.st_size, f_stat.st_mtime_ns))
+    return hashlib.sha256(repr(file_stats).encode()).hexdigest()
@@ -0,0 +1,124 @@
+import json
+import os
+from typing import Any
+
+from os_lib import get_dir_fingerprint, get_run_name
+from steady_state import TrimSpec
+from summary_parsing import ParsedRun, get_parsing_fingerprint, parse_run_dirs
+
+PARSE_CACHE_FORMAT_VERSION = 1
+
+
+class ParseCache:
+    """
+    An on-disk cache of parsed run directories, to avoid re-parsing
+    (immutable) old runs at every analysis.
+
+    Entries are keyed by directory name and are valid as long as both the
+    directory fingerprint (file names, sizes, mtimes) and the parsing
+    fingerprint (constants and logic of summary_parsing) are unchanged.
+    """
+
+    filename: str
+    trim_spec: TrimSpec | None
+    parsing_fingerprint: str
+    entries: dict[str, dict[str, Any]]
+    hits: int
+    misses: int
+
+    def __init__(
+        self,
+        filename: str,
+        *,
+        rebuild: bool = False,
+        trim_spec: TrimSpec | None = None,
+    ) -> None:
+        self.filename = filename
+        self.trim_spec = trim_spec
+        self.parsing_fingerprint = get_parsing_fingerprint(trim_spec)
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if rebuild:
+            print(f"Parse cache: rebuilding from scratch ({self.filename}).")
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.filename):
+            print(f"Parse cache: no cache file found ({self.filename}).")
+            return
+        try:
+            with open(self.filename) as c_file:
+                cache_content = json.load(c_file)
+        except (OSError, ValueError) as exc:
+            print(f"** Parse cache: could not read {self.filename} ({exc}), ignoring.")
+            return
+        if cache_content.get("format_version") != PARSE_CACHE_FORMAT_VERSION:
+            print("Parse cache: format version changed, cache discarded.")
+            return
+        if cache_content.get("parsing_fingerprint") != self.parsing_fingerprint:
+            print("Parse cache: parsing settings changed, cache discarded.")
+            return
+        self.entries = cache_content["entries"]
+        print(f"Parse cache: loaded {len(self.entries)} entries from {self.filename}.")
+
+    def get_parsed_runs(
+        self, src_dirs: list[str], *, workers: int = 1, streaming: bool = False
+    ) -> dict[str, ParsedRun]:
+        """
+        Return the parsed runs for several directories, from cache where
+        possible. Cache misses are parsed (with the requested number of worker
+        processes) and the results stored in the cache.
+        """
+        parsed_runs: dict[str, ParsedRun] = {}
+        dirs_to_parse: list[tuple[str, str, str]] = []
+        for src_dir in src_dirs:
+            dir_name = get_run_name(src_dir)
+            dir_fingerprint = get_dir_fingerprint(src_dir)
+            entry = self.entries.get(dir_name)
+            if entry is not None and entry["dir_fingerprint"] == dir_fingerprint:
+                self.hits += 1
+                parsed_runs[src_dir] = ParsedRun.from_dict(entry["parsed_run"])
+            else:
+                self.misses += 1
+                dirs_to_parse.append((src_dir, dir_name, dir_fingerprint))
+
+        newly_parsed_runs = parse_run_dirs(
+            [src_dir for src_dir, _, _ in dirs_to_parse],
+            workers=workers,
+            streaming=streaming,
+            trim_spec=self.trim_spec,
+        )
+        for src_dir, dir_name, dir_fingerprint in dirs_to_parse:
+            parsed_run = newly_parsed_runs[src_dir]
+            self.entries[dir_name] = {
+                "dir_fingerprint": dir_fingerprint,
+                "parsed_run": parsed_run.to_dict(),
+            }
+            parsed_runs[src_dir] = parsed_run
+
+        return {src_dir: parsed_runs[src_dir] for src_dir in src_dirs}
+
+    def prune(self, keep_dir_names: set[str]) -> None:
+        """Drop entries for directories no longer found in the input."""
+        self.entries = {
+            dir_name: entry
+            for dir_name, entry in self.entries.items()
+            if dir_name in keep_dir_names
+        }
+
+    def save(self) -> None:
+        cache_content = {
+            "format_version": PARSE_CACHE_FORMAT_VERSION,
+            "parsing_fingerprint": self.parsing_fingerprint,
+            "entries": self.entries,
+        }
+        # write-then-rename so that an interrupted run leaves no corrupt cache
+        tmp_filename = f"{self.filename}.tmp"
+        with open(tmp_filename, "w") as c_file:
+            json.dump(cache_content, c_file, sort_keys=True)
+        os.replace(tmp_filename, self.filename)
+
+    def report(self) -> str:
+        return f"Parse cache: {self.hits} hits, {self.misses} misses."
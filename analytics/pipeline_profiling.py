@@ -0,0 +1,266 @@
+"""
+Instrumentation of the analysis pipeline itself (see --profile): wall time,
+CPU time, peak resident memory and item counts of each stage, plus the
+timings of single items within stages (CSV files, run directories, figures,
+HTTP requests).
+
+Items are reported with `record_item`, which does nothing unless a profiler
+is active, so the instrumented functions need no extra arguments. Worker
+processes collect their items with `capture_items` and return them to the
+parent process, which passes them on with `record_items`.
+"""
+
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any
+from zoneinfo import ZoneInfo
+
+PIPELINE_TIMINGS_FORMAT_VERSION = 1
+# only the slowest items of each kind are kept in the timings file
+SLOWEST_ITEMS_KEPT = 50
+# past runs kept (as stage wall times) in the timings file, for trends
+TIMINGS_HISTORY_LENGTH = 500
+TIMINGS_DATE_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+
+# kind, name, seconds
+ItemTimingType = tuple[str, str, float]
+
+# where record_item sends items (None: not profiling)
+_item_sink: list[ItemTimingType] | None = None
+
+
+def peak_rss_mb() -> float:
+    """The peak resident memory of this process so far."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _cpu_seconds() -> float:
+    # this process and its (terminated) children, e.g. worker pools
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        self_usage.ru_utime
+        + self_usage.ru_stime
+        + children_usage.ru_utime
+        + children_usage.ru_stime
+    )
+
+
+def record_item(kind: str, name: str, seconds: float) -> None:
+    """Record the timing of an item (e.g. a file), if profiling."""
+    if _item_sink is not None:
+        _item_sink.append((kind, name, seconds))
+
+
+def record_items(item_timings: list[ItemTimingType]) -> None:
+    """Record item timings collected elsewhere (e.g. in a worker process)."""
+    if _item_sink is not None:
+        _item_sink.extend(item_timings)
+
+
+@contextmanager
+def capture_items() -> Iterator[list[ItemTimingType]]:
+    """Collect the items recorded within the block into the yielded list."""
+    global _item_sink
+    previous_sink = _item_sink
+    captured_items: list[ItemTimingType] = []
+    _item_sink = captured_items
+    try:
+        yield captured_items
+    finally:
+        _item_sink = previous_sink
+
+
+class StageTiming:
+    """
+    The measurements of a pipeline stage. CPU time includes the worker
+    processes, peak memory is that of the main process (a high-water mark).
+    """
+
+    stage: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_mb: float
+    counts: dict[str, int]
+
+    def __init__(self, *, stage: str) -> None:
+        self.stage = stage
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.counts = {}
+
+    def __repr__(self) -> str:
+        counts_str = ", ".join(
+            f"{c_name}={c_val}" for c_name, c_val in self.counts.items()
+        )
+        return (
+            f"{self.stage:<18} {self.wall_seconds:8.3f} s wall "
+            f"{self.cpu_seconds:8.3f} s cpu {self.peak_rss_mb:8.1f} MB"
+            + (f" ({counts_str})" if counts_str else "")
+        )
+
+    def count(self, count_name: str, num_items: int) -> None:
+        self.counts[count_name] = num_items
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_mb": self.peak_rss_mb,
+            "counts": self.counts,
+        }
+
+
+class PipelineProfiler:
+    """
+    Measures the stages of the pipeline (`with profiler.stage(...)`), and
+    collects item timings once activated. A disabled profiler measures nothing.
+    With `cprofile`, each stage runs under cProfile and the profile of the
+    slowest stage is kept (timings then include the cProfile overhead).
+    """
+
+    enabled: bool
+    cprofile: bool
+    started_at: datetime
+    stages: list[StageTiming]
+    items: list[ItemTimingType]
+    stage_profiles: dict[str, cProfile.Profile]
+
+    def __init__(self, *, enabled: bool = True, cprofile: bool = False) -> None:
+        self.enabled = enabled
+        self.cprofile = cprofile
+        self.started_at = datetime.now(ZoneInfo("UTC"))
+        self.stages = []
+        self.items = []
+        self.stage_profiles = {}
+
+    def activate(self) -> None:
+        """Start collecting the item timings reported by instrumented code."""
+        global _item_sink
+        if self.enabled:
+            _item_sink = self.items
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[StageTiming]:
+        stage_timing = StageTiming(stage=stage)
+        if not self.enabled:
+            yield stage_timing
+            return
+        profile = cProfile.Profile() if self.cprofile else None
+        wall_t0 = time.perf_counter()
+        cpu_t0 = _cpu_seconds()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield stage_timing
+        finally:
+            if profile is not None:
+                profile.disable()
+                self.stage_profiles[stage] = profile
+            stage_timing.wall_seconds = time.perf_counter() - wall_t0
+            stage_timing.cpu_seconds = _cpu_seconds() - cpu_t0
+            stage_timing.peak_rss_mb = peak_rss_mb()
+            self.stages.append(stage_timing)
+
+    def slowest_stage(self) -> StageTiming | None:
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda s_timing: s_timing.wall_seconds)
+
+    def item_summary(self) -> dict[str, dict[str, Any]]:
+        """Per kind of item: count, total and slowest timings."""
+        items_by_kind: dict[str, list[tuple[str, float]]] = {}
+        for kind, name, seconds in self.items:
+            items_by_kind.setdefault(kind, []).append((name, seconds))
+        summary: dict[str, dict[str, Any]] = {}
+        for kind, kind_items in sorted(items_by_kind.items()):
+            slowest_items = sorted(kind_items, key=lambda item: -item[1])
+            summary[kind] = {
+                "count": len(kind_items),
+                "total_seconds": sum(seconds for _, seconds in kind_items),
+                "slowest": [
+                    {"name": name, "seconds": seconds}
+                    for name, seconds in slowest_items[:SLOWEST_ITEMS_KEPT]
+                ],
+            }
+        return summary
+
+    def report(self) -> str:
+        lines = ["Pipeline stages:"]
+        lines += [f"    * {s_timing}" for s_timing in self.stages]
+        for kind, k_summary in self.item_summary().items():
+            lines.append(
+                f"    {k_summary['count']} x {kind}: "
+                f"{k_summary['total_seconds']:.3f} s in total"
+            )
+        return "\n".join(lines)
+
+    def write(self, filename: str, cprofile_filename: str | None = None) -> None:
+        """
+        Write the timings file, carrying over the history of the previous
+        one, and the cProfile dump of the slowest stage (if profiled).
+        """
+        history: list[dict[str, Any]] = []
+        if os.path.isfile(filename):
+            with open(filename) as t_file:
+                previous_timings = json.load(t_file)
+            previous_version = previous_timings.get("format_version")
+            if previous_version == PIPELINE_TIMINGS_FORMAT_VERSION:
+                history = previous_timings.get("history", [])
+        started_at_str = self.started_at.strftime(TIMINGS_DATE_FORMAT)
+        history.append(
+            {
+                "started_at": started_at_str,
+                "wall_seconds": sum(s_timing.wall_seconds for s_timing in self.stages),
+                "stages": {
+                    s_timing.stage: s_timing.wall_seconds for s_timing in self.stages
+                },
+            }
+        )
+
+        cprofile_info: dict[str, str] | None = None
+        slowest_stage = self.slowest_stage()
+        if (
+            cprofile_filename is not None
+            and slowest_stage is not None
+            and slowest_stage.stage in self.stage_profiles
+        ):
+            self.stage_profiles[slowest_stage.stage].dump_stats(cprofile_filename)
+            cprofile_info = {
+                "stage": slowest_stage.stage,
+                "file": os.path.basename(cprofile_filename),
+            }
+            print(
+                f"cProfile of the slowest stage ('{slowest_stage.stage}') "
+                f"written to '{cprofile_filename}'."
+            )
+
+        timings = {
+            "format_version": PIPELINE_TIMINGS_FORMAT_VERSION,
+            "started_at": started_at_str,
+            "cprofile": cprofile_info,
+            "total": {
+                "wall_seconds": sum(s_timing.wall_seconds for s_timing in self.stages),
+                "cpu_seconds": sum(s_timing.cpu_seconds for s_timing in self.stages),
+                "peak_rss_mb": max(
+                    [s_timing.peak_rss_mb for s_timing in self.stages], default=0.0
+                ),
+            },
+            "stages": [s_timing.to_dict() for s_timing in self.stages],
+            "items": self.item_summary(),
+            "history": history[-TIMINGS_HISTORY_LENGTH:],
+        }
+        with open(filename, "w") as t_file:
+            json.dump(timings, t_file, indent=2)
+        print(f"Pipeline timings written to '{filename}'.")
@@ -0,0 +1,222 @@
+import json
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from results_table import ConfigObsMapType, MetricSetKeyType, date_to_string
+
+# observable -> direction of a regression (+1: increase is bad, -1: decrease is bad)
+REGRESSION_OBSERVABLES = {
+    "P990": +1,
+    "rate_mean": -1,
+    "knee_throughput": -1,
+}
+REGRESSION_METRIC_NAMES = {"result", "capacity"}
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+DEFAULT_BASELINE_WINDOW = 7
+DEFAULT_Z_THRESHOLD = 3.0
+# scales the median absolute deviation to a standard-deviation estimate
+MAD_TO_SIGMA = 1.4826
+REGRESSION_REPORT_FORMAT_VERSION = 2
+
+
+class Regression:
+    workload: str
+    scenario: str
+    activity: str
+    name: str
+    observable: str
+    run_date: datetime
+    value: float
+    baseline: float
+    relative_change: float
+    z_score: float
+    unit: str
+    is_latest: bool
+    configuration: str
+
+    def __init__(
+        self,
+        *,
+        metric_set_key: MetricSetKeyType,
+        observable: str,
+        run_date: datetime,
+        value: float,
+        baseline: float,
+        relative_change: float,
+        z_score: float,
+        unit: str,
+        is_latest: bool,
+        configuration: str = "",
+    ) -> None:
+        self.workload, self.scenario, self.activity, self.name = metric_set_key
+        self.observable = observable
+        self.run_date = run_date
+        self.value = value
+        self.baseline = baseline
+        self.relative_change = relative_change
+        self.z_score = z_score
+        self.unit = unit
+        self.is_latest = is_latest
+        self.configuration = configuration
+
+    def __repr__(self) -> str:
+        _desc = f"{self.workload}/{self.scenario}/{self.activity}/{self.name}"
+        if self.configuration:
+            _desc = f"{_desc}[{self.configuration}]"
+        return (
+            f"Regression({_desc}/{self.observable} @ {date_to_string(self.run_date)}: "
+            f"{self.baseline:.6g} -> {self.value:.6g} {self.unit}, "
+            f"{self.relative_change:+.1%})"
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "workload": self.workload,
+            "scenario": self.scenario,
+            "activity": self.activity,
+            "name": self.name,
+            "observable": self.observable,
+            "run_date": date_to_string(self.run_date),
+            "value": self.value,
+            "baseline": self.baseline,
+            "relative_change": self.relative_change,
+            # JSON has no infinity (z is infinite over a perfectly flat baseline)
+            "z_score": self.z_score if np.isfinite(self.z_score) else None,
+            "unit": self.unit,
+            "is_latest": self.is_latest,
+            "configuration": self.configuration,
+        }
+
+
+def detect_series_regressions(
+    values: np.ndarray,
+    direction: int,
+    *,
+    window: int,
+    threshold: float,
+    z_threshold: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compare each value of a series with the rolling baseline (median) of the
+    `window` values preceding it. A value is flagged when it moves in the
+    `direction` of a regression by more than `threshold` (relative) and is an
+    outlier with respect to the baseline spread (robust z-score, based on the
+    median absolute deviation, above `z_threshold`).
+
+    The first `window` values, lacking a full baseline, are never flagged.
+    Return (flagged indices, baselines, relative changes, z-scores), the last
+    three being aligned with the flagged indices.
+    """
+    if len(values) <= window:
+        empty = np.empty(0)
+        return np.empty(0, dtype=int), empty, empty, empty
+    # row i holds the `window` values preceding values[window + i]
+    history = sliding_window_view(values[:-1], window)
+    current = values[window:]
+    baselines = np.median(history, axis=1)
+    spreads = MAD_TO_SIGMA * np.median(
+        np.abs(history - baselines[:, np.newaxis]), axis=1
+    )
+    deltas = direction * (current - baselines)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative_changes = np.where(baselines != 0, deltas / np.abs(baselines), 0.0)
+        z_scores = np.where(
+            spreads > 0, deltas / spreads, np.where(deltas > 0, np.inf, 0.0)
+        )
+    flagged = np.flatnonzero((relative_changes > threshold) & (z_scores > z_threshold))
+    return (
+        flagged + window,
+        baselines[flagged],
+        direction * relative_changes[flagged],
+        z_scores[flagged],
+    )
+
+
+def detect_regressions(
+    config_series_map: dict[MetricSetKeyType, ConfigObsMapType],
+    *,
+    window: int = DEFAULT_BASELINE_WINDOW,
+    threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+    z_threshold: float = DEFAULT_Z_THRESHOLD,
+) -> list[Regression]:
+    """
+    Run the regression test over all tracked (metric set, observable) series,
+    each run configuration separately: a run is only compared with previous
+    runs in the same configuration. Flagged runs are marked as latest if no
+    later run exists for the metric set, whatever its configuration.
+    """
+    regressions: list[Regression] = []
+    for ms_key, comap in config_series_map.items():
+        if ms_key[3] not in REGRESSION_METRIC_NAMES:
+            continue
+        for observable, direction in REGRESSION_OBSERVABLES.items():
+            latest_dates = [
+                max(omap[observable][0])
+                for omap in comap.values()
+                if omap.get(observable, ({}, ""))[0]
+            ]
+            if not latest_dates:
+                continue
+            latest_date = max(latest_dates)
+            for configuration, omap in comap.items():
+                if observable not in omap:
+                    continue
+                obs_series, obs_unit = omap[observable]
+                dates = sorted(obs_series.keys())
+                values = np.array([obs_series[date] for date in dates], dtype=float)
+                flagged, baselines, relative_changes, z_scores = (
+                    detect_series_regressions(
+                        values,
+                        direction,
+                        window=window,
+                        threshold=threshold,
+                        z_threshold=z_threshold,
+                    )
+                )
+                for f_index, baseline, relative_change, z_score in zip(
+                    flagged, baselines, relative_changes, z_scores
+                ):
+                    regressions.append(
+                        Regression(
+                            metric_set_key=ms_key,
+                            observable=observable,
+                            run_date=dates[f_index],
+                            value=float(values[f_index]),
+                            baseline=float(baseline),
+                            relative_change=float(relative_change),
+                            z_score=float(z_score),
+                            unit=obs_unit,
+                            is_latest=bool(dates[f_index] == latest_date),
+                            configuration=configuration,
+                        )
+                    )
+    return regressions
+
+
+def write_regression_report(
+    regressions: list[Regression],
+    filename: str,
+    *,
+    window: int,
+    threshold: float,
+    z_threshold: float,
+    segment_keys: list[str] | None = None,
+) -> None:
+    report = {
+        "format_version": REGRESSION_REPORT_FORMAT_VERSION,
+        "settings": {
+            "observables": REGRESSION_OBSERVABLES,
+            "metric_names": sorted(REGRESSION_METRIC_NAMES),
+            "baseline_window": window,
+            "threshold": threshold,
+            "z_threshold": z_threshold,
+            "segment_keys": segment_keys or [],
+        },
+        "num_regressions": len(regressions),
+        "num_latest_regressions": len([reg for reg in regressions if reg.is_latest]),
+        "regressions": [reg.to_dict() for reg in regressions],
+    }
+    with open(filename, "w") as o_file:
+        json.dump(report, o_file, indent=2, sort_keys=True)
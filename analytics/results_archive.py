@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from summary_parsing import ParsedMetricSet, ParsedRun, get_parsing_fingerprint
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    dir_name TEXT PRIMARY KEY,
+    run_date TEXT NOT NULL,
+    workload TEXT NOT NULL,
+    metaparameters TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    parsing_fingerprint TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS metric_sets (
+    set_id INTEGER PRIMARY KEY,
+    dir_name TEXT NOT NULL REFERENCES runs(dir_name),
+    workload TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    activity TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    set_id INTEGER NOT NULL REFERENCES metric_sets(set_id),
+    observable TEXT NOT NULL,
+    value REAL NOT NULL,
+    unit TEXT NOT NULL
+);
+"""
+
+
+class ResultsArchive:
+    """
+    A compact archive of parsed runs in a local SQLite file.
+
+    Runs are keyed by their directory name and stored along with the parsing
+    fingerprint they were parsed with: a run is rewritten only when ingested
+    again under a different fingerprint. The whole history can be loaded back
+    as parsed runs without access to the raw log directories.
+    """
+
+    filename: str
+    connection: sqlite3.Connection
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(ARCHIVE_SCHEMA)
+        # archives created before fingerprints were stored: their runs are
+        # all re-ingested (when their raw logs are available)
+        run_columns = {
+            column_name
+            for _, column_name, *_ in self.connection.execute("PRAGMA table_info(runs)")
+        }
+        if "parsing_fingerprint" not in run_columns:
+            with self.connection:
+                self.connection.execute(
+                    "ALTER TABLE runs ADD COLUMN "
+                    "parsing_fingerprint TEXT NOT NULL DEFAULT ''"
+                )
+
+    def __repr__(self) -> str:
+        return f"ResultsArchive({self.filename})"
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def archived_fingerprints(self) -> dict[str, str]:
+        """A map dir_name -> parsing fingerprint of all archived runs."""
+        dir_rows = self.connection.execute(
+            "SELECT dir_name, parsing_fingerprint FROM runs"
+        )
+        return dict(dir_rows.fetchall())
+
+    def _delete_run(self, dir_name: str) -> None:
+        set_ids_query = "SELECT set_id FROM metric_sets WHERE dir_name = ?"
+        self.connection.execute(
+            f"DELETE FROM metrics WHERE set_id IN ({set_ids_query})", (dir_name,)
+        )
+        self.connection.execute(
+            "DELETE FROM metric_sets WHERE dir_name = ?", (dir_name,)
+        )
+        self.connection.execute("DELETE FROM runs WHERE dir_name = ?", (dir_name,))
+
+    def ingest(
+        self,
+        runs_to_ingest: dict[str, tuple[tuple[datetime, str], ParsedRun]],
+        parsing_fingerprint: str,
+    ) -> tuple[int, int]:
+        """
+        Add runs, given as a map
+            dir_name -> ((run date, workload), parsed run)
+        and parsed with the given parsing fingerprint, to the archive. Runs
+        already present with the same fingerprint are skipped, those archived
+        under a different fingerprint are replaced. Return the number of runs
+        (added, replaced).
+        """
+        archived_fingerprints = self.archived_fingerprints()
+        ingested_at = datetime.now().isoformat()
+        num_added = 0
+        num_replaced = 0
+        with self.connection:
+            for dir_name, ((run_date, workload), prun) in runs_to_ingest.items():
+                if dir_name in archived_fingerprints:
+                    if archived_fingerprints[dir_name] == parsing_fingerprint:
+                        continue
+                    self._delete_run(dir_name)
+                    num_replaced += 1
+                else:
+                    num_added += 1
+                self.connection.execute(
+                    "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        dir_name,
+                        run_date.isoformat(),
+                        workload,
+                        json.dumps(prun.metaparameters or {}, sort_keys=True),
+                        ingested_at,
+                        parsing_fingerprint,
+                    ),
+                )
+                for mset in prun.metric_sets:
+                    set_cursor = self.connection.execute(
+                        "INSERT INTO metric_sets "
+                        "(dir_name, workload, scenario, activity, name) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (
+                            dir_name,
+                            mset.workload,
+                            mset.scenario,
+                            mset.activity,
+                            mset.name,
+                        ),
+                    )
+                    self.connection.executemany(
+                        "INSERT INTO metrics VALUES (?, ?, ?, ?)",
+                        [
+                            (set_cursor.lastrowid, observable, value, unit)
+                            for observable, (value, unit) in mset.metrics.items()
+                        ],
+                    )
+        return num_added, num_replaced
+
+    def load_parsed_runs(self) -> dict[tuple[datetime, str], ParsedRun]:
+        """Rebuild all archived runs, in run-date order."""
+        metric_sets: dict[int, ParsedMetricSet] = {}
+        dir_set_ids: dict[str, list[int]] = {}
+        set_rows = self.connection.execute(
+            "SELECT set_id, dir_name, workload, scenario, activity, name "
+            "FROM metric_sets ORDER BY set_id"
+        )
+        for set_id, dir_name, workload, scenario, activity, name in set_rows:
+            metric_sets[set_id] = ParsedMetricSet(
+                workload=workload,
+                scenario=scenario,
+                activity=activity,
+                name=name,
+                metrics={},
+            )
+            dir_set_ids.setdefault(dir_name, []).append(set_id)
+        metric_rows = self.connection.execute(
+            "SELECT set_id, observable, value, unit FROM metrics ORDER BY rowid"
+        )
+        for set_id, observable, value, unit in metric_rows:
+            metric_sets[set_id].metrics[observable] = (value, unit)
+
+        run_rows = self.connection.execute(
+            "SELECT dir_name, run_date, workload, metaparameters FROM runs "
+            "ORDER BY run_date, dir_name"
+        )
+        return {
+            (datetime.fromisoformat(run_date), workload): ParsedRun(
+                metric_sets=[
+                    metric_sets[set_id] for set_id in dir_set_ids.get(dir_name, [])
+                ],
+                metaparameters=json.loads(metaparameters),
+            )
+            for dir_name, run_date, workload, metaparameters in run_rows
+        }
+
+
+def open_results_archive(filename: str) -> ResultsArchive:
+    print(
+        f"Results archive: {filename} "
+        f"({'existing' if os.path.isfile(filename) else 'new'})."
+    )
+    return ResultsArchive(filename)
+
+
+def main() -> None:
+    """
+    Print the names of the runs archived under the current parsing settings
+    (without steady-state trimming, as in the refresh workflow), one per line:
+    their raw logs need not be fetched nor parsed again.
+    """
+    parser = argparse.ArgumentParser(
+        description="List the runs a results archive holds up to date."
+    )
+    parser.add_argument("archive", type=str, help="Path to the SQLite archive")
+    args = parser.parse_args()
+    if not os.path.isfile(args.archive):
+        return
+    archive = ResultsArchive(args.archive)
+    parsing_fingerprint = get_parsing_fingerprint()
+    for dir_name, fingerprint in sorted(archive.archived_fingerprints().items()):
+        if fingerprint == parsing_fingerprint:
+            print(dir_name)
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import json
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any
+
+from summary_parsing import PERCENTILES_EXACT_OBS, ParsedRun
+
+DATETIME_FORMAT = "%Y-%m-%d_%H_%M_%S"
+
+# (workload, scenario, activity, name)
+MetricSetKeyType = tuple[str, str, str, str]
+# observable -> (date -> value, unit)
+ObsMapType = dict[str, tuple[dict[datetime, float], str]]
+# configuration label -> observable map
+ConfigObsMapType = dict[str, ObsMapType]
+
+# label for a segmentation metaparameter missing from a run
+UNSET_METAPARAMETER_LABEL = "unset"
+# appended to the configuration of runs with exact (histogram) percentiles:
+# their P50, P99... are not comparable with the averaged ones of earlier runs
+PERCENTILES_EXACT_LABEL = "percentiles=exact"
+
+
+def date_to_string(dt: datetime) -> str:
+    return dt.strftime(DATETIME_FORMAT)
+
+
+def configuration_label(
+    metaparameters: dict[str, str] | None,
+    segment_keys: list[str],
+) -> str:
+    """
+    The configuration of a run, as given by the values of the segmentation
+    metaparameters, e.g. 'MAIN_THREADS=8,CYCLERATE=30' ('' if no keys).
+    """
+    return ",".join(
+        f"{s_key}={(metaparameters or {}).get(s_key, UNSET_METAPARAMETER_LABEL)}"
+        for s_key in segment_keys
+    )
+
+
+def has_exact_percentiles(prun: ParsedRun) -> bool:
+    """Whether the percentiles of a run come from its HdrHistogram logs."""
+    return any(
+        pmset.metrics.get(PERCENTILES_EXACT_OBS, (0.0, ""))[0] > 0
+        for pmset in prun.metric_sets
+    )
+
+
+def run_configuration_label(prun: ParsedRun, segment_keys: list[str]) -> str:
+    """
+    The configuration of a run (see configuration_label), with the
+    PERCENTILES_EXACT_LABEL mark if its percentiles are exact, e.g.
+    'MAIN_THREADS=8,CYCLERATE=30,percentiles=exact'.
+    """
+    config_label = configuration_label(prun.metaparameters, segment_keys)
+    if not has_exact_percentiles(prun):
+        return config_label
+    return ",".join(
+        label_part
+        for label_part in (config_label, PERCENTILES_EXACT_LABEL)
+        if label_part
+    )
+
+
+class ResultsTable:
+    """
+    A flat, columnar table of all parsed results, with one row per
+    (run date, workload, scenario, activity, name, observable)
+    holding the value, the unit and the configuration of the run
+    (see run_configuration_label).
+
+    Rows are stored as parallel column lists; group-by indices
+    are computed on demand and cached until the next append.
+    """
+
+    run_dates: list[datetime]
+    workloads: list[str]
+    scenarios: list[str]
+    activities: list[str]
+    names: list[str]
+    observables: list[str]
+    values: list[float]
+    units: list[str]
+    configurations: list[str]
+    _metric_set_index: dict[MetricSetKeyType, list[int]] | None
+
+    def __init__(self) -> None:
+        self.run_dates = []
+        self.workloads = []
+        self.scenarios = []
+        self.activities = []
+        self.names = []
+        self.observables = []
+        self.values = []
+        self.units = []
+        self.configurations = []
+        self._metric_set_index = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return f"ResultsTable({len(self)} rows)"
+
+    def append(
+        self,
+        *,
+        run_date: datetime,
+        workload: str,
+        scenario: str,
+        activity: str,
+        name: str,
+        observable: str,
+        value: float,
+        unit: str,
+        configuration: str = "",
+    ) -> None:
+        self.run_dates.append(run_date)
+        self.workloads.append(workload)
+        self.scenarios.append(scenario)
+        self.activities.append(activity)
+        self.names.append(name)
+        self.observables.append(observable)
+        self.values.append(value)
+        self.units.append(unit)
+        self.configurations.append(configuration)
+        self._metric_set_index = None
+
+    @staticmethod
+    def from_parsed_runs(
+        parsed_runs: dict[tuple[datetime, str], ParsedRun],
+        segment_keys: list[str] | None = None,
+    ) -> "ResultsTable":
+        """
+        Build the table from parsed runs, each labeled with its configuration
+        according to the `segment_keys` metaparameters (if any) and to whether
+        its percentiles are exact (see run_configuration_label).
+        """
+        table = ResultsTable()
+        for (run_date, _), prun in parsed_runs.items():
+            configuration = run_configuration_label(prun, segment_keys or [])
+            for mset in prun.metric_sets:
+                for observable, (value, unit) in mset.metrics.items():
+                    table.append(
+                        run_date=run_date,
+                        workload=mset.workload,
+                        scenario=mset.scenario,
+                        activity=mset.activity,
+                        name=mset.name,
+                        observable=observable,
+                        value=value,
+                        unit=unit,
+                        configuration=configuration,
+                    )
+        return table
+
+    def iter_rows(
+        self,
+    ) -> Iterator[tuple[datetime, str, str, str, str, str, float, str]]:
+        return zip(
+            self.run_dates,
+            self.workloads,
+            self.scenarios,
+            self.activities,
+            self.names,
+            self.observables,
+            self.values,
+            self.units,
+        )
+
+    def metric_set_index(self) -> dict[MetricSetKeyType, list[int]]:
+        """
+        Map each (workload, scenario, activity, name) to its row indices,
+        in order of first appearance.
+        """
+        if self._metric_set_index is None:
+            index: dict[MetricSetKeyType, list[int]] = {}
+            for row_i, ms_key in enumerate(
+                zip(self.workloads, self.scenarios, self.activities, self.names)
+            ):
+                index.setdefault(ms_key, []).append(row_i)
+            self._metric_set_index = index
+        return self._metric_set_index
+
+    def obs_map(self, ms_key: MetricSetKeyType) -> ObsMapType:
+        """
+        The series for a (workload, scenario, activity, name), as a map
+            observable -> (date -> value, unit)
+        The unit is the one found first for each observable.
+        """
+        omap: ObsMapType = {}
+        for row_i in self.metric_set_index().get(ms_key, []):
+            observable = self.observables[row_i]
+            if observable not in omap:
+                omap[observable] = ({}, self.units[row_i])
+            omap[observable][0][self.run_dates[row_i]] = self.values[row_i]
+        return omap
+
+    def group_by_metric_set(self) -> dict[MetricSetKeyType, ObsMapType]:
+        return {ms_key: self.obs_map(ms_key) for ms_key in self.metric_set_index()}
+
+    def config_obs_map(self, ms_key: MetricSetKeyType) -> ConfigObsMapType:
+        """
+        The series for a (workload, scenario, activity, name), split by run
+        configuration, as a map
+            configuration -> observable -> (date -> value, unit)
+        with configurations sorted.
+        """
+        comap: ConfigObsMapType = {}
+        for row_i in self.metric_set_index().get(ms_key, []):
+            omap = comap.setdefault(self.configurations[row_i], {})
+            observable = self.observables[row_i]
+            if observable not in omap:
+                omap[observable] = ({}, self.units[row_i])
+            omap[observable][0][self.run_dates[row_i]] = self.values[row_i]
+        return dict(sorted(comap.items()))
+
+    def group_by_metric_set_and_configuration(
+        self,
+    ) -> dict[MetricSetKeyType, ConfigObsMapType]:
+        return {
+            ms_key: self.config_obs_map(ms_key) for ms_key in self.metric_set_index()
+        }
+
+    def to_json_tree(self) -> dict[str, Any]:
+        """
+        The nested JSON-ready representation
+            workload->scenario->activity->name->observable->[date->value, unit]
+        with dates as strings.
+        """
+        json_tree: dict[str, Any] = {}
+        for (_wl, _sc, _ac, _na), omap in self.group_by_metric_set().items():
+            na_tree = (
+                json_tree.setdefault(_wl, {})
+                .setdefault(_sc, {})
+                .setdefault(_ac, {})
+                .setdefault(_na, {})
+            )
+            for _ob, (ob_series, _un) in omap.items():
+                na_tree[_ob] = (
+                    {date_to_string(_da): _va for _da, _va in ob_series.items()},
+                    _un,
+                )
+        return json_tree
+
+    def dump_json(self, filename: str) -> None:
+        """Write the full plottable JSON (in its historical format)."""
+        with open(filename, "w") as o_file:
+            json.dump(self.to_json_tree(), o_file, indent=2, sort_keys=True)
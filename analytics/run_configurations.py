@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from results_table import run_configuration_label
+from summary_parsing import ParsedRun
+
+# metaparameters defining the configuration of a run: series are split by them
+DEFAULT_SEGMENT_KEYS = ["MAIN_THREADS", "CYCLERATE"]
+# metaparameters expected to change at every run (not a configuration change)
+RUN_SPECIFIC_METAPARAMETERS = {"REPO_COMMIT_SHA", "TARGET_API_ENDPOINT"}
+
+
+def parse_segment_keys(segment_by: str) -> list[str]:
+    """The comma-separated metaparameter names as a list ('' for none)."""
+    return [s_key.strip() for s_key in segment_by.split(",") if s_key.strip()]
+
+
+def configurations_by_workload(
+    parsed_runs: dict[tuple[datetime, str], ParsedRun],
+    segment_keys: list[str],
+) -> dict[str, dict[str, int]]:
+    """Map workload -> configuration -> number of runs in it."""
+    wl_configurations: dict[str, dict[str, int]] = {}
+    for (_, workload), prun in sorted(parsed_runs.items()):
+        configuration = run_configuration_label(prun, segment_keys)
+        config_counts = wl_configurations.setdefault(workload, {})
+        config_counts[configuration] = config_counts.get(configuration, 0) + 1
+    return wl_configurations
+
+
+def unsegmented_varying_metaparameters(
+    parsed_runs: dict[tuple[datetime, str], ParsedRun],
+    segment_keys: list[str],
+) -> dict[str, list[str]]:
+    """
+    Map workload -> metaparameters taking different values across its runs,
+    except the segmentation keys and the run-specific ones. Runs without
+    metaparameters are not considered.
+    """
+    wl_values: dict[str, dict[str, set[str]]] = {}
+    for (_, workload), prun in parsed_runs.items():
+        if not prun.metaparameters:
+            continue
+        mp_values = wl_values.setdefault(workload, {})
+        for mp_key, mp_value in prun.metaparameters.items():
+            mp_values.setdefault(mp_key, set()).add(mp_value)
+    ignored_keys = set(segment_keys) | RUN_SPECIFIC_METAPARAMETERS
+    wl_varying_keys: dict[str, list[str]] = {}
+    for workload, mp_values in sorted(wl_values.items()):
+        varying_keys = sorted(
+            mp_key
+            for mp_key, values in mp_values.items()
+            if len(values) > 1
+            if mp_key not in ignored_keys
+        )
+        if varying_keys:
+            wl_varying_keys[workload] = varying_keys
+    return wl_varying_keys
@@ -0,0 +1,198 @@
+"""
+Saturation sweeps: the same scenario run at increasing offered load (cyclerate
+or threads), one step per load level. The achieved throughput is compared with
+the latency at each step, to locate the knee of the latency/throughput curve.
+"""
+
+from datetime import datetime
+
+import numpy as np
+from os_lib import get_sweep_step_dirs
+from summary_parsing import ParsedMetricSet, ParsedRun, parse_run_dirs
+
+SWEEP_METRIC_NAME = "result"
+CAPACITY_METRIC_NAME = "capacity"
+SWEEP_STEP_METAPARAMETER = "SWEEP_STEP"
+SWEEP_VALUE_METAPARAMETER = "SWEEP_VALUE"
+SWEEP_PARAMETER_METAPARAMETER = "SWEEP_PARAMETER"
+# a knee needs at least this many load levels
+MIN_KNEE_STEPS = 3
+
+# (workload, scenario, activity)
+SweepCurveKeyType = tuple[str, str, str]
+
+
+class SweepCurve:
+    """
+    The per-step results of a sweep for one activity, in step order:
+    offered load (the swept parameter), achieved throughput, P50 and P99.
+    """
+
+    sweep_parameter: str
+    offered: np.ndarray
+    throughput: np.ndarray
+    p50: np.ndarray
+    p99: np.ndarray
+    throughput_unit: str
+    latency_unit: str
+
+    def __init__(
+        self,
+        *,
+        sweep_parameter: str,
+        offered: list[float],
+        throughput: list[float],
+        p50: list[float],
+        p99: list[float],
+        throughput_unit: str,
+        latency_unit: str,
+    ) -> None:
+        self.sweep_parameter = sweep_parameter
+        self.offered = np.array(offered, dtype=np.float64)
+        self.throughput = np.array(throughput, dtype=np.float64)
+        self.p50 = np.array(p50, dtype=np.float64)
+        self.p99 = np.array(p99, dtype=np.float64)
+        self.throughput_unit = throughput_unit
+        self.latency_unit = latency_unit
+
+    def __repr__(self) -> str:
+        return f"SweepCurve({self.sweep_parameter}: {len(self.offered)} steps)"
+
+    def knee_index(self) -> int | None:
+        """
+        Locate the knee of the latency (P99) vs. throughput curve, with the
+        Kneedle method: both axes are normalized to [0, 1] and the knee is
+        the step where the curve lies farthest below the diagonal, i.e.
+        where throughput stops growing faster than latency.
+        None if there are too few steps or the curve is flat.
+        """
+        if len(self.offered) < MIN_KNEE_STEPS:
+            return None
+        x_range = np.ptp(self.throughput)
+        y_range = np.ptp(self.p99)
+        if x_range == 0 or y_range == 0:
+            return None
+        x_norm = (self.throughput - self.throughput.min()) / x_range
+        y_norm = (self.p99 - self.p99.min()) / y_range
+        return int(np.argmax(x_norm - y_norm))
+
+
+def parse_sweep_dirs(
+    sweep_dirs: list[str], workers: int = 1, *, streaming: bool = False
+) -> dict[str, list[ParsedRun]]:
+    """
+    Parse all steps of several sweep directories (with a single pool of
+    worker processes) and return a map sweep dir -> parsed steps.
+    """
+    step_dirs_map = {
+        sweep_dir: get_sweep_step_dirs(sweep_dir) for sweep_dir in sweep_dirs
+    }
+    parsed_steps = parse_run_dirs(
+        [step_dir for step_dirs in step_dirs_map.values() for step_dir in step_dirs],
+        workers=workers,
+        streaming=streaming,
+    )
+    return {
+        sweep_dir: [parsed_steps[step_dir] for step_dir in step_dirs]
+        for sweep_dir, step_dirs in step_dirs_map.items()
+    }
+
+
+def build_sweep_curves(
+    parsed_steps: list[ParsedRun],
+) -> dict[SweepCurveKeyType, SweepCurve]:
+    """Collect the per-step results of a sweep into one curve per activity."""
+    step_points: dict[SweepCurveKeyType, list[tuple[float, float, float, float]]]
+    step_points = {}
+    units: dict[SweepCurveKeyType, tuple[str, str]] = {}
+    sweep_parameter = ""
+    for prun in parsed_steps:
+        metaparameters = prun.metaparameters or {}
+        if SWEEP_VALUE_METAPARAMETER not in metaparameters:
+            continue
+        offered = float(metaparameters[SWEEP_VALUE_METAPARAMETER])
+        sweep_parameter = metaparameters.get(SWEEP_PARAMETER_METAPARAMETER, "")
+        for pmset in prun.metric_sets:
+            if pmset.name != SWEEP_METRIC_NAME:
+                continue
+            if not {"rate_mean", "P500", "P990"} <= set(pmset.metrics):
+                continue
+            c_key = (pmset.workload, pmset.scenario, pmset.activity)
+            step_points.setdefault(c_key, []).append(
+                (
+                    offered,
+                    pmset.metrics["rate_mean"][0],
+                    pmset.metrics["P500"][0],
+                    pmset.metrics["P990"][0],
+                )
+            )
+            units[c_key] = (pmset.metrics["rate_mean"][1], pmset.metrics["P990"][1])
+    curves: dict[SweepCurveKeyType, SweepCurve] = {}
+    for c_key, points in step_points.items():
+        offered_list, throughput_list, p50_list, p99_list = zip(*sorted(points))
+        curves[c_key] = SweepCurve(
+            sweep_parameter=sweep_parameter,
+            offered=list(offered_list),
+            throughput=list(throughput_list),
+            p50=list(p50_list),
+            p99=list(p99_list),
+            throughput_unit=units[c_key][0],
+            latency_unit=units[c_key][1],
+        )
+    return curves
+
+
+def capacity_metric_set(c_key: SweepCurveKeyType, curve: SweepCurve) -> ParsedMetricSet:
+    """
+    The capacity metrics of a sweep for an activity: the max achieved
+    throughput and, if a knee is found, the throughput and latencies there.
+    """
+    _wl, _sc, _ac = c_key
+    metrics = {
+        "max_throughput": (float(curve.throughput.max()), curve.throughput_unit),
+        "sweep_steps": (float(len(curve.offered)), ""),
+    }
+    knee_index = curve.knee_index()
+    if knee_index is not None:
+        metrics["knee_throughput"] = (
+            float(curve.throughput[knee_index]),
+            curve.throughput_unit,
+        )
+        metrics["knee_P500"] = (float(curve.p50[knee_index]), curve.latency_unit)
+        metrics["knee_P990"] = (float(curve.p99[knee_index]), curve.latency_unit)
+        metrics["knee_offered"] = (float(curve.offered[knee_index]), "")
+    return ParsedMetricSet(
+        workload=_wl,
+        scenario=_sc,
+        activity=_ac,
+        name=CAPACITY_METRIC_NAME,
+        metrics=metrics,
+    )
+
+
+def add_capacity_metric_sets(
+    parsed_runs: dict[tuple[datetime, str], ParsedRun],
+    sweep_curves: dict[tuple[datetime, str], dict[SweepCurveKeyType, SweepCurve]],
+) -> dict[tuple[datetime, str], ParsedRun]:
+    """
+    Return the parsed runs with the capacity metric sets of the sweeps added,
+    so that capacity is tracked across runs like any other series. A sweep
+    sharing date and workload with a regular run is merged into it.
+    """
+    enriched_runs = dict(parsed_runs)
+    for run_key, curves in sweep_curves.items():
+        capacity_sets = [
+            capacity_metric_set(c_key, curve) for c_key, curve in curves.items()
+        ]
+        if run_key in enriched_runs:
+            prun = enriched_runs[run_key]
+            enriched_runs[run_key] = ParsedRun(
+                metric_sets=prun.metric_sets + capacity_sets,
+                metaparameters=prun.metaparameters,
+            )
+        else:
+            enriched_runs[run_key] = ParsedRun(
+                metric_sets=capacity_sets,
+                metaparameters={},
+            )
+    return dict(sorted(enriched_runs.items()))
@@ -0,0 +1,92 @@
+"""
+Scaling comparisons: throughput and latency of an activity as a function of a
+test parameter (batch size, thread count, ...), rather than of the run date.
+"""
+
+import json
+from typing import Any
+
+import numpy as np
+
+SCALING_REPORT_FORMAT_VERSION = 1
+
+# (workload, scenario, activity or activity group)
+ScalingKeyType = tuple[str, str, str]
+
+
+class ScalingCurve:
+    """
+    Throughput (mean rate) and latency per operation (P50, P99) at each value
+    of a parameter, in increasing parameter order. The description tells where
+    the points come from (e.g. the run they are taken from).
+    """
+
+    parameter: str
+    parameter_values: np.ndarray
+    rates: np.ndarray
+    p50: np.ndarray
+    p99: np.ndarray
+    rate_unit: str
+    latency_unit: str
+    description: str
+
+    def __init__(
+        self,
+        *,
+        parameter: str,
+        points: list[tuple[float, float, float, float]],
+        rate_unit: str,
+        latency_unit: str,
+        description: str,
+    ) -> None:
+        # points are (parameter value, rate, P50, P99)
+        point_table = np.array(sorted(points), dtype=np.float64).reshape(-1, 4)
+        self.parameter = parameter
+        self.parameter_values = point_table[:, 0]
+        self.rates = point_table[:, 1]
+        self.p50 = point_table[:, 2]
+        self.p99 = point_table[:, 3]
+        self.rate_unit = rate_unit
+        self.latency_unit = latency_unit
+        self.description = description
+
+    def __repr__(self) -> str:
+        return (
+            f"ScalingCurve({self.parameter}: {self.parameter_values.tolist()}; "
+            f"{self.description})"
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "parameter": self.parameter,
+            "description": self.description,
+            "rate_unit": self.rate_unit,
+            "latency_unit": self.latency_unit,
+            "points": [
+                {
+                    self.parameter: float(p_value),
+                    "rate": float(rate),
+                    "P500": float(p50),
+                    "P990": float(p99),
+                }
+                for p_value, rate, p50, p99 in zip(
+                    self.parameter_values, self.rates, self.p50, self.p99
+                )
+            ],
+        }
+
+
+def write_scaling_report(
+    curves: dict[ScalingKeyType, ScalingCurve],
+    filename: str,
+) -> None:
+    """Dump scaling curves as JSON, nested as workload->scenario->activity."""
+    nested_curves: dict[str, dict[str, dict[str, Any]]] = {}
+    for (_wl, _sc, _ac), curve in curves.items():
+        nested_curves.setdefault(_wl, {}).setdefault(_sc, {})[_ac] = curve.to_dict()
+    report = {
+        "format_version": SCALING_REPORT_FORMAT_VERSION,
+        "scaling_curves": nested_curves,
+    }
+    with open(filename, "w") as o_file:
+        json.dump(report, o_file, indent=2, sort_keys=True)
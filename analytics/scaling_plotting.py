@@ -0,0 +1,99 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from obs_plotting import FIGURE_FORMAT
+from scaling_curves import ScalingCurve, ScalingKeyType
+
+# title, curve, output path
+ScalingJobType = tuple[str, ScalingCurve, str]
+
+
+def render_scaling_figure(scaling_job: ScalingJobType) -> float:
+    """
+    Render a throughput vs. parameter figure (log2 parameter axis), with the
+    latency per operation (P50, P99) on a secondary axis.
+    Return the elapsed time (seconds).
+    """
+    from matplotlib.figure import Figure
+
+    t0 = time.perf_counter()
+    plot_title, curve, fig_path = scaling_job
+    # nanoseconds->milliseconds as for the observable plots
+    to_ms = 1000000.0 if curve.latency_unit == "ns" else 1.0
+    latency_unit = "ms" if curve.latency_unit == "ns" else curve.latency_unit
+    fig = Figure(figsize=FIGURE_FORMAT)
+    ax = fig.add_subplot()
+    ax.plot(
+        curve.parameter_values,
+        curve.rates,
+        "o-",
+        color="tab:blue",
+        label=f"rate_mean ({curve.rate_unit})",
+    )
+    ax.set_xscale("log", base=2)
+    ax.set_xticks(
+        curve.parameter_values, [f"{p_value:g}" for p_value in curve.parameter_values]
+    )
+    ax.set_xlabel(curve.parameter)
+    ax.set_ylabel(curve.rate_unit)
+    ax.set_ylim(bottom=0)
+    ax.grid()
+    lat_ax = ax.twinx()
+    lat_ax.plot(
+        curve.parameter_values,
+        curve.p50 / to_ms,
+        "*--",
+        color="tab:orange",
+        label=f"P500 per operation ({latency_unit})",
+    )
+    lat_ax.plot(
+        curve.parameter_values,
+        curve.p99 / to_ms,
+        "*--",
+        color="tab:red",
+        label=f"P990 per operation ({latency_unit})",
+    )
+    lat_ax.set_ylabel(latency_unit)
+    lat_ax.set_ylim(bottom=0)
+    lines = [*ax.get_lines(), *lat_ax.get_lines()]
+    ax.legend(lines, [str(line.get_label()) for line in lines], loc="upper left")
+    ax.set_title(plot_title)
+    fig.savefig(fig_path, bbox_inches="tight")
+    fig.clear()
+    return time.perf_counter() - t0
+
+
+def plot_scaling_curves(
+    curves: dict[ScalingKeyType, ScalingCurve],
+    out_dir: str,
+    plot_name: str,
+    workers: int = 1,
+) -> dict[ScalingKeyType, tuple[str, str]]:
+    """
+    Render the figures for a kind of scaling comparison (`plot_name`, e.g.
+    'batch_scaling') and return the map
+        (workload, scenario, activity) -> (file name, file path)
+    """
+    scaling_jobs: list[ScalingJobType] = []
+    gen_files: dict[ScalingKeyType, tuple[str, str]] = {}
+    print(f"\nPlotting {plot_name} comparisons to '{out_dir}' ...")
+    for (_wl, _sc, _ac), curve in curves.items():
+        fig_name = f"{_wl}~{_sc}~{_ac}~{plot_name}.png"
+        fig_path = os.path.join(out_dir, fig_name)
+        gen_files[(_wl, _sc, _ac)] = (fig_name, fig_path)
+        plot_title = f"{_wl} / {_sc} / {_ac} / {plot_name} ({curve.description})"
+        scaling_jobs.append((plot_title, curve, fig_path))
+
+    t0 = time.perf_counter()
+    if workers == 1 or len(scaling_jobs) <= 1:
+        for scaling_job in scaling_jobs:
+            render_scaling_figure(scaling_job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(render_scaling_figure, scaling_jobs))
+    print(
+        f"Rendered {len(scaling_jobs)} {plot_name} figures "
+        f"in {time.perf_counter() - t0:.2f} s."
+    )
+    return gen_files
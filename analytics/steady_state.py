@@ -0,0 +1,157 @@
+"""
+Within-run analysis: locating the steady state of a run in its per-interval
+metric series, i.e. trimming the warm-up (JIT, connection establishment, ...)
+and cool-down intervals.
+"""
+
+from typing import Any
+
+import numpy as np
+
+TRIM_AUTO = "auto"
+TRIM_INTERVALS = "intervals"
+TRIM_SECONDS = "seconds"
+# automatic trimming never removes more than these fractions of the intervals
+MAX_AUTO_WARMUP_FRACTION = 0.5
+MAX_AUTO_COOLDOWN_FRACTION = 0.25
+# below this many intervals, automatic trimming is not attempted
+MIN_AUTO_TRIM_INTERVALS = 6
+MIN_STEADY_STATE_INTERVALS = 2
+
+
+class TrimBound:
+    """
+    How much to trim at one end of a run: automatically, or a fixed
+    number of intervals, or a fixed number of seconds.
+    """
+
+    kind: str
+    amount: float
+
+    def __init__(self, *, kind: str, amount: float = 0) -> None:
+        if kind not in {TRIM_AUTO, TRIM_INTERVALS, TRIM_SECONDS}:
+            raise ValueError(f"Unknown trim kind '{kind}'.")
+        self.kind = kind
+        self.amount = amount
+
+    def __repr__(self) -> str:
+        return f"TrimBound({self.to_string()})"
+
+    def to_string(self) -> str:
+        if self.kind == TRIM_AUTO:
+            return TRIM_AUTO
+        elif self.kind == TRIM_SECONDS:
+            return f"{self.amount:g}s"
+        else:
+            return f"{int(self.amount)}"
+
+    @staticmethod
+    def from_string(trim_string: str) -> "TrimBound":
+        """Parse 'auto', '<N>' (intervals) or '<S>s' (seconds)."""
+        _trim_string = trim_string.strip().lower()
+        if _trim_string == TRIM_AUTO:
+            return TrimBound(kind=TRIM_AUTO)
+        try:
+            if _trim_string.endswith("s"):
+                return TrimBound(kind=TRIM_SECONDS, amount=float(_trim_string[:-1]))
+            return TrimBound(kind=TRIM_INTERVALS, amount=int(_trim_string))
+        except ValueError:
+            raise ValueError(
+                f"Unrecognized trim specification '{trim_string}'."
+            ) from None
+
+
+class TrimSpec:
+    warmup: TrimBound
+    cooldown: TrimBound
+
+    def __init__(self, *, warmup: TrimBound, cooldown: TrimBound) -> None:
+        self.warmup = warmup
+        self.cooldown = cooldown
+
+    def __repr__(self) -> str:
+        return (
+            f"TrimSpec(warmup={self.warmup.to_string()}, "
+            f"cooldown={self.cooldown.to_string()})"
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "warmup": self.warmup.to_string(),
+            "cooldown": self.cooldown.to_string(),
+        }
+
+
+def mser_truncation(values: np.ndarray, max_fraction: float) -> int:
+    """
+    Number of initial values to discard according to the Marginal Standard
+    Error Rule: the truncation d minimizing
+        sum((x[d:] - mean(x[d:]))**2) / (n - d)**2
+    searched over d <= max_fraction * n (computed for all d at once).
+    """
+    num_values = len(values)
+    if num_values < MIN_AUTO_TRIM_INTERVALS:
+        return 0
+    # tail sums of x and x**2, for all truncation points
+    tail_sums = np.cumsum(values[::-1])[::-1]
+    tail_sq_sums = np.cumsum((values * values)[::-1])[::-1]
+    tail_lengths = np.arange(num_values, 0, -1, dtype=np.float64)
+    tail_sq_deviations = tail_sq_sums - tail_sums * tail_sums / tail_lengths
+    max_truncation = int(max_fraction * num_values)
+    mser = (
+        tail_sq_deviations[: max_truncation + 1]
+        / tail_lengths[: max_truncation + 1] ** 2
+    )
+    return int(np.argmin(mser))
+
+
+def _fixed_trim(bound: TrimBound, times: np.ndarray | None, from_end: bool) -> int:
+    # number of intervals removed by a non-automatic bound
+    if bound.kind == TRIM_INTERVALS:
+        return int(bound.amount)
+    if times is None or len(times) == 0:
+        return 0
+    if from_end:
+        return int(np.count_nonzero(times > times[-1] - bound.amount))
+    else:
+        return int(np.count_nonzero(times < times[0] + bound.amount))
+
+
+def find_steady_state(
+    signals: list[np.ndarray],
+    times: np.ndarray | None,
+    trim_spec: TrimSpec,
+) -> tuple[int, int]:
+    """
+    Locate the steady state of a run, returning the (start, stop) slice of
+    the intervals to keep. Automatic trimming applies the MSER rule to each
+    of the given per-interval signals (e.g. rate and latency) and removes
+    the largest transient found; cool-down is looked for, the same way, on
+    the time-reversed series once warm-up is removed.
+    """
+    num_intervals = len(signals[0])
+    if trim_spec.warmup.kind == TRIM_AUTO:
+        start = max(
+            mser_truncation(signal, MAX_AUTO_WARMUP_FRACTION) for signal in signals
+        )
+    else:
+        start = _fixed_trim(trim_spec.warmup, times, from_end=False)
+    if trim_spec.cooldown.kind == TRIM_AUTO:
+        num_cooldown = max(
+            mser_truncation(signal[start:][::-1], MAX_AUTO_COOLDOWN_FRACTION)
+            for signal in signals
+        )
+    else:
+        num_cooldown = _fixed_trim(trim_spec.cooldown, times, from_end=True)
+    stop = num_intervals - num_cooldown
+    if stop - start < MIN_STEADY_STATE_INTERVALS:
+        # over-trimmed: better to keep everything than report on nothing
+        return 0, num_intervals
+    return start, stop
+
+
+def coefficient_of_variation(values: np.ndarray) -> float:
+    mean_value = float(np.mean(values))
+    if mean_value == 0:
+        return 0.0
+    return float(np.std(values)) / mean_value
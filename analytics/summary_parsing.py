@@ -1,13 +1,31 @@
+import hashlib
+import io
+import json
 import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from typing import Any
 
-from os_lib import locate_metaparameters_filename
+import numpy as np
+from hdr_histograms import HdrHistogram, load_histogram_log
+from os_lib import (
+    list_run_files,
+    locate_histogram_log_filename,
+    locate_metaparameters_filename,
+    open_run_file,
+    reading_run_archive,
+)
+from pipeline_profiling import ItemTimingType, capture_items, record_item, record_items
+from steady_state import TrimSpec, coefficient_of_variation, find_steady_state
 
 LineType = tuple[str, int]
 
 TRACKED_ACTIVITY_NAMES = {"result", "result_success"}
 UNIT_LABELS = {"duration_unit", "rate_unit"}
+# unit labels, as read in the columnar loader (longer ones would be truncated)
+UNIT_LABEL_DTYPE = "U64"
 OBS_TO_UNIT_TYPE = {
     "count": "",
     "min": "duration_unit",
@@ -44,17 +62,49 @@ OBS_NAME_MAP = {
     "m5_rate": "rate_5m",
     "m15_rate": "rate_15m",
 }
+# percentiles recomputed exactly when the run comes with histogram logs
+HDR_PERCENTILES = {
+    "p50": 50.0,
+    "p75": 75.0,
+    "p95": 95.0,
+    "p98": 98.0,
+    "p99": 99.0,
+    "p999": 99.9,
+}
+# observable marking whether percentiles are exact (1) or approximate (0),
+# i.e. count-weighted averages of the per-interval percentiles
+PERCENTILES_EXACT_OBS = "percentiles_exact"
+TIME_LABEL = "t"
+# per-interval columns needed by the within-run (steady-state) analysis
+STEADY_STATE_COLUMNS = ("count", "mean", "p99", "m1_rate")
+STEADY_STATE_OBS_PREFIX = "ss_"
 OBS_UNIT_MAP = {
     "calls/SECONDS": "/s",
     "NANOSECONDS": "ns",
     "": "",
 }
 
+# batched-write activities are named '<...>_batch<N>', N documents per operation:
+# their rates are normalized to documents per second
+BATCH_ACTIVITY_PATTERN = re.compile(r"^(?P<group>.*?)_batch(?P<batch_size>\d+)$")
+BATCH_RATE_OBSERVABLES = (
+    "rate_mean",
+    "rate_1m",
+    "rate_5m",
+    "rate_15m",
+    f"{STEADY_STATE_OBS_PREFIX}rate",
+)
+BATCH_RATE_UNIT = "docs/s"
+BATCH_SIZE_OBS = "batch_size"
+
 CSV_FILE_PATTERN = re.compile(
     r'^(?P<scenario>.*?)__' +
     r'(?P<activity>.*?)__' +
     r'(?P<name>.*?)_container_(?P<container>.*?)___workload_(?P<workload>.*?)\.csv$'
 )
+# bump this whenever the parsing logic changes in a way that affects results
+# (changes to the constants above are detected automatically):
+PARSING_LOGIC_VERSION = 3
 
 class ParsedMetricSet:
     workload: str
@@ -85,6 +135,30 @@ class ParsedMetricSet:
         else:
             return f"{_desc}()"
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "workload": self.workload,
+            "scenario": self.scenario,
+            "activity": self.activity,
+            "name": self.name,
+            "metrics": {
+                obs: [value, unit] for obs, (value, unit) in self.metrics.items()
+            },
+        }
+
+    @staticmethod
+    def from_dict(raw_dict: dict[str, Any]) -> "ParsedMetricSet":
+        return ParsedMetricSet(
+            workload=raw_dict["workload"],
+            scenario=raw_dict["scenario"],
+            activity=raw_dict["activity"],
+            name=raw_dict["name"],
+            metrics={
+                obs: (value, unit)
+                for obs, (value, unit) in raw_dict["metrics"].items()
+            },
+        )
+
 
 class ParsedRun:
     metric_sets: list[ParsedMetricSet]
@@ -103,11 +177,56 @@ class ParsedRun:
     def __repr__(self) -> str:
         return f"ParsedRun({self.metric_sets}; meta={self.metaparameters})"
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "metric_sets": [pmset.to_dict() for pmset in self.metric_sets],
+            "metaparameters": self.metaparameters,
+        }
+
+    @staticmethod
+    def from_dict(raw_dict: dict[str, Any]) -> "ParsedRun":
+        return ParsedRun(
+            metric_sets=[
+                ParsedMetricSet.from_dict(raw_mset)
+                for raw_mset in raw_dict["metric_sets"]
+            ],
+            metaparameters=raw_dict["metaparameters"],
+        )
+
+
+def get_parsing_fingerprint(trim_spec: TrimSpec | None = None) -> str:
+    """
+    A digest of everything that determines the outcome of parsing a run dir
+    (constants, logic version and steady-state trimming settings, if any).
+    Cached parse results are valid only as long as this does not change.
+    """
+    parsing_settings = {
+        "logic_version": PARSING_LOGIC_VERSION,
+        "tracked_activity_names": sorted(TRACKED_ACTIVITY_NAMES),
+        "unit_labels": sorted(UNIT_LABELS),
+        "obs_to_unit_type": OBS_TO_UNIT_TYPE,
+        "obs_name_map": OBS_NAME_MAP,
+        "obs_unit_map": OBS_UNIT_MAP,
+        "hdr_percentiles": HDR_PERCENTILES,
+        "percentiles_exact_obs": PERCENTILES_EXACT_OBS,
+        "csv_file_pattern": CSV_FILE_PATTERN.pattern,
+        "batch_activity_pattern": BATCH_ACTIVITY_PATTERN.pattern,
+        "batch_rate_observables": BATCH_RATE_OBSERVABLES,
+        "batch_rate_unit": BATCH_RATE_UNIT,
+        "batch_size_obs": BATCH_SIZE_OBS,
+        "time_label": TIME_LABEL,
+        "steady_state_columns": STEADY_STATE_COLUMNS,
+        "steady_state_obs_prefix": STEADY_STATE_OBS_PREFIX,
+        "trim_spec": trim_spec.to_dict() if trim_spec is not None else None,
+    }
+    settings_json = json.dumps(parsing_settings, sort_keys=True)
+    return hashlib.sha256(settings_json.encode()).hexdigest()
+
 
 def load_metaparameters(mp_filepath: str) -> dict[str, str]:
     return dict(
         list(pc.strip() for pc in fl.split("="))
-        for fl in open(mp_filepath).readlines()
+        for fl in open_run_file(mp_filepath).readlines()
         if fl.strip() != ""
         if fl.strip()[0] != "#"
     )
@@ -121,6 +240,15 @@ def csv_filename_to_activity_desc(fname: str) -> dict[str, Any] | None:
         return None
 
 
+def get_batch_size(activity: str) -> int | None:
+    """The number of documents per operation of a batched activity, else None."""
+    match = BATCH_ACTIVITY_PATTERN.match(activity)
+    if match:
+        return int(match.group("batch_size"))
+    else:
+        return None
+
+
 def is_useful_activity(a_desc: dict[str, Any]) -> bool:
     if "activity" not in a_desc:
         # this is a gauge or other non-interesting metric item
@@ -132,109 +260,431 @@ def is_useful_activity(a_desc: dict[str, Any]) -> bool:
     return True
 
 
+def _attach_units(
+    final_values: dict[str, float],
+    unit_map: dict[str, str],
+) -> dict[str, tuple[float, str]]:
+    """
+    Given the final per-column values and the (homogeneous) unit labels found
+    in the unit columns, return the map
+        obs_name -> (value, unit)
+    """
+    obs_name_to_unit = {
+        **{
+            c_unn: OBS_UNIT_MAP[c_un]
+            for c_unn, c_un in unit_map.items()
+        },
+        "": "",
+    }
+    return {
+        OBS_NAME_MAP[c_label]: (c_value, obs_name_to_unit[OBS_TO_UNIT_TYPE[c_label]])
+        for c_label, c_value in final_values.items()
+    }
+
+
+def load_csv_interval_table(
+    fpath: str,
+) -> tuple[list[str], np.ndarray, dict[str, str], np.ndarray | None] | None:
+    """
+    Read a CSV with metrics into its per-interval table, returning
+        (observable column labels, rows x columns float array, unit map, times)
+    with times being the 't' column, if present. Return None if unsuitable data.
+    """
+    with open_run_file(fpath) as ofile:
+        lines = ofile.read().splitlines()
+    if not lines:
+        print(
+            f"** No lines found in file {fpath}."
+            f"File will not be loaded."
+        )
+        return None
+    header, rows = lines[0], [_line.strip() for _line in lines[1:] if _line.strip()]
+    if not rows:
+        print(
+            f"** No data lines found in file {fpath}."
+            f"File will not be loaded."
+        )
+        return None
+    column_labels = [lab.strip() for lab in header.split(",")]
+    num_separators = len(column_labels) - 1
+    for _line_no, row in enumerate(rows):
+        if row.count(",") != num_separators:
+            line_no = _line_no + 2
+            print(
+                f"** Row/label mismatch in file {fpath} at line "
+                f"{line_no}. File will not be loaded."
+            )
+            return None
+
+    # unit, observable and time columns, read at once (units as strings)
+    unit_indices = [
+        c_i for c_i, c_label in enumerate(column_labels) if c_label in UNIT_LABELS
+    ]
+    obs_indices = [
+        c_i for c_i, c_label in enumerate(column_labels) if c_label in OBS_NAME_MAP
+    ]
+    time_indices = [
+        c_i for c_i, c_label in enumerate(column_labels) if c_label == TIME_LABEL
+    ][:1]
+    used_indices = sorted(set(unit_indices + obs_indices + time_indices))
+    row_table = np.loadtxt(
+        rows,
+        delimiter=",",
+        dtype=[
+            (f"c{c_i}", UNIT_LABEL_DTYPE if c_i in unit_indices else np.float64)
+            for c_i in used_indices
+        ],
+        usecols=used_indices,
+        ndmin=1,
+    )
+
+    # units, from the first data row (after checking they never change)
+    unit_columns = {
+        column_labels[c_i]: np.char.strip(row_table[f"c{c_i}"]) for c_i in unit_indices
+    }
+    if any(np.any(u_col != u_col[0]) for u_col in unit_columns.values()):
+        found_units = {
+            u_lab: [str(u_val) for u_val in np.unique(u_col)]
+            for u_lab, u_col in unit_columns.items()
+        }
+        print(
+            f"** Inhomogeneous unit labels found in file {fpath}: "
+            f"{found_units}. File will not be loaded."
+        )
+        return None
+    unit_map = {u_lab: str(u_col[0]) for u_lab, u_col in unit_columns.items()}
+
+    # observable columns, as a (rows x columns) float array
+    obs_labels = [column_labels[c_i] for c_i in obs_indices]
+    obs_table = np.empty((row_table.shape[0], len(obs_indices)), dtype=np.float64)
+    for o_i, c_i in enumerate(obs_indices):
+        obs_table[:, o_i] = row_table[f"c{c_i}"]
+    times: np.ndarray | None = None
+    if time_indices:
+        times = row_table[f"c{time_indices[0]}"].copy()
+    return obs_labels, obs_table, unit_map, times
+
+
 def load_csv_metrics(fpath: str) -> dict[str, tuple[float, str]] | None:
     """
     Read a CSV with metrics, pick relevant columns, return map
         name -> (value, unit)
     also dealing with filtering/average of rows. Return None if unsuitable data.
+
+    Columnar implementation: the numeric columns are parsed at once into a
+    2D float array and the count-weighted averages are computed column-wise.
     """
-    with open(fpath) as ofile:
-        lines = list(ofile.readlines())
-        if not lines:
-            print(
-                f"** No lines found in file {fpath}."
-                f"File will not be loaded."
-            )
-            return None
-        header, rows = lines[0], [_line.strip() for _line in lines[1:] if _line.strip()]
-        if not rows:
+    interval_table = load_csv_interval_table(fpath)
+    if interval_table is None:
+        return None
+    obs_labels, obs_table, unit_map, _ = interval_table
+    # all rows are kept here: see load_csv_steady_state for trimmed results
+    kept_table = obs_table
+    if kept_table.shape[0] == 0:
+        print(
+            f"** No admissible data lines found in file {fpath}."
+            f"File will not be loaded."
+        )
+        return None
+
+    # averages are weighted on 'counts'
+    counts = kept_table[:, obs_labels.index("count")]
+    total_counts = float(counts.sum())
+    weighted_sums = (kept_table * counts[:, np.newaxis]).sum(axis=0)
+    averages = {
+        c_label: float(w_sum) / total_counts
+        for c_label, w_sum in zip(obs_labels, weighted_sums)
+    }
+    # overwrite 'count' average
+    final_values = {
+        **averages,
+        "count": total_counts,
+    }
+    return _attach_units(final_values, unit_map)
+
+
+def load_csv_steady_state(
+    fpath: str, trim_spec: TrimSpec
+) -> dict[str, tuple[float, str]] | None:
+    """
+    Within-run analysis of a metric CSV: locate the steady state in the
+    per-interval series (trimming warm-up and cool-down) and return the
+    steady-state observables as a map
+        name -> (value, unit)
+    namely throughput (mean m1_rate) and its coefficient of variation as a
+    stability metric, the count-weighted mean latency and P99 and the numbers
+    of kept/trimmed intervals. Return None if unsuitable data.
+    """
+    interval_table = load_csv_interval_table(fpath)
+    if interval_table is None:
+        return None
+    obs_labels, obs_table, unit_map, times = interval_table
+    if any(c_label not in obs_labels for c_label in STEADY_STATE_COLUMNS):
+        return None
+    rates = obs_table[:, obs_labels.index("m1_rate")]
+    latencies = obs_table[:, obs_labels.index("mean")]
+    start, stop = find_steady_state([rates, latencies], times, trim_spec)
+
+    kept_table = obs_table[start:stop]
+    counts = kept_table[:, obs_labels.index("count")]
+    total_counts = float(np.sum(counts))
+    if total_counts == 0:
+        return None
+    rate_unit = OBS_UNIT_MAP[unit_map["rate_unit"]] if "rate_unit" in unit_map else ""
+    duration_unit = (
+        OBS_UNIT_MAP[unit_map["duration_unit"]] if "duration_unit" in unit_map else ""
+    )
+    ss_rates = rates[start:stop]
+
+    def _count_weighted_average(c_label: str) -> float:
+        c_values = kept_table[:, obs_labels.index(c_label)]
+        return float(np.sum(c_values * counts)) / total_counts
+
+    return {
+        f"{STEADY_STATE_OBS_PREFIX}rate": (float(np.mean(ss_rates)), rate_unit),
+        f"{STEADY_STATE_OBS_PREFIX}rate_cv": (coefficient_of_variation(ss_rates), ""),
+        f"{STEADY_STATE_OBS_PREFIX}mean": (
+            _count_weighted_average("mean"),
+            duration_unit,
+        ),
+        f"{STEADY_STATE_OBS_PREFIX}P990": (
+            _count_weighted_average("p99"),
+            duration_unit,
+        ),
+        f"{STEADY_STATE_OBS_PREFIX}intervals": (float(stop - start), ""),
+        f"{STEADY_STATE_OBS_PREFIX}trimmed_warmup": (float(start), ""),
+        f"{STEADY_STATE_OBS_PREFIX}trimmed_cooldown": (float(len(rates) - stop), ""),
+    }
+
+
+class CSVMetricAccumulator:
+    """
+    Running count-weighted sums over the rows of a metric CSV, fed one line
+    at a time (the header first). Memory does not grow with the number of
+    rows; only the latest row is kept (see `last_row`).
+    """
+
+    fpath: str
+    column_labels: list[str]
+    unit_indices: list[int]
+    obs_indices: list[int]
+    count_index: int
+    unit_map: dict[str, str]
+    weighted_sums: list[float]
+    total_counts: float
+    num_rows: int
+    last_val_strings: list[str]
+
+    def __init__(self, *, fpath: str, header: str) -> None:
+        self.fpath = fpath
+        self.column_labels = [lab.strip() for lab in header.split(",")]
+        self.unit_indices = [
+            c_i
+            for c_i, c_label in enumerate(self.column_labels)
+            if c_label in UNIT_LABELS
+        ]
+        self.obs_indices = [
+            c_i
+            for c_i, c_label in enumerate(self.column_labels)
+            if c_label in OBS_NAME_MAP
+        ]
+        self.count_index = self.column_labels.index("count")
+        self.unit_map = {}
+        self.weighted_sums = [0] * len(self.obs_indices)
+        self.total_counts = 0
+        self.num_rows = 0
+        self.last_val_strings = []
+
+    def add_line(self, line: str) -> bool:
+        """
+        Accumulate a data line (blank lines are skipped). Return False, with
+        the reason printed, if the line makes the file unsuitable.
+        """
+        row = line.strip()
+        if not row:
+            return True
+        line_no = self.num_rows + 2
+        self.num_rows += 1
+        val_strings = [val_str.strip() for val_str in row.split(",")]
+        if len(val_strings) != len(self.column_labels):
             print(
-                f"** No data lines found in file {fpath}."
-                f"File will not be loaded."
+                f"** Row/label mismatch in file {self.fpath} at line "
+                f"{line_no}. File will not be loaded."
             )
-            return None
-        column_labels = [lab.strip() for lab in header.split(",")]
-        value_columns: dict[str, list[str]] = {lab: [] for lab in column_labels}
-        for _line_no, row in enumerate(rows):
-            line_no = _line_no + 2
-            val_strings = [val_str.strip() for val_str in row.split(",")]
-            if len(val_strings) != len(column_labels):
+            return False
+        for c_i in self.unit_indices:
+            c_label, u_val = self.column_labels[c_i], val_strings[c_i]
+            if self.unit_map.setdefault(c_label, u_val) != u_val:
                 print(
-                    f"** Row/label mismatch in file {fpath} at line "
-                    f"{line_no}. File will not be loaded."
+                    f"** Inhomogeneous unit labels found in file {self.fpath}: "
+                    f"'{c_label}' is '{self.unit_map[c_label]}', then '{u_val}' "
+                    f"at line {line_no}. File will not be loaded."
                 )
-                return None
-            for col_lab, val_str in zip(column_labels, val_strings):
-                value_columns[col_lab] += [val_str]
-        # post-processing
-        unit_map = {
-            c_label: c_vals
-            for c_label, c_vals in value_columns.items()
-            if c_label in UNIT_LABELS
+                return False
+        count = float(val_strings[self.count_index])
+        self.total_counts += count
+        for o_i, c_i in enumerate(self.obs_indices):
+            self.weighted_sums[o_i] += float(val_strings[c_i]) * count
+        self.last_val_strings = val_strings
+        return True
+
+    def last_row(self) -> dict[str, float]:
+        """The observable columns of the latest row, label -> value."""
+        if not self.last_val_strings:
+            return {}
+        return {
+            self.column_labels[c_i]: float(self.last_val_strings[c_i])
+            for c_i in self.obs_indices
         }
-        if any(len(set(um_val)) > 1 for um_val in unit_map.values()):
-            print(
-                f"** Inhomogeneous unit labels found in file {fpath}: "
-                f"{unit_map}. File will not be loaded."
-            )
-            return None
-        obs_lists = {
-            c_label: [float(c_val) for c_val in c_vals]
-            for c_label, c_vals in value_columns.items()
-            if c_label in OBS_NAME_MAP
-        }
-        # TODO: improve this logic!
-        rows_to_keep = [row_i for row_i, row in enumerate(obs_lists["count"])]
-        if not rows_to_keep:
-            print(
-                f"** No admissible data lines found in file {fpath}."
-                f"File will not be loaded."
-            )
+
+    def unit(self, c_label: str) -> str:
+        """The unit of an observable column (as for the loaded values)."""
+        unit_type = OBS_TO_UNIT_TYPE[c_label]
+        if unit_type == "":
+            return ""
+        return OBS_UNIT_MAP.get(self.unit_map.get(unit_type, ""), "")
+
+    def values(self) -> dict[str, tuple[float, str]] | None:
+        """The map name -> (value, unit) over the rows so far, None if no rows."""
+        # TODO: improve this logic! (all rows are kept for now)
+        if self.num_rows == 0:
             return None
 
         # averages are weighted on 'counts'
-        counts = [obs_lists["count"][row_i] for row_i in rows_to_keep]
-        total_counts = sum(counts)
-
-        def _average(val_list):
-            return sum(val_list[row_i] * cnt for row_i, cnt in zip(rows_to_keep, counts)) / total_counts
-
         averages = {
-            c_label: _average(c_obslist)
-            for c_label, c_obslist in obs_lists.items()
+            self.column_labels[c_i]: w_sum / self.total_counts
+            for c_i, w_sum in zip(self.obs_indices, self.weighted_sums)
         }
         # overwrite 'count' average
         final_values = {
             **averages,
-            **{"count": total_counts},
+            "count": self.total_counts,
         }
-        # unit management
-        obs_name_to_unit = {
-            **{
-                c_unn: OBS_UNIT_MAP[c_uns[0]]
-                for c_unn, c_uns in unit_map.items()
-            },
-            **{"": ""},
-        }
-        values_with_unit = {
-            OBS_NAME_MAP[c_label]: (c_value, obs_name_to_unit[OBS_TO_UNIT_TYPE[c_label]])
-            for c_label, c_value in final_values.items()
-        }
-        return values_with_unit
+        return _attach_units(final_values, self.unit_map)
 
 
-def load_metric_csvs(src_dir: str) -> list[ParsedMetricSet]:
+def load_csv_metrics_streaming(fpath: str) -> dict[str, tuple[float, str]] | None:
+    """
+    Read a CSV with metrics, pick relevant columns, return map
+        name -> (value, unit)
+    also dealing with filtering/average of rows. Return None if unsuitable data.
+
+    Streaming implementation: the file is read once, line by line, keeping
+    only running count-weighted sums (memory does not grow with the number
+    of rows). Validation happens as rows are read.
+    """
+    with open_run_file(fpath) as ofile:
+        header = ofile.readline()
+        if not header:
+            print(
+                f"** No lines found in file {fpath}."
+                f"File will not be loaded."
+            )
+            return None
+        accumulator = CSVMetricAccumulator(fpath=fpath, header=header)
+        for _line in ofile:
+            if not accumulator.add_line(_line):
+                return None
+
+    metric_values = accumulator.values()
+    if metric_values is None:
+        print(
+            f"** No data lines found in file {fpath}."
+            f"File will not be loaded."
+        )
+    return metric_values
+
+
+def load_run_histograms(
+    src_dir: str,
+) -> dict[tuple[str, str, str, str], HdrHistogram]:
+    """
+    Load the histogram log of a run directory, if any, into a map
+        (workload, scenario, activity, name) -> whole-run merged histogram
+    Histogram tags are expected to follow the naming of the metric csv files.
+    """
+    histogram_log_filename = locate_histogram_log_filename(src_dir)
+    if histogram_log_filename is None:
+        return {}
+    print(f"  Loading {histogram_log_filename}")
+    tagged_histograms = load_histogram_log(
+        os.path.join(src_dir, histogram_log_filename),
+    )
+    run_histograms: dict[tuple[str, str, str, str], HdrHistogram] = {}
+    for tag, histogram in tagged_histograms.items():
+        h_desc = csv_filename_to_activity_desc(f"{tag}.csv")
+        if h_desc is not None:
+            h_key = (
+                h_desc["workload"],
+                h_desc["scenario"],
+                h_desc["activity"],
+                h_desc["name"],
+            )
+            run_histograms[h_key] = histogram
+    print(f"    Found {len(run_histograms)} usable histograms.")
+    return run_histograms
+
+
+def apply_histogram_percentiles(
+    metrics: dict[str, tuple[float, str]],
+    histogram: HdrHistogram | None,
+) -> dict[str, tuple[float, str]]:
+    """
+    Replace the (approximate) averaged percentiles with the exact ones from the
+    whole-run histogram, if provided, and mark the result accordingly.
+    """
+    if histogram is None or histogram.total_count == 0:
+        return {**metrics, PERCENTILES_EXACT_OBS: (0.0, "")}
+    exact_metrics = dict(metrics)
+    for c_label, percentile in HDR_PERCENTILES.items():
+        obs_name = OBS_NAME_MAP[c_label]
+        if obs_name in exact_metrics:
+            exact_metrics[obs_name] = (
+                float(histogram.value_at_percentile(percentile)),
+                exact_metrics[obs_name][1],
+            )
+    exact_metrics[PERCENTILES_EXACT_OBS] = (1.0, "")
+    return exact_metrics
+
+
+def normalize_batch_metrics(
+    metrics: dict[str, tuple[float, str]],
+    batch_size: int,
+) -> dict[str, tuple[float, str]]:
+    """
+    Express the rates of a batched activity in documents per second (each
+    operation writing `batch_size` documents) and record the batch size.
+    Counts and latencies stay per operation.
+    """
+    normalized_metrics = dict(metrics)
+    for obs_name in BATCH_RATE_OBSERVABLES:
+        if obs_name in normalized_metrics:
+            normalized_metrics[obs_name] = (
+                normalized_metrics[obs_name][0] * batch_size,
+                BATCH_RATE_UNIT,
+            )
+    normalized_metrics[BATCH_SIZE_OBS] = (float(batch_size), "")
+    return normalized_metrics
+
+
+def load_metric_csvs(
+    src_dir: str, *, streaming: bool = False, trim_spec: TrimSpec | None = None
+) -> list[ParsedMetricSet]:
     """
     Scans files in a directory, pick those expressing metrics of interest, and
     return their contents as a ParsedMetricSet (in part. averaged over csv rows).
+
+    With `streaming`, each CSV is aggregated line by line in constant memory.
+    With a `trim_spec`, the steady-state observables are added as well (this
+    needs the whole per-interval series in memory, even when streaming).
     """
     print(f"Loading CSVs from {src_dir}")
+    csv_loader = load_csv_metrics_streaming if streaming else load_csv_metrics
 
     all_csvs = [
-        (fpath, fname)
-        for fname in os.listdir(src_dir)
+        (os.path.join(src_dir, fname), fname)
+        for fname in list_run_files(src_dir)
         if fname[-4:].lower() == ".csv"
-        if os.path.isfile(fpath := os.path.join(src_dir, fname))
     ]
     csv_to_activity_desc = {
         fpath: activity_desc
@@ -243,14 +693,28 @@ def load_metric_csvs(src_dir: str) -> list[ParsedMetricSet]:
         if is_useful_activity(activity_desc)
     }
     print(f"    Found {len(csv_to_activity_desc)} suitable metric csv.")
-
+    run_histograms = load_run_histograms(src_dir)
 
     parsed_metric_sets: list[ParsedMetricSet] = []
     for fpath, activity_desc in csv_to_activity_desc.items():
         print(f"    * '{fpath}' ... ", end="")
-        metrics = load_csv_metrics(fpath)
+        t0 = time.perf_counter()
+        metrics = csv_loader(fpath)
+        record_item("csv_file", fpath, time.perf_counter() - t0)
         if metrics:
-            print("OK")
+            h_key = (
+                activity_desc["workload"],
+                activity_desc["scenario"],
+                activity_desc["activity"],
+                activity_desc["name"],
+            )
+            metrics = apply_histogram_percentiles(metrics, run_histograms.get(h_key))
+            if trim_spec is not None:
+                metrics = {**metrics, **(load_csv_steady_state(fpath, trim_spec) or {})}
+            batch_size = get_batch_size(activity_desc["activity"])
+            if batch_size is not None:
+                metrics = normalize_batch_metrics(metrics, batch_size)
+            print("OK" if h_key not in run_histograms else "OK (exact percentiles)")
             parsed_metric_sets.append(
                 ParsedMetricSet(
                     workload=activity_desc["workload"],
@@ -265,10 +729,13 @@ def load_metric_csvs(src_dir: str) -> list[ParsedMetricSet]:
     return parsed_metric_sets
 
 
-def parse_run_dir(src_dir: str) -> ParsedRun:
+def parse_run_dir(
+    src_dir: str, *, streaming: bool = False, trim_spec: TrimSpec | None = None
+) -> ParsedRun:
     """
     Parse a whole run directory into a cleaned data structure
-    isomorphic to the directory contents.
+    isomorphic to the directory contents. A run archive is read in a single
+    pass, in memory (see os_lib.reading_run_archive).
 
     The return type of this function has the shape (schematically):
 
@@ -279,19 +746,71 @@ def parse_run_dir(src_dir: str) -> ParsedRun:
         ]
     """
     print(f"Parsing {src_dir}")
+    t0 = time.perf_counter()
 
-    metaparameters_filename = locate_metaparameters_filename(src_dir)
+    with reading_run_archive(src_dir):
+        metaparameters_filename = locate_metaparameters_filename(src_dir)
 
-    metaparameters: dict[str, str]
-    if metaparameters_filename:
-        print(f"  Loading {metaparameters_filename}")
-        metaparameters = load_metaparameters(
-            os.path.join(src_dir, metaparameters_filename),
-        )
-    else:
-        metaparameters = {}
+        metaparameters: dict[str, str]
+        if metaparameters_filename:
+            print(f"  Loading {metaparameters_filename}")
+            metaparameters = load_metaparameters(
+                os.path.join(src_dir, metaparameters_filename),
+            )
+        else:
+            metaparameters = {}
 
-    metric_sets = load_metric_csvs(src_dir)
+        metric_sets = load_metric_csvs(
+            src_dir, streaming=streaming, trim_spec=trim_spec
+        )
 
     print(f"Done parsing {src_dir}\n")
+    record_item("run_dir", src_dir, time.perf_counter() - t0)
     return ParsedRun(metric_sets=metric_sets, metaparameters=metaparameters)
+
+
+def _parse_run_dir_capturing_output(
+    src_dir: str, streaming: bool, trim_spec: TrimSpec | None
+) -> tuple[ParsedRun, str, list[ItemTimingType]]:
+    # Worker-side wrapper: logging (and item timings) are buffered and returned
+    # to the caller, so that concurrent parsings do not mix their output lines.
+    log_buffer = io.StringIO()
+    with redirect_stdout(log_buffer), capture_items() as item_timings:
+        parsed_run = parse_run_dir(src_dir, streaming=streaming, trim_spec=trim_spec)
+    return parsed_run, log_buffer.getvalue(), item_timings
+
+
+def parse_run_dirs(
+    src_dirs: list[str],
+    workers: int = 1,
+    *,
+    streaming: bool = False,
+    trim_spec: TrimSpec | None = None,
+) -> dict[str, ParsedRun]:
+    """
+    Parse several run directories, optionally with a pool of worker processes.
+
+    The result (and the printed logs, emitted per-directory in input order)
+    are the same regardless of the number of workers.
+    """
+    if workers == 1 or len(src_dirs) <= 1:
+        return {
+            src_dir: parse_run_dir(src_dir, streaming=streaming, trim_spec=trim_spec)
+            for src_dir in src_dirs
+        }
+
+    parsed_runs: dict[str, ParsedRun] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parse_results = executor.map(
+            _parse_run_dir_capturing_output,
+            src_dirs,
+            [streaming] * len(src_dirs),
+            [trim_spec] * len(src_dirs),
+        )
+        for src_dir, (parsed_run, parse_log, item_timings) in zip(
+            src_dirs, parse_results
+        ):
+            print(parse_log, end="")
+            record_items(item_timings)
+            parsed_runs[src_dir] = parsed_run
+    return parsed_runs
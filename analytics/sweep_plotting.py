@@ -0,0 +1,103 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from obs_plotting import FIGURE_FORMAT
+from saturation_sweep import SweepCurve, SweepCurveKeyType
+
+SWEEPS_DIRNAME = "sweeps"
+SWEEP_FIGURE_SUFFIX = "~sweep.png"
+
+# title, curve, output path
+SweepJobType = tuple[str, SweepCurve, str]
+
+
+def render_sweep_figure(sweep_job: SweepJobType) -> float:
+    """
+    Render a latency (P50, P99) vs. achieved throughput figure for a sweep,
+    each point labeled with its offered load and the knee (if any) circled.
+    Return the elapsed time (seconds).
+    """
+    from matplotlib.figure import Figure
+
+    t0 = time.perf_counter()
+    plot_title, curve, fig_path = sweep_job
+    # nanoseconds->milliseconds as for the observable plots
+    to_ms = 1000000.0 if curve.latency_unit == "ns" else 1.0
+    latency_unit = "ms" if curve.latency_unit == "ns" else curve.latency_unit
+    fig = Figure(figsize=FIGURE_FORMAT)
+    ax = fig.add_subplot()
+    ax.plot(curve.throughput, curve.p50 / to_ms, "*-", label=f"P500 ({latency_unit})")
+    ax.plot(curve.throughput, curve.p99 / to_ms, "*-", label=f"P990 ({latency_unit})")
+    for offered, throughput, p99 in zip(curve.offered, curve.throughput, curve.p99):
+        ax.annotate(
+            f"{curve.sweep_parameter.lower()}={offered:g}",
+            (throughput, p99 / to_ms),
+            textcoords="offset points",
+            xytext=(0, 8),
+            ha="center",
+        )
+    knee_index = curve.knee_index()
+    if knee_index is not None:
+        ax.plot(
+            [curve.throughput[knee_index]],
+            [curve.p99[knee_index] / to_ms],
+            color="red",
+            label="knee",
+            linestyle="none",
+            marker="o",
+            markersize=14,
+            fillstyle="none",
+        )
+    ax.set_title(plot_title)
+    ax.set_xlabel(f"Achieved throughput ({curve.throughput_unit})")
+    ax.set_ylabel(latency_unit)
+    ax.set_xlim(left=0)
+    ax.set_ylim(bottom=0)
+    ax.grid()
+    ax.legend()
+    fig.savefig(fig_path, bbox_inches="tight")
+    fig.clear()
+    return time.perf_counter() - t0
+
+
+def plot_sweeps(
+    sweep_curves: dict[str, dict[SweepCurveKeyType, SweepCurve]],
+    out_dir: str,
+    workers: int = 1,
+) -> dict[str, dict[SweepCurveKeyType, tuple[str, str]]]:
+    """
+    Render the latency/throughput figures for the curves of several sweep
+    directories (given as map sweep dir -> curves), each sweep in its own
+    subdirectory of out_dir/sweeps. Sweep directories are immutable, hence
+    existing figures are not rendered again.
+    Return the map sweep dir -> (workload, scenario, activity) -> (name, path).
+    """
+    sweeps_dir = os.path.join(out_dir, SWEEPS_DIRNAME)
+    sweep_jobs: list[SweepJobType] = []
+    gen_files: dict[str, dict[SweepCurveKeyType, tuple[str, str]]] = {}
+    print(f"\nPlotting sweeps to '{sweeps_dir}' ...")
+    for sweep_dir, curves in sweep_curves.items():
+        dir_name = os.path.basename(os.path.normpath(sweep_dir))
+        os.makedirs(os.path.join(sweeps_dir, dir_name), exist_ok=True)
+        for (_wl, _sc, _ac), curve in curves.items():
+            # attachment names must be unique across the whole page
+            fig_name = f"{dir_name}~{_sc}~{_ac}{SWEEP_FIGURE_SUFFIX}"
+            fig_path = os.path.join(sweeps_dir, dir_name, fig_name)
+            gen_files.setdefault(sweep_dir, {})[(_wl, _sc, _ac)] = (fig_name, fig_path)
+            if not os.path.isfile(fig_path):
+                sweep_jobs.append(
+                    (f"{dir_name} / {_sc} / {_ac} -- sweep", curve, fig_path)
+                )
+
+    t0 = time.perf_counter()
+    if workers == 1 or len(sweep_jobs) <= 1:
+        for sweep_job in sweep_jobs:
+            render_sweep_figure(sweep_job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(render_sweep_figure, sweep_jobs))
+    print(
+        f"Rendered {len(sweep_jobs)} sweep figures in {time.perf_counter() - t0:.2f} s."
+    )
+    return gen_files
@@ -0,0 +1,250 @@
+"""
+Synthetic run archive, shaped as the `logs/` archive on S3: one
+`<date>_CSV_<workload>` directory per run and workload, holding the nb5 metric
+CSVs (named as nb5 names them, see CSV_FILE_PATTERN) and a metaparameters.log.
+
+Usage:
+    python synthetic_runs.py --output_dir DIR --runs N [--rows N] [--seed N]
+
+The contents are plausible rather than exact: per-interval rates around the
+cycle rate, latencies depending on the kind of operation (and batch size),
+slow drifts across runs and the occasional slow run, a few failed operations.
+"""
+
+import argparse
+import math
+import os
+import random
+from datetime import datetime, timedelta
+
+from os_lib import DATE_FORMAT, METAPARAMETERS_FILENAME, RUN_DIR_KIND
+from summary_parsing import BATCH_ACTIVITY_PATTERN
+
+NB5_CSV_HEADER = (
+    "t,count,max,mean,min,stddev,p50,p75,p95,p98,p99,p999,"
+    "mean_rate,m1_rate,m5_rate,m15_rate,rate_unit,duration_unit"
+)
+# workload -> (scenario, activities), as in the workload YAMLs
+SYNTHETIC_WORKLOADS: dict[str, tuple[str, list[str]]] = {
+    "wl_coll_thin_nonvector": (
+        "sc_astra_dataapi_coll_thin_nonvector",
+        [
+            "schema",
+            "rampup",
+            "thin_write1",
+            "thin_find1_id",
+            "thin_write_batch5",
+            "thin_write_batch10",
+            "thin_write_batch20",
+        ],
+    ),
+    "wl_coll_thick_vector": (
+        "sc_astra_dataapi_coll_thick_vector",
+        [
+            "schema",
+            "rampup",
+            "thick_write1",
+            "thick_find_ann",
+            "thick_write_batch5",
+            "thick_write_batch10",
+            "thick_write_batch20",
+        ],
+    ),
+}
+# the metrics nb5 writes for each activity (only some of them are tracked)
+SYNTHETIC_METRIC_NAMES = [
+    "result",
+    "result_success",
+    "cycles_servicetime",
+    "cycles_waittime",
+    "tries",
+]
+SYNTHETIC_CONTAINER = "main"
+# median latency (ms) of a single-document operation, by kind of activity
+SYNTHETIC_BASE_LATENCIES_MS = {
+    "write": 18.0,
+    "find": 9.0,
+    "ann": 27.0,
+}
+SYNTHETIC_METAPARAMETERS = {
+    "CYCLERATE": "30",
+    "MAIN_CYCLES": "1000",
+    "MAIN_THREADS": "8",
+    "RAMPUP_CYCLES": "500",
+    "RAMPUP_THREADS": "3",
+    "TIMEOUT_SECONDS": "5400",
+    "TARGET_API_ENDPOINT": "https://synthetic-db.apps.astra.datastax.com",
+}
+SYNTHETIC_START_DATE = datetime(2024, 1, 1, 2, 0, 0)
+# runs of the workloads follow one another, every night
+SYNTHETIC_RUN_SPACING = timedelta(days=1)
+SYNTHETIC_WORKLOAD_SPACING = timedelta(minutes=40)
+SYNTHETIC_INTERVAL_SECONDS = 10
+SYNTHETIC_SLOW_RUN_PROBABILITY = 0.02
+SYNTHETIC_ERROR_PROBABILITY = 0.005
+
+
+def synthetic_run(run_i: int) -> tuple[str, str, datetime]:
+    """The (directory name, workload, date) of the i-th run of the archive."""
+    workloads = sorted(SYNTHETIC_WORKLOADS)
+    night_i, wl_i = divmod(run_i, len(workloads))
+    run_date = (
+        SYNTHETIC_START_DATE
+        + night_i * SYNTHETIC_RUN_SPACING
+        + wl_i * SYNTHETIC_WORKLOAD_SPACING
+    )
+    workload = workloads[wl_i]
+    dir_name = f"{run_date.strftime(DATE_FORMAT)}{RUN_DIR_KIND}_{workload}"
+    return dir_name, workload, run_date
+
+
+def _base_latency_ms(activity: str) -> float:
+    for kind, latency_ms in SYNTHETIC_BASE_LATENCIES_MS.items():
+        if kind in activity:
+            base_latency_ms = latency_ms
+            break
+    else:
+        # schema, rampup
+        base_latency_ms = SYNTHETIC_BASE_LATENCIES_MS["write"]
+    if batch_match := BATCH_ACTIVITY_PATTERN.match(activity):
+        # larger batches cost more per operation, less per document
+        base_latency_ms *= int(batch_match.group("batch_size")) ** 0.6
+    return base_latency_ms
+
+
+def synthetic_csv_lines(
+    rng: random.Random,
+    num_rows: int,
+    start_t: int,
+    rate: float,
+    latency_ms: float,
+    success_fraction: float = 1.0,
+) -> list[str]:
+    """The lines of an nb5 metric CSV (timer) with `num_rows` intervals."""
+    lines = [NB5_CSV_HEADER]
+    for row_i in range(num_rows):
+        interval_rate = max(rng.gauss(rate, 0.03 * rate), 0.1)
+        count = max(
+            round(interval_rate * SYNTHETIC_INTERVAL_SECONDS * success_fraction), 1
+        )
+        # latencies (ns) from a log-normal spread around the median
+        median_ns = latency_ms * rng.uniform(0.95, 1.05) * 1.0e6
+        percentiles = [
+            median_ns * math.exp(0.35 * z_score)
+            for z_score in (0.0, 0.674, 1.645, 2.054, 2.326, 3.090)
+        ]
+        values = [
+            percentiles[-1] * rng.uniform(1.1, 1.6),
+            median_ns * 1.06,
+            median_ns * rng.uniform(0.35, 0.5),
+            median_ns * 0.38,
+            *percentiles,
+            *(interval_rate * rng.uniform(0.98, 1.02) for _ in range(4)),
+        ]
+        interval_t = start_t + SYNTHETIC_INTERVAL_SECONDS * (row_i + 1)
+        lines.append(
+            f"{interval_t},{count},"
+            + ",".join(f"{val:.6g}" for val in values)
+            + ",calls/SECONDS,NANOSECONDS"
+        )
+    return lines
+
+
+def write_synthetic_run_dir(
+    run_dir: str,
+    workload: str,
+    run_date: datetime,
+    run_i: int,
+    num_rows: int,
+    rng: random.Random,
+) -> int:
+    """Fill a run directory with metrics and metaparameters. Return the file count."""
+    scenario, activities = SYNTHETIC_WORKLOADS[workload]
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, METAPARAMETERS_FILENAME), "w") as m_file:
+        m_file.write("# Meta-parameters for this run\n")
+        metaparameters = {
+            **SYNTHETIC_METAPARAMETERS,
+            "REPO_COMMIT_SHA": f"{rng.getrandbits(160):040x}",
+        }
+        m_file.writelines(
+            f"{mp_key}={mp_value}\n"
+            for mp_key, mp_value in sorted(metaparameters.items())
+        )
+    num_files = 1
+
+    # slow drift across the history, plus the odd slow run
+    drift = 1.0 + 0.1 * math.sin(run_i / 150.0)
+    if rng.random() < SYNTHETIC_SLOW_RUN_PROBABILITY:
+        drift *= rng.uniform(1.3, 2.0)
+    rate = float(SYNTHETIC_METAPARAMETERS["CYCLERATE"])
+    start_t = int(run_date.timestamp())
+    for activity in activities:
+        latency_ms = _base_latency_ms(activity) * drift
+        success_fraction = 1.0 - SYNTHETIC_ERROR_PROBABILITY * rng.random()
+        for metric_name in SYNTHETIC_METRIC_NAMES:
+            csv_name = (
+                f"{scenario}__{activity}__{metric_name}_container_"
+                f"{SYNTHETIC_CONTAINER}___workload_{workload}.csv"
+            )
+            csv_lines = synthetic_csv_lines(
+                rng,
+                num_rows,
+                start_t,
+                rate,
+                latency_ms,
+                success_fraction if metric_name == "result_success" else 1.0,
+            )
+            with open(os.path.join(run_dir, csv_name), "w") as o_file:
+                o_file.write("\n".join(csv_lines) + "\n")
+            num_files += 1
+    return num_files
+
+
+def generate_synthetic_archive(
+    output_dir: str,
+    num_runs: int,
+    *,
+    num_rows: int = 6,
+    seed: int = 0,
+) -> list[str]:
+    """
+    Create `num_runs` run directories in `output_dir` (the same seed gives
+    the same archive). Return their full paths.
+    """
+    rng = random.Random(seed)
+    run_dirs: list[str] = []
+    num_files = 0
+    for run_i in range(num_runs):
+        dir_name, workload, run_date = synthetic_run(run_i)
+        run_dir = os.path.join(output_dir, dir_name)
+        num_files += write_synthetic_run_dir(
+            run_dir, workload, run_date, run_i, num_rows, rng
+        )
+        run_dirs.append(run_dir)
+    print(f"Generated {num_runs} synthetic runs ({num_files} files) in '{output_dir}'.")
+    return run_dirs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic run archive.")
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        required=True,
+        help="Directory to create the run directories in",
+    )
+    parser.add_argument("--runs", type=int, default=10, help="Number of runs")
+    parser.add_argument(
+        "--rows", type=int, default=6, help="Reporting intervals per CSV"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+    generate_synthetic_archive(
+        args.output_dir, args.runs, num_rows=args.rows, seed=args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
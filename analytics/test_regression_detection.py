@@ -0,0 +1,97 @@
+"""
+Regression detection across the switch from averaged to exact percentiles.
+
+Usage:
+    python -m pytest test_regression_detection.py
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+from regression_detection import detect_regressions
+from results_table import PERCENTILES_EXACT_LABEL, ResultsTable
+from summary_parsing import PERCENTILES_EXACT_OBS, ParsedMetricSet, ParsedRun
+
+WORKLOAD = "wl_coll_thin_nonvector"
+METAPARAMETERS = {"MAIN_THREADS": "8", "CYCLERATE": "30"}
+SEGMENT_KEYS = ["MAIN_THREADS", "CYCLERATE"]
+NUM_AVERAGED_RUNS = 10
+NUM_EXACT_RUNS = 3
+# exact P99s are well above the averages of the per-interval P99s
+AVERAGED_P990_MS = 100.0
+EXACT_P990_MS = 160.0
+
+
+def make_run(p990_ms: float, percentiles_exact: bool) -> ParsedRun:
+    return ParsedRun(
+        metric_sets=[
+            ParsedMetricSet(
+                workload=WORKLOAD,
+                scenario="sc_astra_dataapi_coll_thin_nonvector",
+                activity="thin_find1_id",
+                name="result",
+                metrics={
+                    "P990": (p990_ms, "ms"),
+                    "rate_mean": (30.0, "/s"),
+                    PERCENTILES_EXACT_OBS: (float(percentiles_exact), ""),
+                },
+            )
+        ],
+        metaparameters=dict(METAPARAMETERS),
+    )
+
+
+def make_switching_runs(
+    mark_exact: bool = True,
+) -> dict[tuple[datetime, str], ParsedRun]:
+    """
+    Nightly runs with averaged percentiles, then with exact ones (marked as
+    such, unless `mark_exact` is False), at the same actual performance.
+    """
+    p990_series = [
+        (AVERAGED_P990_MS + run_i % 3, False) for run_i in range(NUM_AVERAGED_RUNS)
+    ]
+    p990_series += [
+        (EXACT_P990_MS + run_i % 3, mark_exact) for run_i in range(NUM_EXACT_RUNS)
+    ]
+    first_date = datetime(2024, 1, 1, 2, 0, 0)
+    return {
+        (first_date + timedelta(days=run_i), WORKLOAD): make_run(p990_ms, exact)
+        for run_i, (p990_ms, exact) in enumerate(p990_series)
+    }
+
+
+def find_regressions(parsed_runs: dict[tuple[datetime, str], ParsedRun]) -> list:
+    results = ResultsTable.from_parsed_runs(parsed_runs, segment_keys=SEGMENT_KEYS)
+    return [
+        reg
+        for reg in detect_regressions(results.group_by_metric_set_and_configuration())
+        if reg.observable == "P990"
+    ]
+
+
+class TestPercentilesSwitch(unittest.TestCase):
+    def test_switch_starts_a_new_series(self) -> None:
+        results = ResultsTable.from_parsed_runs(
+            make_switching_runs(), segment_keys=SEGMENT_KEYS
+        )
+        configurations = set(results.configurations)
+        self.assertEqual(
+            configurations,
+            {
+                "MAIN_THREADS=8,CYCLERATE=30",
+                f"MAIN_THREADS=8,CYCLERATE=30,{PERCENTILES_EXACT_LABEL}",
+            },
+        )
+
+    def test_switch_is_not_a_regression(self) -> None:
+        self.assertEqual(find_regressions(make_switching_runs()), [])
+
+    def test_unmarked_switch_would_be_flagged(self) -> None:
+        # the same values in a single series: the first exact runs stand out
+        regressions = find_regressions(make_switching_runs(mark_exact=False))
+        self.assertEqual(len(regressions), NUM_EXACT_RUNS)
+
+
+if __name__ == "__main__":
+    unittest.main()
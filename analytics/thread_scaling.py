@@ -0,0 +1,99 @@
+"""
+Thread scaling: runs of a workload with different thread counts (as recorded
+in their metaparameters) are compared with each other, to show how throughput
+and latency change with the client concurrency. Only runs agreeing on the
+other configuration metaparameters (e.g. the cyclerate) are compared.
+"""
+
+from datetime import datetime
+
+import numpy as np
+from results_table import run_configuration_label
+from scaling_curves import ScalingCurve, ScalingKeyType
+from summary_parsing import ParsedRun
+
+THREAD_SCALING_NAME = "thread_scaling"
+THREAD_COUNT_METAPARAMETER = "MAIN_THREADS"
+# held fixed along a comparison (besides any other segmentation key)
+THREAD_SCALING_FIXED_METAPARAMETERS = ["CYCLERATE"]
+THREAD_SCALING_METRIC_NAME = "result"
+# a comparison needs at least this many distinct thread counts
+MIN_THREAD_COUNTS = 2
+
+
+def build_thread_scalings(
+    parsed_runs: dict[tuple[datetime, str], ParsedRun],
+    segment_keys: list[str],
+) -> dict[ScalingKeyType, ScalingCurve]:
+    """
+    For each activity run with several thread counts, build the thread-count
+    comparison: each point is the median, over all runs with that thread
+    count, of the mean rate, P50 and P99.
+
+    A comparison is built for each fixed value of the other segmentation keys
+    (and of the cyclerate in any case), never mixing runs with exact and with
+    averaged percentiles: when an activity has several of them, the fixed
+    configuration is appended to the activity in the curve key.
+    """
+    fixed_keys = [
+        mp_key
+        for mp_key in dict.fromkeys(THREAD_SCALING_FIXED_METAPARAMETERS + segment_keys)
+        if mp_key != THREAD_COUNT_METAPARAMETER
+    ]
+    # (workload, scenario, activity) -> fixed configuration
+    #   -> thread count -> [(rate, P50, P99), ...]
+    activity_values: dict[
+        ScalingKeyType, dict[str, dict[float, list[tuple[float, ...]]]]
+    ] = {}
+    units: dict[ScalingKeyType, tuple[str, str]] = {}
+    for prun in parsed_runs.values():
+        metaparameters = prun.metaparameters or {}
+        if THREAD_COUNT_METAPARAMETER not in metaparameters:
+            continue
+        thread_count = float(metaparameters[THREAD_COUNT_METAPARAMETER])
+        fixed_configuration = run_configuration_label(prun, fixed_keys)
+        for pmset in prun.metric_sets:
+            if pmset.name != THREAD_SCALING_METRIC_NAME:
+                continue
+            if not {"rate_mean", "P500", "P990"} <= set(pmset.metrics):
+                continue
+            a_key = (pmset.workload, pmset.scenario, pmset.activity)
+            activity_values.setdefault(a_key, {}).setdefault(
+                fixed_configuration, {}
+            ).setdefault(thread_count, []).append(
+                (
+                    pmset.metrics["rate_mean"][0],
+                    pmset.metrics["P500"][0],
+                    pmset.metrics["P990"][0],
+                )
+            )
+            units[a_key] = (pmset.metrics["rate_mean"][1], pmset.metrics["P990"][1])
+    scalings: dict[ScalingKeyType, ScalingCurve] = {}
+    for a_key, config_values in sorted(activity_values.items()):
+        comparable_values = {
+            fixed_configuration: thread_values
+            for fixed_configuration, thread_values in sorted(config_values.items())
+            if len(thread_values) >= MIN_THREAD_COUNTS
+        }
+        for fixed_configuration, thread_values in comparable_values.items():
+            _wl, _sc, _ac = a_key
+            c_key = (
+                a_key
+                if len(comparable_values) == 1
+                else (_wl, _sc, f"{_ac}[{fixed_configuration}]")
+            )
+            num_runs = sum(len(values) for values in thread_values.values())
+            description = f"median over {num_runs} runs"
+            if fixed_configuration:
+                description += f", {fixed_configuration}"
+            scalings[c_key] = ScalingCurve(
+                parameter=THREAD_COUNT_METAPARAMETER.lower(),
+                points=[
+                    (thread_count, *np.median(np.array(values), axis=0).tolist())
+                    for thread_count, values in thread_values.items()
+                ],
+                rate_unit=units[a_key][0],
+                latency_unit=units[a_key][1],
+                description=description,
+            )
+    return scalings
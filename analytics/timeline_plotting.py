@@ -0,0 +1,149 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from obs_plotting import FIGURE_FORMAT, METRIC_NAMES_TO_PLOT
+from os_lib import get_run_name, list_run_files
+from steady_state import TrimSpec, find_steady_state
+from summary_parsing import (
+    STEADY_STATE_COLUMNS,
+    csv_filename_to_activity_desc,
+    is_useful_activity,
+    load_csv_interval_table,
+)
+
+TIMELINES_DIRNAME = "timelines"
+TIMELINE_TRIM_SPEC_FILETITLE = "trim_spec.json"
+TRIMMED_SPAN_STYLE = {"color": "grey", "alpha": 0.25}
+# bump this whenever the rendering logic changes (runs are then re-rendered):
+TIMELINE_LOGIC_VERSION = 2
+
+# title, csv path, trim spec, output path
+TimelineJobType = tuple[str, str, TrimSpec, str]
+
+
+def render_timeline_figure(timeline_job: TimelineJobType) -> float:
+    """
+    Render the per-interval timeline of a metric CSV (rate on top, latencies
+    below), shading the intervals trimmed away as warm-up/cool-down.
+    Return the elapsed time (seconds).
+    """
+    from matplotlib.figure import Figure
+
+    t0 = time.perf_counter()
+    plot_title, csv_path, trim_spec, fig_path = timeline_job
+    interval_table = load_csv_interval_table(csv_path)
+    if interval_table is None:
+        return time.perf_counter() - t0
+    obs_labels, obs_table, _, times = interval_table
+    if any(c_label not in obs_labels for c_label in STEADY_STATE_COLUMNS):
+        return time.perf_counter() - t0
+    rates = obs_table[:, obs_labels.index("m1_rate")]
+    latencies_ms = {
+        lat_label: obs_table[:, obs_labels.index(lat_label)] / 1000000.0
+        for lat_label in ("mean", "p99")
+    }
+    start, stop = find_steady_state(
+        [rates, obs_table[:, obs_labels.index("mean")]], times, trim_spec
+    )
+    x_values: np.ndarray
+    if times is not None:
+        x_values = times - times[0]
+        x_label = "Elapsed time (s)"
+    else:
+        x_values = np.arange(len(rates), dtype=np.float64)
+        x_label = "Interval"
+
+    fig = Figure(figsize=FIGURE_FORMAT)
+    ax_rate, ax_lat = fig.subplots(2, 1, sharex=True)
+    ax_rate.plot(x_values, rates, "*-", label="m1_rate (/s)")
+    for lat_label, lat_values in latencies_ms.items():
+        ax_lat.plot(x_values, lat_values, "*-", label=f"{lat_label} (ms)")
+    for ax in (ax_rate, ax_lat):
+        if start > 0:
+            ax.axvspan(x_values[0], x_values[start], **TRIMMED_SPAN_STYLE)
+        if stop < len(x_values):
+            ax.axvspan(x_values[stop], x_values[-1], **TRIMMED_SPAN_STYLE)
+        ax.set_ylim(bottom=0)
+        ax.grid()
+        ax.legend()
+    ax_rate.set_title(f"{plot_title} -- {trim_spec}")
+    ax_rate.set_ylabel("/s")
+    ax_lat.set_ylabel("ms")
+    ax_lat.set_xlabel(x_label)
+    fig.savefig(fig_path, bbox_inches="tight")
+    fig.clear()
+    return time.perf_counter() - t0
+
+
+def plot_run_timelines(
+    src_dirs: list[str],
+    out_dir: str,
+    trim_spec: TrimSpec,
+    workers: int = 1,
+) -> int:
+    """
+    Render the per-interval timelines of the given run directories, each in
+    its own subdirectory of out_dir/timelines. Run directories are immutable,
+    so runs already rendered (with the same trim settings and rendering logic)
+    are skipped.
+    Return the number of figures rendered.
+    """
+    timelines_dir = os.path.join(out_dir, TIMELINES_DIRNAME)
+    trim_spec_json = json.dumps(
+        {**trim_spec.to_dict(), "logic_version": TIMELINE_LOGIC_VERSION},
+        sort_keys=True,
+    )
+    timeline_jobs: list[TimelineJobType] = []
+    run_dirs_to_mark: list[str] = []
+    print(f"\nPlotting run timelines to '{timelines_dir}' ...")
+    for src_dir in src_dirs:
+        dir_name = get_run_name(src_dir)
+        run_timelines_dir = os.path.join(timelines_dir, dir_name)
+        trim_spec_filename = os.path.join(
+            run_timelines_dir, TIMELINE_TRIM_SPEC_FILETITLE
+        )
+        if os.path.isfile(trim_spec_filename):
+            with open(trim_spec_filename) as t_file:
+                if t_file.read() == trim_spec_json:
+                    continue
+        for fname in list_run_files(src_dir):
+            activity_desc = csv_filename_to_activity_desc(fname)
+            if activity_desc is None or not is_useful_activity(activity_desc):
+                continue
+            if activity_desc["name"] not in METRIC_NAMES_TO_PLOT:
+                continue
+            _sc, _ac, _na = (
+                activity_desc["scenario"],
+                activity_desc["activity"],
+                activity_desc["name"],
+            )
+            timeline_jobs.append(
+                (
+                    f"{dir_name} / {_sc} / {_ac} / {_na}",
+                    os.path.join(src_dir, fname),
+                    trim_spec,
+                    os.path.join(run_timelines_dir, f"{_sc}~{_ac}~{_na}.png"),
+                )
+            )
+        os.makedirs(run_timelines_dir, exist_ok=True)
+        run_dirs_to_mark.append(trim_spec_filename)
+
+    t0 = time.perf_counter()
+    if workers == 1 or len(timeline_jobs) <= 1:
+        for timeline_job in timeline_jobs:
+            render_timeline_figure(timeline_job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(render_timeline_figure, timeline_jobs))
+    # marking runs as done only after all their figures are rendered
+    for trim_spec_filename in run_dirs_to_mark:
+        with open(trim_spec_filename, "w") as t_file:
+            t_file.write(trim_spec_json)
+    print(
+        f"Rendered {len(timeline_jobs)} timelines for {len(run_dirs_to_mark)} runs "
+        f"in {time.perf_counter() - t0:.2f} s."
+    )
+    return len(timeline_jobs)
@@ -0,0 +1,636 @@
+"""
+Usage:
+    python3 dataapi_standin.py [--port 8181] [--latency CMD=SPEC ...]
+        [--error_rate CMD=P ...] [--error_status 200] [--stats_file FILE]
+
+A local, in-memory stand-in for the Data API, implementing the commands used
+by the test workloads (createCollection, deleteMany, insertOne/insertMany with
+or without vectors, find/findOne by filter and with a vector sort), so that
+nb5 and the whole harness can run against localhost, offline.
+
+Point the harness to it with ASTRA_DB_API_ENDPOINT="http://localhost:8181"
+(any token and keyspace will do). Requests are served at
+    POST /api/json/v1/<keyspace>[/<collection>]
+and GET /stats returns per-command counts and server-side times: comparing
+those with the latencies measured by nb5 isolates the client's own overhead.
+
+Latencies are injected per command (or 'default') as:
+    constant:<ms>  uniform:<min_ms>:<max_ms>
+    exponential:<mean_ms>  lognormal:<median_ms>:<sigma>
+and a fraction of requests can be failed (error_rate), either with a Data API
+error in the response body (error_status 200) or with an HTTP error status.
+
+Only the standard library is used (this runs on a bare EC2 instance).
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+DEFAULT_PORT = 8181
+DEFAULT_COMMAND_KEY = "default"
+API_PATH_PATTERN = re.compile(
+    r"^/api/json/v1/(?P<keyspace>[^/]+)(?:/(?P<collection>[^/]+))?/?$"
+)
+STATS_PATH = "/stats"
+VECTOR_FIELD = "$vector"
+# as for the Data API: page size of find, and the cap with a vector sort
+FIND_PAGE_SIZE = 20
+VECTOR_SORT_MAX_LIMIT = 1000
+DEFAULT_METRIC = "cosine"
+INJECTED_ERROR_CODE = "STANDIN_INJECTED_ERROR"
+LATENCY_KINDS = {
+    "constant": 1,
+    "uniform": 2,
+    "exponential": 1,
+    "lognormal": 2,
+}
+
+
+class DataAPIError(Exception):
+    """An error reported in the response body, as the Data API does."""
+
+    error_code: str
+
+    def __init__(self, error_code: str, message: str) -> None:
+        super().__init__(message)
+        self.error_code = error_code
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"errorCode": self.error_code, "message": str(self)}
+
+
+class LatencyModel:
+    """A distribution of injected latencies (parameters in milliseconds)."""
+
+    kind: str
+    parameters: list[float]
+
+    def __init__(self, kind: str, parameters: list[float]) -> None:
+        if LATENCY_KINDS.get(kind) != len(parameters):
+            raise ValueError(
+                f"Unrecognized latency specification '{kind}' with "
+                f"{len(parameters)} parameters (kinds: "
+                f"{', '.join(sorted(LATENCY_KINDS))})."
+            )
+        self.kind = kind
+        self.parameters = parameters
+
+    def __repr__(self) -> str:
+        return f"LatencyModel({self.to_string()})"
+
+    @staticmethod
+    def from_string(latency_spec: str) -> "LatencyModel":
+        kind, *parameter_strings = latency_spec.strip().split(":")
+        try:
+            parameters = [float(p_string) for p_string in parameter_strings]
+        except ValueError:
+            raise ValueError(
+                f"Unrecognized latency specification '{latency_spec}'."
+            ) from None
+        return LatencyModel(kind, parameters)
+
+    def to_string(self) -> str:
+        return ":".join([self.kind, *(f"{param:g}" for param in self.parameters)])
+
+    def sample_seconds(self, rng: random.Random) -> float:
+        if self.kind == "constant":
+            latency_ms = self.parameters[0]
+        elif self.kind == "uniform":
+            latency_ms = rng.uniform(self.parameters[0], self.parameters[1])
+        elif self.kind == "exponential":
+            latency_ms = rng.expovariate(1.0 / self.parameters[0])
+        else:
+            latency_ms = rng.lognormvariate(
+                math.log(self.parameters[0]), self.parameters[1]
+            )
+        return max(latency_ms, 0.0) / 1000.0
+
+
+def parse_command_settings(
+    setting_strings: list[str], parse_value: Any
+) -> dict[str, Any]:
+    """Parse 'command=value' strings (command may be 'default') into a map."""
+    settings: dict[str, Any] = {}
+    for setting_string in setting_strings:
+        if "=" not in setting_string:
+            raise ValueError(f"Expected 'command=value', found '{setting_string}'.")
+        command, value_string = setting_string.split("=", 1)
+        settings[command.strip()] = parse_value(value_string)
+    return settings
+
+
+def matches_filter(document: dict[str, Any], doc_filter: dict[str, Any]) -> bool:
+    """
+    Evaluate a (subset of the) Data API filter language on a document:
+    implicit equality, $eq, $ne, $in, $nin, $exists, $and, $or.
+    """
+    for f_key, f_value in doc_filter.items():
+        if f_key == "$and":
+            if not all(matches_filter(document, sub_f) for sub_f in f_value):
+                return False
+        elif f_key == "$or":
+            if not any(matches_filter(document, sub_f) for sub_f in f_value):
+                return False
+        elif isinstance(f_value, dict) and any(op[0] == "$" for op in f_value):
+            for op, op_value in f_value.items():
+                if op == "$eq":
+                    ok = document.get(f_key) == op_value
+                elif op == "$ne":
+                    ok = document.get(f_key) != op_value
+                elif op == "$in":
+                    ok = document.get(f_key) in op_value
+                elif op == "$nin":
+                    ok = document.get(f_key) not in op_value
+                elif op == "$exists":
+                    ok = (f_key in document) == bool(op_value)
+                else:
+                    raise DataAPIError(
+                        "UNSUPPORTED_FILTER_OPERATION",
+                        f"Filter operator not supported by the stand-in: {op}",
+                    )
+                if not ok:
+                    return False
+        elif document.get(f_key) != f_value:
+            return False
+    return True
+
+
+def vector_similarity(metric: str, vec_a: list[float], vec_b: list[float]) -> float:
+    """Similarity as normalized by the Data API (higher is closer)."""
+    if len(vec_a) != len(vec_b):
+        raise DataAPIError(
+            "VECTOR_SIZE_MISMATCH",
+            f"Vector of size {len(vec_a)} for a collection of dimension {len(vec_b)}",
+        )
+    dot = sum(a_i * b_i for a_i, b_i in zip(vec_a, vec_b))
+    if metric == "dot_product":
+        return (1.0 + dot) / 2.0
+    if metric == "euclidean":
+        distance2 = sum((a_i - b_i) ** 2 for a_i, b_i in zip(vec_a, vec_b))
+        return 1.0 / (1.0 + distance2)
+    norms = math.sqrt(sum(a_i * a_i for a_i in vec_a)) * math.sqrt(
+        sum(b_i * b_i for b_i in vec_b)
+    )
+    return (1.0 + dot / norms) / 2.0 if norms > 0 else 0.0
+
+
+def _project(
+    document: dict[str, Any], projection: dict[str, Any] | None
+) -> dict[str, Any]:
+    # as for the Data API, the vector is returned only if explicitly requested
+    if projection and projection.get(VECTOR_FIELD):
+        return dict(document)
+    return {d_key: d_val for d_key, d_val in document.items() if d_key != VECTOR_FIELD}
+
+
+class StandInCollection:
+    options: dict[str, Any]
+    documents: dict[str, dict[str, Any]]
+
+    def __init__(self, options: dict[str, Any]) -> None:
+        self.options = options
+        self.documents = {}
+
+    @property
+    def metric(self) -> str:
+        return self.options.get("vector", {}).get("metric", DEFAULT_METRIC)
+
+    def insert(self, document: dict[str, Any]) -> str:
+        doc_id = document.get("_id")
+        if doc_id is None:
+            doc_id = f"{random.getrandbits(64):016x}"
+            document = {"_id": doc_id, **document}
+        doc_key = json.dumps(doc_id)
+        if doc_key in self.documents:
+            raise DataAPIError(
+                "DOCUMENT_ALREADY_EXISTS",
+                f"Document already exists with the given _id: {doc_id}",
+            )
+        self.documents[doc_key] = document
+        return doc_id
+
+    def find(
+        self,
+        doc_filter: dict[str, Any],
+        sort: dict[str, Any] | None,
+        limit: int | None,
+    ) -> list[tuple[float | None, dict[str, Any]]]:
+        """Matching documents (with their similarity, for a vector sort)."""
+        matching = [
+            doc for doc in self.documents.values() if matches_filter(doc, doc_filter)
+        ]
+        if sort and VECTOR_FIELD in sort:
+            query_vector = sort[VECTOR_FIELD]
+            max_limit = min(limit or VECTOR_SORT_MAX_LIMIT, VECTOR_SORT_MAX_LIMIT)
+            metric = self.metric
+            scored = sorted(
+                (
+                    (vector_similarity(metric, query_vector, doc[VECTOR_FIELD]), doc)
+                    for doc in matching
+                    if VECTOR_FIELD in doc
+                ),
+                key=lambda sim_doc: -sim_doc[0],
+            )
+            return list(scored[:max_limit])
+        return [(None, doc) for doc in matching[: limit or FIND_PAGE_SIZE]]
+
+    def delete(self, doc_filter: dict[str, Any]) -> int:
+        if not doc_filter:
+            self.documents.clear()
+            # the Data API does not count the documents of a delete-all
+            return -1
+        doc_keys = [
+            doc_key
+            for doc_key, doc in self.documents.items()
+            if matches_filter(doc, doc_filter)
+        ]
+        for doc_key in doc_keys:
+            del self.documents[doc_key]
+        return len(doc_keys)
+
+
+class CommandStats:
+    count: int
+    errors: int
+    injected_errors: int
+    injected_latency_s: float
+    handling_s: float
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.injected_errors = 0
+        self.injected_latency_s = 0.0
+        self.handling_s = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "injected_errors": self.injected_errors,
+            "injected_latency_s": self.injected_latency_s,
+            "handling_s": self.handling_s,
+            "mean_server_time_ms": (
+                1000.0 * (self.injected_latency_s + self.handling_s) / self.count
+                if self.count
+                else None
+            ),
+        }
+
+
+class DataAPIStandIn:
+    """The in-memory state and the command logic of the stand-in."""
+
+    latencies: dict[str, LatencyModel]
+    error_rates: dict[str, float]
+    keyspaces: dict[str, dict[str, StandInCollection]]
+    stats: dict[str, CommandStats]
+    _lock: threading.Lock
+    _rng: random.Random
+
+    def __init__(
+        self,
+        *,
+        latencies: dict[str, LatencyModel] | None = None,
+        error_rates: dict[str, float] | None = None,
+        seed: int | None = None,
+    ) -> None:
+        self.latencies = latencies or {}
+        self.error_rates = error_rates or {}
+        self.keyspaces = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+    def _command_setting(self, settings: dict[str, Any], command: str) -> Any:
+        return settings.get(command, settings.get(DEFAULT_COMMAND_KEY))
+
+    def draw_injections(self, command: str) -> tuple[float, bool]:
+        """The latency (seconds) to inject and whether to fail this request."""
+        latency_model = self._command_setting(self.latencies, command)
+        error_rate = self._command_setting(self.error_rates, command) or 0.0
+        with self._lock:
+            latency_s = latency_model.sample_seconds(self._rng) if latency_model else 0
+            inject_error = self._rng.random() < error_rate
+        return latency_s, inject_error
+
+    def record(
+        self,
+        command: str,
+        *,
+        latency_s: float,
+        handling_s: float,
+        error: bool,
+        injected_error: bool,
+    ) -> None:
+        with self._lock:
+            c_stats = self.stats.setdefault(command, CommandStats())
+            c_stats.count += 1
+            c_stats.errors += int(error)
+            c_stats.injected_errors += int(injected_error)
+            c_stats.injected_latency_s += latency_s
+            c_stats.handling_s += handling_s
+
+    def stats_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                command: c_stats.to_dict()
+                for command, c_stats in sorted(self.stats.items())
+            }
+
+    def _collection(self, keyspace: str, collection: str) -> StandInCollection:
+        coll = self.keyspaces.get(keyspace, {}).get(collection)
+        if coll is None:
+            raise DataAPIError(
+                "COLLECTION_NOT_EXIST", f"Collection does not exist: {collection}"
+            )
+        return coll
+
+    def execute(
+        self,
+        keyspace: str,
+        collection: str | None,
+        command: str,
+        payload: dict[str, Any],
+    ) -> dict[str, Any]:
+        """Run a command, returning the response body (or raise DataAPIError)."""
+        with self._lock:
+            if collection is None:
+                return self._execute_keyspace_command(keyspace, command, payload)
+            return self._execute_collection_command(
+                keyspace, collection, command, payload
+            )
+
+    def _execute_keyspace_command(
+        self, keyspace: str, command: str, payload: dict[str, Any]
+    ) -> dict[str, Any]:
+        collections = self.keyspaces.setdefault(keyspace, {})
+        if command == "createCollection":
+            options = payload.get("options") or {}
+            existing = collections.get(payload["name"])
+            if existing is not None and existing.options != options:
+                raise DataAPIError(
+                    "EXISTING_COLLECTION_DIFFERENT_SETTINGS",
+                    f"Collection already exists with different settings: "
+                    f"{payload['name']}",
+                )
+            if existing is None:
+                collections[payload["name"]] = StandInCollection(options)
+            return {"status": {"ok": 1}}
+        if command == "deleteCollection":
+            collections.pop(payload["name"], None)
+            return {"status": {"ok": 1}}
+        if command == "findCollections":
+            if (payload.get("options") or {}).get("explain"):
+                return {
+                    "status": {
+                        "collections": [
+                            {"name": c_name, "options": coll.options}
+                            for c_name, coll in collections.items()
+                        ]
+                    }
+                }
+            return {"status": {"collections": list(collections)}}
+        raise DataAPIError("UNKNOWN_COMMAND", f"Unknown keyspace command: {command}")
+
+    def _execute_collection_command(
+        self,
+        keyspace: str,
+        collection: str,
+        command: str,
+        payload: dict[str, Any],
+    ) -> dict[str, Any]:
+        coll = self._collection(keyspace, collection)
+        options = payload.get("options") or {}
+        if command == "insertOne":
+            return {"status": {"insertedIds": [coll.insert(payload["document"])]}}
+        if command == "insertMany":
+            inserted_ids: list[Any] = []
+            errors: list[dict[str, Any]] = []
+            for document in payload["documents"]:
+                try:
+                    inserted_ids.append(coll.insert(document))
+                except DataAPIError as exc:
+                    errors.append(exc.to_dict())
+                    if options.get("ordered", False):
+                        break
+            response: dict[str, Any] = {"status": {"insertedIds": inserted_ids}}
+            if errors:
+                response["errors"] = errors
+            return response
+        if command in {"find", "findOne"}:
+            found = coll.find(
+                payload.get("filter") or {},
+                payload.get("sort"),
+                1 if command == "findOne" else options.get("limit"),
+            )
+            documents = [
+                {
+                    **_project(doc, payload.get("projection")),
+                    **(
+                        {"$similarity": similarity}
+                        if similarity is not None and options.get("includeSimilarity")
+                        else {}
+                    ),
+                }
+                for similarity, doc in found
+            ]
+            if command == "findOne":
+                return {"data": {"document": documents[0] if documents else None}}
+            return {"data": {"documents": documents, "nextPageState": None}}
+        if command == "countDocuments":
+            doc_filter = payload.get("filter") or {}
+            return {
+                "status": {
+                    "count": sum(
+                        1
+                        for doc in coll.documents.values()
+                        if matches_filter(doc, doc_filter)
+                    )
+                }
+            }
+        if command == "estimatedDocumentCount":
+            return {"status": {"count": len(coll.documents)}}
+        if command == "deleteOne":
+            found = coll.find(payload.get("filter") or {}, payload.get("sort"), 1)
+            if found:
+                coll.delete({"_id": found[0][1]["_id"]})
+            return {"status": {"deletedCount": len(found)}}
+        if command == "deleteMany":
+            deleted_count = coll.delete(payload.get("filter") or {})
+            return {"status": {"deletedCount": deleted_count}}
+        raise DataAPIError("UNKNOWN_COMMAND", f"Unknown collection command: {command}")
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    # set on the server class (see make_server)
+    standin: DataAPIStandIn
+    error_status: int
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # no access log: one line per request would dwarf everything else
+        pass
+
+    def _send_json(self, status: int, body: dict[str, Any]) -> None:
+        encoded_body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == STATS_PATH:
+            self._send_json(200, self.standin.stats_dict())
+        else:
+            self._send_json(404, {"errors": [{"message": "Not found"}]})
+
+    def do_POST(self) -> None:
+        path_match = API_PATH_PATTERN.match(self.path)
+        content_length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(content_length)
+        if path_match is None:
+            self._send_json(404, {"errors": [{"message": "Not found"}]})
+            return
+        try:
+            request_body = json.loads(raw_body or b"{}")
+            ((command, payload),) = request_body.items()
+        except (ValueError, AttributeError):
+            self._send_json(
+                400, {"errors": [{"message": "Expected a single-command JSON body"}]}
+            )
+            return
+
+        latency_s, inject_error = self.standin.draw_injections(command)
+        if latency_s > 0:
+            time.sleep(latency_s)
+        t0 = time.perf_counter()
+        status = 200
+        response: dict[str, Any]
+        if inject_error:
+            injected = DataAPIError(INJECTED_ERROR_CODE, "Injected error")
+            response = {"errors": [injected.to_dict()]}
+            status = self.error_status
+        else:
+            try:
+                response = self.standin.execute(
+                    path_match.group("keyspace"),
+                    path_match.group("collection"),
+                    command,
+                    payload or {},
+                )
+            except DataAPIError as exc:
+                response = {"errors": [exc.to_dict()]}
+            except (KeyError, TypeError, AttributeError) as exc:
+                response = {
+                    "errors": [{"errorCode": "INVALID_REQUEST", "message": repr(exc)}]
+                }
+        self._send_json(status, response)
+        self.standin.record(
+            command,
+            latency_s=latency_s,
+            handling_s=time.perf_counter() - t0,
+            error="errors" in response,
+            injected_error=inject_error,
+        )
+
+
+def make_server(
+    standin: DataAPIStandIn,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    error_status: int = 200,
+) -> ThreadingHTTPServer:
+    """A threaded HTTP server for the stand-in (port 0 picks a free port)."""
+    handler_class = type(
+        "BoundStandInRequestHandler",
+        (StandInRequestHandler,),
+        {"standin": standin, "error_status": error_status},
+    )
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    return server
+
+
+def _raise_keyboard_interrupt(signum: int, frame: Any) -> None:
+    raise KeyboardInterrupt
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Data API stand-in server.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--latency",
+        type=str,
+        action="append",
+        default=[],
+        help=(
+            "Injected latency, as 'command=kind:params' (command can be "
+            "'default'), e.g. 'default=lognormal:8:0.5' or 'find=constant:20'"
+        ),
+    )
+    parser.add_argument(
+        "--error_rate",
+        type=str,
+        action="append",
+        default=[],
+        help="Fraction of failed requests, as 'command=p', e.g. 'insertOne=0.01'",
+    )
+    parser.add_argument(
+        "--error_status",
+        type=int,
+        default=200,
+        help=(
+            "HTTP status of injected errors (default: 200, i.e. a Data API "
+            "error in the response body)"
+        ),
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--stats_file",
+        type=str,
+        default=None,
+        help="Write the per-command statistics to this JSON file on exit",
+    )
+    args = parser.parse_args()
+    try:
+        latencies = parse_command_settings(args.latency, LatencyModel.from_string)
+        error_rates = parse_command_settings(args.error_rate, float)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    standin = DataAPIStandIn(
+        latencies=latencies, error_rates=error_rates, seed=args.seed
+    )
+    server = make_server(standin, args.host, args.port, args.error_status)
+    print(f"Data API stand-in listening on http://{args.host}:{server.server_port}")
+    for command, latency_model in sorted(latencies.items()):
+        print(f"    latency {command}: {latency_model.to_string()}")
+    for command, error_rate in sorted(error_rates.items()):
+        print(f"    error rate {command}: {error_rate:g}")
+    # a terminated server (e.g. by the harness) still writes its statistics
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.stats_file:
+            with open(args.stats_file, "w") as s_file:
+                json.dump(standin.stats_dict(), s_file, indent=2, sort_keys=True)
+            print(f"Statistics written to {args.stats_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,54 @@
 """
 Usage:
-    <script> environment region keyspace token
+    <script> environment region keyspace token [--run_tag T] [--pool_size N]
+        [--no_wait]
+
+Lease a database from the pool of pre-warmed test databases (see db_pool.py),
+with its test collections dropped, and start creating new spares to keep
+`--pool_size` of them. If the pool has no free database, a new one is created
+and waited for, unless `--no_wait`: the endpoint is then printed at once, and
+`db_pool.py ... wait` must be run before using the database.
 
 On success:
     it prints exactly one line to stdout, the database API Endpoint.
 """
 
+import argparse
 import os
-import sys
-
-from astrapy import DataAPIClient
 
+from db_pool import DEFAULT_POOL_SIZE, make_database_pool
 
 if __name__ == "__main__":
-    ENVIRONMENT, REGION, KEYSPACE, TOKEN = sys.argv[1:5]
-    client = DataAPIClient(environment=ENVIRONMENT)
-    astra_admin = client.get_admin(token=TOKEN)
+    parser = argparse.ArgumentParser(description="Lease a test database.")
+    parser.add_argument("environment", type=str)
+    parser.add_argument("region", type=str)
+    parser.add_argument("keyspace", type=str)
+    parser.add_argument("token", type=str)
+    parser.add_argument(
+        "--run_tag",
+        type=str,
+        default=os.environ.get("RUN_TAG", "manual"),
+        help="Run to lease the database to (default: $RUN_TAG)",
+    )
+    parser.add_argument(
+        "--pool_size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help=f"Spare databases to keep (default: {DEFAULT_POOL_SIZE})",
+    )
+    parser.add_argument(
+        "--no_wait",
+        action="store_true",
+        help="Do not wait for a newly created database to be active",
+    )
+    args = parser.parse_args()
 
-    new_database_admin = astra_admin.create_database(
-        name="perf_test_auto",
-        cloud_provider="AWS",
-        region=REGION,
-        keyspace=KEYSPACE,
-        wait_until_active=True,
+    pool = make_database_pool(
+        args.environment, args.region, args.keyspace, args.token, args.pool_size
     )
+    api_endpoint, is_ready = pool.acquire(args.run_tag)
+    if not is_ready and not args.no_wait:
+        pool.wait_and_lease(api_endpoint, args.run_tag)
+    pool.top_up()
 
-    api_endpoint = new_database_admin.api_endpoint
     print(api_endpoint)
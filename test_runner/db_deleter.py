@@ -1,34 +1,62 @@
 """
 Usage:
-    <script> environment api_endpoint token
+    <script> environment api_endpoint token [--keyspace K] [--region R] [--drop]
 
-*WARNING*: this will delete the database, no questions asked
+Give a database of the pool of test databases (see db_pool.py) back to it,
+with its test collections dropped (it is dropped instead if `--drop` or too
+old to be recycled). Any other database is dropped.
+
+*WARNING*: this will delete the test collections, or the database, no
+questions asked
 
 On success:
     Nothing is printed. The script does not wait for the DB to actually disappear.
 """
 
-import os
-import sys
+import argparse
 
 from astrapy import DataAPIClient
 from astrapy.admin.endpoints import parse_api_endpoint
-
+from db_pool import DatabasePool
 
 if __name__ == "__main__":
-    ENVIRONMENT, ENDPOINT, TOKEN = sys.argv[1:4]
+    parser = argparse.ArgumentParser(description="Release a test database.")
+    parser.add_argument("environment", type=str)
+    parser.add_argument("api_endpoint", type=str)
+    parser.add_argument("token", type=str)
+    parser.add_argument(
+        "--keyspace",
+        type=str,
+        default=None,
+        help="Keyspace of the test collections (default: the database's)",
+    )
+    parser.add_argument(
+        "--drop",
+        action="store_true",
+        help="Drop the database even if it belongs to the pool",
+    )
+    args = parser.parse_args()
+    ENVIRONMENT, ENDPOINT, TOKEN = args.environment, args.api_endpoint, args.token
     client = DataAPIClient(environment=ENVIRONMENT)
     astra_admin = client.get_admin(token=TOKEN)
 
     # parsing and validation of endpoint
     parsed_endpoint = parse_api_endpoint(ENDPOINT)
-    if parsed_endpoint.environment != ENVIRONMENT:
+    if parsed_endpoint is None or parsed_endpoint.environment != ENVIRONMENT:
         raise ValueError(
             "Endpoint environment differs from working environment set by invocation."
         )
     database_id = parsed_endpoint.database_id
 
-    astra_admin.drop_database(
-        id=database_id,
-        wait_until_active=False,
+    pool = DatabasePool(
+        astra_admin,
+        client,
+        token=TOKEN,
+        region=parsed_endpoint.region,
+        keyspace=args.keyspace,
     )
+    if not pool.release(ENDPOINT, drop=args.drop):
+        astra_admin.drop_database(
+            id=database_id,
+            wait_until_active=False,
+        )
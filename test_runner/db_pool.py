@@ -0,0 +1,461 @@
+"""
+Usage:
+    <script> environment region keyspace token status
+    <script> environment region keyspace token top_up [--pool_size N]
+    <script> environment region keyspace token reap
+    <script> environment region keyspace token wait --api_endpoint E --run_tag T
+
+A pool of pre-warmed test databases (named POOL_DATABASE_NAME, in the
+region), so that a launch does not wait for a database to be created:
+db_creator.py leases a ready database from the pool (dropping the test
+collections left in it) and db_deleter.py gives it back for the next run.
+
+Each database holds its lease in a small collection (LEASE_COLLECTION_NAME),
+taken with a conditional update so that concurrent launches cannot get the
+same database. Databases are dropped instead of recycled once older than
+MAX_DATABASE_AGE_HOURS; reaping also drops hibernated or failed databases and
+those whose lease was never returned (e.g. a cancelled workflow).
+
+All admin operations are started without waiting (wait_until_active=False):
+when the pool is empty, a new database is created and its endpoint returned
+at once, and the `wait` command (run once the EC2 instance is set up) waits
+for it to become active and leases it. Such a database is reserved for its
+run by its name (POOL_DATABASE_NAME, RESERVED_NAME_SEPARATOR, run tag): it
+is not counted as a spare, and its lease starts out taken by that run, so no
+other launch gets it once active. After its release it is a spare like any
+other.
+
+The pool works on any admin object and client with the astrapy interface
+(`DatabasePool(admin, client, ...)`): astrapy itself is only imported by the
+command-line entry points.
+"""
+
+import argparse
+import sys
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+POOL_DATABASE_NAME = "perf_test_auto"
+# a database created for a run is named <POOL_DATABASE_NAME>__<run tag>
+RESERVED_NAME_SEPARATOR = "__"
+DEFAULT_CLOUD_PROVIDER = "AWS"
+DEFAULT_POOL_SIZE = 1
+LEASE_COLLECTION_NAME = "perf_test_pool_lease"
+LEASE_DOCUMENT_ID = "lease"
+MAX_DATABASE_AGE_HOURS = 7 * 24
+# longer than any test matrix (timeouts included), plus analysis and upload
+LEASE_TIMEOUT_HOURS = 12
+ACTIVE_TIMEOUT_SECONDS = 1800
+ACTIVE_POLL_SECONDS = 15
+ACTIVE_STATUS = "ACTIVE"
+# databases in these states are (or will be) usable
+LIVE_STATUSES = {"ACTIVE", "PENDING", "INITIALIZING", "MAINTENANCE"}
+# databases in these states are dropped by the reaper
+DEAD_STATUSES = {"HIBERNATED", "ERROR"}
+
+
+def _log(message: str) -> None:
+    # stdout is for the endpoint printed by the scripts
+    print(message, file=sys.stderr)
+
+
+class PoolDatabase:
+    """A database of the pool, as listed by the admin API."""
+
+    database_id: str
+    api_endpoint: str
+    status: str
+    created_at: datetime | None
+    reserved_for: str | None
+
+    def __init__(
+        self,
+        *,
+        database_id: str,
+        api_endpoint: str,
+        status: str,
+        created_at: datetime | None,
+        reserved_for: str | None = None,
+    ) -> None:
+        self.database_id = database_id
+        self.api_endpoint = api_endpoint
+        self.status = status
+        self.created_at = created_at
+        self.reserved_for = reserved_for
+
+    def __repr__(self) -> str:
+        return f"PoolDatabase({self.database_id}, {self.status})"
+
+    def age_hours(self) -> float:
+        if self.created_at is None:
+            return 0.0
+        created_at = self.created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=UTC)
+        return (datetime.now(UTC) - created_at) / timedelta(hours=1)
+
+
+def reserved_database_name(run_tag: str) -> str:
+    return f"{POOL_DATABASE_NAME}{RESERVED_NAME_SEPARATOR}{run_tag}"
+
+
+def parse_pool_database_name(database_name: str) -> tuple[bool, str | None]:
+    """
+    Whether a database name is that of a database of the pool, and the run it
+    was created for (None if created as a spare).
+    """
+    if database_name == POOL_DATABASE_NAME:
+        return True, None
+    reserved_prefix = f"{POOL_DATABASE_NAME}{RESERVED_NAME_SEPARATOR}"
+    if database_name.startswith(reserved_prefix):
+        return True, database_name[len(reserved_prefix) :]
+    return False, None
+
+
+class DatabasePool:
+    """
+    The pool of test databases in a region. `admin` and `client` are an
+    astrapy AstraDBAdmin and DataAPIClient (or stand-ins with the same
+    methods); `keyspace` is that of the test collections (None: the default
+    keyspace of the databases).
+    """
+
+    admin: Any
+    client: Any
+    token: str
+    region: str
+    keyspace: str | None
+    pool_size: int
+    cloud_provider: str
+
+    def __init__(
+        self,
+        admin: Any,
+        client: Any,
+        *,
+        token: str,
+        region: str,
+        keyspace: str | None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        cloud_provider: str = DEFAULT_CLOUD_PROVIDER,
+    ) -> None:
+        self.admin = admin
+        self.client = client
+        self.token = token
+        self.region = region
+        self.keyspace = keyspace
+        self.pool_size = pool_size
+        self.cloud_provider = cloud_provider
+
+    def databases(self) -> list[PoolDatabase]:
+        """The databases of the pool (in the region, not being terminated)."""
+        pool_databases: list[PoolDatabase] = []
+        for db_info in self.admin.list_databases():
+            is_pool_database, reserved_for = parse_pool_database_name(db_info.name)
+            if not is_pool_database:
+                continue
+            if db_info.status not in LIVE_STATUSES | DEAD_STATUSES:
+                continue
+            for region_info in db_info.regions:
+                if region_info.region_name == self.region:
+                    pool_databases.append(
+                        PoolDatabase(
+                            database_id=db_info.id,
+                            api_endpoint=region_info.api_endpoint,
+                            status=db_info.status,
+                            created_at=db_info.created_at,
+                            reserved_for=reserved_for,
+                        )
+                    )
+        # the oldest first: these are handed out before they age out
+        return sorted(pool_databases, key=lambda p_db: -p_db.age_hours())
+
+    def _find_database(self, api_endpoint: str) -> PoolDatabase | None:
+        for p_db in self.databases():
+            if p_db.api_endpoint == api_endpoint:
+                return p_db
+        return None
+
+    def _lease_collection(self, p_db: PoolDatabase) -> Any:
+        database = self.client.get_database(
+            p_db.api_endpoint, token=self.token, keyspace=self.keyspace
+        )
+        if LEASE_COLLECTION_NAME not in database.list_collection_names():
+            database.create_collection(LEASE_COLLECTION_NAME)
+        lease_collection = database.get_collection(LEASE_COLLECTION_NAME)
+        # unless there is one already, a free lease (or one taken by the run
+        # the database was created for)
+        initial_lease: dict[str, Any]
+        if p_db.reserved_for is None:
+            initial_lease = {"leased_by": None, "leased_at": None}
+        else:
+            initial_lease = {"leased_by": p_db.reserved_for, "leased_at": time.time()}
+        lease_collection.update_one(
+            {"_id": LEASE_DOCUMENT_ID},
+            {"$setOnInsert": initial_lease},
+            upsert=True,
+        )
+        return lease_collection
+
+    def read_lease(self, p_db: PoolDatabase) -> dict[str, Any]:
+        """The lease document of an active database of the pool."""
+        lease_collection = self._lease_collection(p_db)
+        return lease_collection.find_one({"_id": LEASE_DOCUMENT_ID}) or {}
+
+    def try_lease(self, p_db: PoolDatabase, run_tag: str) -> bool:
+        """
+        Lease an active database to a run, if free (or already leased to the
+        same run). Return whether the lease was obtained.
+        """
+        lease_collection = self._lease_collection(p_db)
+        leased = lease_collection.find_one_and_update(
+            {"_id": LEASE_DOCUMENT_ID, "leased_by": {"$in": [None, run_tag]}},
+            {"$set": {"leased_by": run_tag, "leased_at": time.time()}},
+        )
+        return leased is not None
+
+    def clear_collections(self, api_endpoint: str) -> list[str]:
+        """Drop the (test) collections of a database. Return their names."""
+        database = self.client.get_database(
+            api_endpoint, token=self.token, keyspace=self.keyspace
+        )
+        dropped_collections = [
+            c_name
+            for c_name in database.list_collection_names()
+            if c_name != LEASE_COLLECTION_NAME
+        ]
+        for c_name in dropped_collections:
+            database.drop_collection(c_name)
+        return dropped_collections
+
+    def _drop(self, p_db: PoolDatabase, reason: str) -> None:
+        _log(f"Dropping {p_db.database_id} ({reason}).")
+        self.admin.drop_database(id=p_db.database_id, wait_until_active=False)
+
+    def _create(self, reserved_for: str | None = None) -> str:
+        new_database_admin = self.admin.create_database(
+            (
+                POOL_DATABASE_NAME
+                if reserved_for is None
+                else reserved_database_name(reserved_for)
+            ),
+            cloud_provider=self.cloud_provider,
+            region=self.region,
+            keyspace=self.keyspace,
+            wait_until_active=False,
+        )
+        _log(f"Creating {new_database_admin.api_endpoint}.")
+        return new_database_admin.api_endpoint
+
+    def reap(self) -> int:
+        """
+        Drop the databases that are hibernated or failed, leased for longer
+        than LEASE_TIMEOUT_HOURS, or free and older than
+        MAX_DATABASE_AGE_HOURS. Return how many were dropped.
+        """
+        num_dropped = 0
+        for p_db in self.databases():
+            if p_db.status in DEAD_STATUSES:
+                self._drop(p_db, p_db.status.lower())
+                num_dropped += 1
+                continue
+            if p_db.status != ACTIVE_STATUS:
+                continue
+            lease = self.read_lease(p_db)
+            if lease.get("leased_by") is not None:
+                lease_hours = (time.time() - lease["leased_at"]) / 3600
+                if lease_hours > LEASE_TIMEOUT_HOURS:
+                    self._drop(
+                        p_db,
+                        f"stale lease by {lease['leased_by']} ({lease_hours:.0f} h)",
+                    )
+                    num_dropped += 1
+            elif p_db.age_hours() > MAX_DATABASE_AGE_HOURS:
+                self._drop(p_db, f"{p_db.age_hours():.0f} h old")
+                num_dropped += 1
+        return num_dropped
+
+    def spare_databases(self) -> list[PoolDatabase]:
+        """
+        The databases that are free or still being created (except those
+        created for a run).
+        """
+        spare_databases: list[PoolDatabase] = []
+        for p_db in self.databases():
+            if p_db.status == ACTIVE_STATUS:
+                if self.read_lease(p_db).get("leased_by") is None:
+                    spare_databases.append(p_db)
+            elif p_db.status in LIVE_STATUSES and p_db.reserved_for is None:
+                spare_databases.append(p_db)
+        return spare_databases
+
+    def top_up(self) -> int:
+        """Start creating databases up to `pool_size` spares. Return how many."""
+        num_missing = max(self.pool_size - len(self.spare_databases()), 0)
+        for _ in range(num_missing):
+            self._create()
+        return num_missing
+
+    def acquire(self, run_tag: str) -> tuple[str, bool]:
+        """
+        Lease a ready database to a run, dropping its test collections; if
+        none is free, start creating one reserved for the run (to lease with
+        `wait_and_lease`). Return the API endpoint and whether it is leased
+        and ready.
+        """
+        self.reap()
+        for p_db in self.databases():
+            if p_db.status != ACTIVE_STATUS:
+                continue
+            if self.try_lease(p_db, run_tag):
+                dropped_collections = self.clear_collections(p_db.api_endpoint)
+                _log(
+                    f"Leased {p_db.api_endpoint} to {run_tag} "
+                    f"({len(dropped_collections)} collections dropped)."
+                )
+                return p_db.api_endpoint, True
+        _log("No free database in the pool.")
+        return self._create(reserved_for=run_tag), False
+
+    def wait_and_lease(
+        self,
+        api_endpoint: str,
+        run_tag: str,
+        timeout_seconds: float = ACTIVE_TIMEOUT_SECONDS,
+    ) -> None:
+        """
+        Wait for a database of the pool to be active, then lease it to a run
+        (a no-op for a database already leased to the run).
+        """
+        t0 = time.perf_counter()
+        while True:
+            p_db = self._find_database(api_endpoint)
+            if p_db is None or p_db.status in DEAD_STATUSES:
+                raise RuntimeError(f"Database {api_endpoint} is not usable.")
+            if p_db.reserved_for not in (None, run_tag):
+                raise RuntimeError(
+                    f"Database {api_endpoint} is reserved for {p_db.reserved_for}."
+                )
+            if p_db.status == ACTIVE_STATUS:
+                break
+            if time.perf_counter() - t0 > timeout_seconds:
+                raise TimeoutError(
+                    f"Database {api_endpoint} not active after {timeout_seconds} s."
+                )
+            time.sleep(ACTIVE_POLL_SECONDS)
+        if not self.try_lease(p_db, run_tag):
+            raise RuntimeError(f"Database {api_endpoint} is leased by another run.")
+        self.clear_collections(api_endpoint)
+        _log(
+            f"Leased {api_endpoint} to {run_tag} "
+            f"(ready after {time.perf_counter() - t0:.0f} s)."
+        )
+
+    def release(self, api_endpoint: str, *, drop: bool = False) -> bool:
+        """
+        Give a database back to the pool, with its test collections dropped
+        (or drop it, if asked to or too old to be recycled). Return False if
+        it is not a database of the pool.
+        """
+        p_db = self._find_database(api_endpoint)
+        if p_db is None:
+            return False
+        if drop or p_db.status != ACTIVE_STATUS:
+            self._drop(p_db, "on release")
+        elif p_db.age_hours() > MAX_DATABASE_AGE_HOURS:
+            self._drop(p_db, f"{p_db.age_hours():.0f} h old")
+        else:
+            dropped_collections = self.clear_collections(api_endpoint)
+            self._lease_collection(p_db).update_one(
+                {"_id": LEASE_DOCUMENT_ID},
+                {"$set": {"leased_by": None, "leased_at": None}},
+            )
+            _log(
+                f"Released {api_endpoint} to the pool "
+                f"({len(dropped_collections)} collections dropped)."
+            )
+        return True
+
+    def status_lines(self) -> list[str]:
+        lines: list[str] = []
+        for p_db in self.databases():
+            lease_desc = ""
+            if p_db.status == ACTIVE_STATUS:
+                leased_by = self.read_lease(p_db).get("leased_by")
+                lease_desc = f", leased by {leased_by}" if leased_by else ", free"
+            elif p_db.reserved_for is not None:
+                lease_desc = f", reserved for {p_db.reserved_for}"
+            lines.append(
+                f"    * {p_db.api_endpoint} ({p_db.status}{lease_desc}, "
+                f"{p_db.age_hours():.0f} h old)"
+            )
+        return lines
+
+
+def make_database_pool(
+    environment: str,
+    region: str,
+    keyspace: str,
+    token: str,
+    pool_size: int = DEFAULT_POOL_SIZE,
+) -> DatabasePool:
+    """A pool on the actual admin API (through astrapy)."""
+    from astrapy import DataAPIClient
+
+    client = DataAPIClient(environment=environment)
+    return DatabasePool(
+        client.get_admin(token=token),
+        client,
+        token=token,
+        region=region,
+        keyspace=keyspace,
+        pool_size=pool_size,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the test database pool.")
+    parser.add_argument("environment", type=str)
+    parser.add_argument("region", type=str)
+    parser.add_argument("keyspace", type=str)
+    parser.add_argument("token", type=str)
+    parser.add_argument(
+        "command",
+        choices=["status", "top_up", "reap", "wait"],
+        help="Action on the pool",
+    )
+    parser.add_argument(
+        "--pool_size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help=f"Spare databases to keep (default: {DEFAULT_POOL_SIZE})",
+    )
+    parser.add_argument(
+        "--api_endpoint", type=str, default=None, help="Database to wait for"
+    )
+    parser.add_argument(
+        "--run_tag", type=str, default=None, help="Run to lease the database to"
+    )
+    args = parser.parse_args()
+
+    pool = make_database_pool(
+        args.environment, args.region, args.keyspace, args.token, args.pool_size
+    )
+    if args.command == "status":
+        pool_lines = pool.status_lines()
+        print(f"{len(pool_lines)} databases in the pool:")
+        for line in pool_lines:
+            print(line)
+    elif args.command == "top_up":
+        print(f"Creating {pool.top_up()} databases.")
+    elif args.command == "reap":
+        print(f"Dropped {pool.reap()} databases.")
+    elif args.command == "wait":
+        if args.api_endpoint is None or args.run_tag is None:
+            parser.error("'wait' requires --api_endpoint and --run_tag.")
+        pool.wait_and_lease(args.api_endpoint, args.run_tag)
+
+
+if __name__ == "__main__":
+    main()
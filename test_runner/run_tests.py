@@ -0,0 +1,479 @@
+"""
+Usage:
+    python3 run_tests.py [--matrix test_matrix.json] [--max_parallel_jobs N] [--dry_run]
+                         [--pack_runs] [--live_tail [--abort_p99_ms MS]
+                         [--abort_error_percent P]]
+
+Run all nb5 test jobs listed in a matrix file, independent workloads
+concurrently (each against its own collection), with a per-job timeout.
+
+For each job, the logs go to
+    <LOG_ROOT_DIR>/<RUN_TAG>_LOG_<workload>
+and the CSV metrics (along with metaparameters.log, written from the job
+settings) to
+    <LOG_ROOT_DIR>/<RUN_TAG>_CSV_<workload>
+as expected by the analytics.
+
+With --live_tail, each job step is followed while it runs by
+analytics/live_tail.py, from REPO_ROOT_DIR (progress summaries on the
+console; this needs numpy); with the
+--abort_* thresholds too, a job breaching them is stopped early ("ABORTED").
+A step is stopped as well when an ABORT file is put in its CSV directory.
+
+Sweep jobs (with a "sweep" entry: {"parameter": ..., "values": [...]}) run
+their scenario once per value, in order, each step having its own
+    <LOG_ROOT_DIR>/<RUN_TAG>_SWEEP_<workload>/step_<NN>_<parameter>_<value>
+directory for CSVs and metaparameters (and similarly under
+<RUN_TAG>_SWEEPLOG_<workload> for the logs).
+
+With --pack_runs, once all jobs are over (whatever their outcome), each
+<RUN_TAG>_CSV_<workload> directory is replaced by a
+<RUN_TAG>_CSV_<workload>.tar.gz archive, which the analytics read as is
+(sweep directories are left unpacked).
+
+Environmental settings (NB5_EXECUTABLE, DOTENV_PATH, LOG_ROOT_DIR,
+REPO_ROOT_DIR) are read from the environment as for the former run_tests.sh;
+the dotenv file provides the credentials, RUN_TAG and REPO_COMMIT_SHA.
+
+Only the standard library is used (this runs on a bare EC2 instance).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+DEFAULT_MATRIX_PATH = os.path.join(os.path.dirname(__file__), "test_matrix.json")
+TESTS_FINISHED_FILENAME = "TESTS_FINISHED"
+METAPARAMETERS_FILENAME = "metaparameters.log"
+HISTOGRAM_LOG_FILENAME = "histograms.hlog"
+CONSOLE_LOG_FILENAME = "nb5_console.log"
+RUN_ARCHIVE_SUFFIX = ".tar.gz"
+# gzip level for packed runs: most of the size gain, at a fraction of the CPU
+RUN_ARCHIVE_COMPRESSLEVEL = 6
+SWEEPABLE_PARAMETERS = {"cyclerate", "main_threads"}
+REPORT_INTERVAL_SECONDS = 60
+# time granted to nb5 to shut down cleanly after a timeout, before killing it
+TERMINATION_GRACE_SECONDS = 30
+# a job step is stopped when this file appears in its CSV directory
+ABORT_FILENAME = "ABORT"
+ABORT_CHECK_SECONDS = 5
+LIVE_TAIL_SCRIPT_PATH = os.path.join("analytics", "live_tail.py")
+REQUIRED_JOB_KEYS = {
+    "workload",
+    "scenario",
+    "collection",
+    "cyclerate",
+    "rampup_cycles",
+    "rampup_threads",
+    "main_cycles",
+    "main_threads",
+    "timeout_seconds",
+}
+# job settings -> nb5 template parameters
+NB5_JOB_PARAMETERS = {
+    "collection": "collection",
+    "cyclerate": "cyclerate",
+    "rampup_cycles": "rampup-cycles",
+    "rampup_threads": "rampup-threads",
+    "main_cycles": "main-cycles",
+    "main_threads": "main-threads",
+}
+
+
+# step settings, log dir, csv dir, extra metaparameters
+JobStepType = tuple[dict[str, Any], str, str, dict[str, str]]
+
+
+class TestJob:
+    settings: dict[str, Any]
+    sweep_parameter: str | None
+    sweep_values: list[Any]
+
+    def __init__(self, settings: dict[str, Any]) -> None:
+        missing_keys = REQUIRED_JOB_KEYS - set(settings)
+        if missing_keys:
+            missing_list = ", ".join(sorted(missing_keys))
+            raise ValueError(f"Job {settings} is missing settings: {missing_list}.")
+        self.settings = {s_key: s_val for s_key, s_val in settings.items()}
+        sweep = self.settings.pop("sweep", None)
+        if sweep is not None:
+            if sweep["parameter"] not in SWEEPABLE_PARAMETERS:
+                raise ValueError(
+                    f"Cannot sweep on '{sweep['parameter']}' (allowed: "
+                    f"{', '.join(sorted(SWEEPABLE_PARAMETERS))})."
+                )
+            if not sweep["values"]:
+                raise ValueError(f"Empty sweep for job {self}.")
+            self.sweep_parameter = sweep["parameter"]
+            self.sweep_values = list(sweep["values"])
+        else:
+            self.sweep_parameter = None
+            self.sweep_values = []
+
+    def __repr__(self) -> str:
+        _sweep_desc = ""
+        if self.sweep_parameter:
+            _sweep_desc = f", sweep on {self.sweep_parameter}"
+        return f"TestJob({self.workload}/{self.scenario}{_sweep_desc})"
+
+    @property
+    def workload(self) -> str:
+        return self.settings["workload"]
+
+    @property
+    def scenario(self) -> str:
+        return self.settings["scenario"]
+
+    @property
+    def output_kind(self) -> str:
+        return "SWEEP" if self.sweep_parameter else "CSV"
+
+    def steps(self, log_root_dir: str, run_tag: str) -> list[JobStepType]:
+        """The nb5 executions for this job: one, or one per sweep value."""
+        if self.sweep_parameter is None:
+            return [
+                (
+                    self.settings,
+                    os.path.join(log_root_dir, f"{run_tag}_LOG_{self.workload}"),
+                    os.path.join(log_root_dir, f"{run_tag}_CSV_{self.workload}"),
+                    {},
+                )
+            ]
+        sweep_log_dir = os.path.join(
+            log_root_dir, f"{run_tag}_SWEEPLOG_{self.workload}"
+        )
+        sweep_csv_dir = os.path.join(log_root_dir, f"{run_tag}_SWEEP_{self.workload}")
+        job_steps: list[JobStepType] = []
+        for step_i, sweep_value in enumerate(self.sweep_values):
+            step_name = f"step_{step_i:02d}_{self.sweep_parameter}_{sweep_value}"
+            job_steps.append(
+                (
+                    {**self.settings, self.sweep_parameter: sweep_value},
+                    os.path.join(sweep_log_dir, step_name),
+                    os.path.join(sweep_csv_dir, step_name),
+                    {
+                        "SWEEP_PARAMETER": self.sweep_parameter.upper(),
+                        "SWEEP_STEP": str(step_i),
+                        "SWEEP_VALUE": str(sweep_value),
+                    },
+                )
+            )
+        return job_steps
+
+    def metaparameters(
+        self, step_settings: dict[str, Any], env: dict[str, str]
+    ) -> dict[str, str]:
+        """
+        All (step) settings (upper-cased), plus the run-wide ones,
+        as written to metaparameters.log.
+        """
+        return {
+            **{
+                s_key.upper(): str(s_value)
+                for s_key, s_value in sorted(step_settings.items())
+            },
+            "REPO_COMMIT_SHA": env.get("REPO_COMMIT_SHA", ""),
+            "TARGET_API_ENDPOINT": env.get("ASTRA_DB_API_ENDPOINT", ""),
+        }
+
+    def nb5_command(
+        self,
+        step_settings: dict[str, Any],
+        log_dir: str,
+        csv_dir: str,
+        nb5_executable: str,
+        repo_root_dir: str,
+        env: dict[str, str],
+    ) -> list[str]:
+        return [
+            nb5_executable,
+            os.path.join(repo_root_dir, f"{self.workload}.yaml"),
+            self.scenario,
+            f"astraToken={env['ASTRA_DB_APPLICATION_TOKEN']}",
+            f"astraApiEndpoint={env['ASTRA_DB_API_ENDPOINT']}",
+            f"namespace={env['ASTRA_DB_KEYSPACE']}",
+            *(
+                f"{nb5_param}={step_settings[s_key]}"
+                for s_key, nb5_param in NB5_JOB_PARAMETERS.items()
+            ),
+            "--progress",
+            "console:5s",
+            "--logs-dir",
+            log_dir,
+            "--report-csv-to",
+            csv_dir,
+            "--log-histograms",
+            f"{os.path.join(csv_dir, HISTOGRAM_LOG_FILENAME)}:.*:60s",
+            "--report-interval",
+            str(REPORT_INTERVAL_SECONDS),
+        ]
+
+
+def load_dotenv(dotenv_path: str) -> dict[str, str]:
+    """Parse the simple (export) KEY="value" lines of a dotenv file."""
+    dotenv: dict[str, str] = {}
+    with open(dotenv_path) as d_file:
+        for _line in d_file:
+            line = _line.strip()
+            if not line or line[0] == "#" or "=" not in line:
+                continue
+            d_key, d_value = line.removeprefix("export ").split("=", 1)
+            dotenv[d_key.strip()] = d_value.strip().strip('"').strip("'")
+    return dotenv
+
+
+def load_test_matrix(matrix_path: str) -> tuple[list[TestJob], int]:
+    """
+    Read the matrix file and return the jobs (each with the defaults applied)
+    and the maximum number of concurrent jobs.
+    """
+    with open(matrix_path) as m_file:
+        matrix = json.load(m_file)
+    defaults = matrix.get("defaults", {})
+    jobs = [TestJob({**defaults, **job_settings}) for job_settings in matrix["jobs"]]
+    job_outputs = [(job.output_kind, job.workload) for job in jobs]
+    if len(set(job_outputs)) != len(job_outputs):
+        # each job writes to its <RUN_TAG>_CSV_<workload> (or SWEEP) directory
+        raise ValueError(
+            "A workload cannot appear more than once in the matrix "
+            "(once as a sweep and once as a regular job at most)."
+        )
+    collections = [job.settings["collection"] for job in jobs]
+    if len(set(collections)) != len(collections):
+        raise ValueError("Concurrent jobs must run against distinct collections.")
+    return jobs, matrix.get("max_parallel_jobs", 1)
+
+
+def _stop_process(process: subprocess.Popen) -> None:
+    """Terminate a process, and kill it if it does not exit in time."""
+    process.terminate()
+    try:
+        process.wait(timeout=TERMINATION_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_job(
+    job: TestJob,
+    step_commands: list[tuple[list[str], str, str]],
+    env: dict[str, str],
+    tail_command: list[str] | None = None,
+) -> tuple[str, float]:
+    """
+    Run the steps of a job in order, each to completion (or timeout), in `env`
+    (the environment with the dotenv settings) and with the console output in
+    its log directory; a failed step ends the job. A step is also stopped as
+    soon as an ABORT file appears in its CSV directory (written by the live
+    tail, started along each step with `tail_command`, or by hand).
+    Return the outcome ("OK", "FAILED (<code>)", "TIMEOUT" or "ABORTED", with
+    the step for sweeps) and the elapsed time (seconds).
+    """
+    t0 = time.perf_counter()
+    timeout_seconds = float(job.settings["timeout_seconds"])
+    for step_i, (command, log_dir, csv_dir) in enumerate(step_commands):
+        _step_desc = f" step {step_i}" if job.sweep_parameter else ""
+        print(
+            f"STARTING WORKLOAD {job.workload}{_step_desc} "
+            f"(timeout: {timeout_seconds:g} s)"
+        )
+        abort_path = os.path.join(csv_dir, ABORT_FILENAME)
+        step_t0 = time.perf_counter()
+        return_code: int | None = None
+        stop_reason: str | None = None
+        with open(os.path.join(log_dir, CONSOLE_LOG_FILENAME), "w") as c_file:
+            process = subprocess.Popen(
+                command, stdout=c_file, stderr=subprocess.STDOUT, env=env
+            )
+            tail_process = None
+            if tail_command is not None:
+                tail_process = subprocess.Popen([*tail_command, "--csv_dir", csv_dir])
+            try:
+                while return_code is None:
+                    try:
+                        return_code = process.wait(timeout=ABORT_CHECK_SECONDS)
+                    except subprocess.TimeoutExpired:
+                        if os.path.exists(abort_path):
+                            stop_reason = "ABORTED"
+                        elif time.perf_counter() - step_t0 > timeout_seconds:
+                            stop_reason = "TIMEOUT"
+                        if stop_reason is not None:
+                            _stop_process(process)
+                            break
+            finally:
+                if tail_process is not None:
+                    _stop_process(tail_process)
+        if stop_reason is not None:
+            return f"{stop_reason}{_step_desc}", time.perf_counter() - t0
+        if return_code != 0:
+            return f"FAILED ({return_code}){_step_desc}", time.perf_counter() - t0
+    return "OK", time.perf_counter() - t0
+
+
+def pack_run_dir(run_dir: str) -> str:
+    """
+    Replace a run directory by a gzipped tarball of it (holding the directory
+    itself, as in `tar -czf <dir>.tar.gz <dir>`). Return the archive path.
+    """
+    archive_path = f"{run_dir.rstrip(os.sep)}{RUN_ARCHIVE_SUFFIX}"
+    with tarfile.open(
+        archive_path, "w:gz", compresslevel=RUN_ARCHIVE_COMPRESSLEVEL
+    ) as tar_file:
+        tar_file.add(run_dir, arcname=os.path.basename(run_dir.rstrip(os.sep)))
+    shutil.rmtree(run_dir)
+    return archive_path
+
+
+def _redact_command(command: list[str]) -> list[str]:
+    return [
+        "astraToken=***" if c_part.startswith("astraToken=") else c_part
+        for c_part in command
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the nb5 test matrix.")
+    parser.add_argument(
+        "--matrix",
+        type=str,
+        default=DEFAULT_MATRIX_PATH,
+        help=f"Path to the test matrix file (default: '{DEFAULT_MATRIX_PATH}')",
+    )
+    parser.add_argument(
+        "--max_parallel_jobs",
+        type=int,
+        default=None,
+        help="Max concurrent jobs (default: as set in the matrix file, else 1)",
+    )
+    parser.add_argument(
+        "--dry_run",
+        action="store_true",
+        help="Only print the commands that would be run",
+    )
+    parser.add_argument(
+        "--pack_runs",
+        action="store_true",
+        help="Pack each CSV run directory into a .tar.gz once the jobs are over",
+    )
+    parser.add_argument(
+        "--live_tail",
+        action="store_true",
+        help="Follow the metrics of each job as written (analytics/live_tail.py)",
+    )
+    parser.add_argument(
+        "--abort_p99_ms",
+        type=float,
+        default=None,
+        help="With --live_tail: abort a job on a P99 latency (ms) above this",
+    )
+    parser.add_argument(
+        "--abort_error_percent",
+        type=float,
+        default=None,
+        help="With --live_tail: abort a job on a percentage of errors above this",
+    )
+    args = parser.parse_args()
+    if not args.live_tail and (
+        args.abort_p99_ms is not None or args.abort_error_percent is not None
+    ):
+        parser.error("--abort_p99_ms and --abort_error_percent require --live_tail.")
+
+    nb5_executable = os.environ.get("NB5_EXECUTABLE", "./nb5")
+    dotenv_path = os.environ.get("DOTENV_PATH", ".env")
+    log_root_dir = os.environ.get("LOG_ROOT_DIR", "logs")
+    repo_root_dir = os.environ.get("REPO_ROOT_DIR", "data-api-nb-test")
+
+    env = {**os.environ, **load_dotenv(dotenv_path)}
+    run_tag = env["RUN_TAG"]
+    jobs, matrix_parallel_jobs = load_test_matrix(args.matrix)
+    max_parallel_jobs = args.max_parallel_jobs or matrix_parallel_jobs
+
+    if os.path.exists(TESTS_FINISHED_FILENAME):
+        os.remove(TESTS_FINISHED_FILENAME)
+
+    print("Environmental settings:")
+    print(f"NB5_EXECUTABLE={nb5_executable}")
+    print(f"DOTENV_PATH={dotenv_path}")
+    print(f"LOG_ROOT_DIR={log_root_dir}")
+    print(f"REPO_ROOT_DIR={repo_root_dir}")
+    print(f"RUN_TAG={run_tag}")
+    print(f"{len(jobs)} jobs, up to {max_parallel_jobs} at a time.")
+
+    job_commands: list[tuple[TestJob, list[tuple[list[str], str, str]]]] = []
+    for job in jobs:
+        step_commands: list[tuple[list[str], str, str]] = []
+        for step_settings, log_dir, csv_dir, extra_mps in job.steps(
+            log_root_dir, run_tag
+        ):
+            command = job.nb5_command(
+                step_settings, log_dir, csv_dir, nb5_executable, repo_root_dir, env
+            )
+            if args.dry_run:
+                print(f"\n[{job.workload}] {' '.join(_redact_command(command))}")
+                continue
+            os.makedirs(log_dir, exist_ok=True)
+            os.makedirs(csv_dir, exist_ok=True)
+            metaparameters = {
+                **job.metaparameters(step_settings, env),
+                # concurrent jobs share the target: a configuration change
+                "MAX_PARALLEL_JOBS": str(max_parallel_jobs),
+                **extra_mps,
+            }
+            with open(os.path.join(csv_dir, METAPARAMETERS_FILENAME), "w") as m_file:
+                m_file.write("# Meta-parameters for this run\n")
+                m_file.writelines(
+                    f"{mp_key}={mp_value}\n"
+                    for mp_key, mp_value in metaparameters.items()
+                )
+            step_commands.append((command, log_dir, csv_dir))
+        job_commands.append((job, step_commands))
+    if args.dry_run:
+        return
+
+    tail_command: list[str] | None = None
+    if args.live_tail:
+        tail_script_path = os.path.join(repo_root_dir, LIVE_TAIL_SCRIPT_PATH)
+        tail_command = [sys.executable, tail_script_path]
+        if args.abort_p99_ms is not None:
+            tail_command += ["--max_p99_ms", str(args.abort_p99_ms)]
+        if args.abort_error_percent is not None:
+            tail_command += ["--max_error_percent", str(args.abort_error_percent)]
+
+    with ThreadPoolExecutor(max_workers=max_parallel_jobs) as executor:
+        job_futures = [
+            (job, executor.submit(run_job, job, step_commands, env, tail_command))
+            for job, step_commands in job_commands
+        ]
+        outcomes = [(job, future.result()) for job, future in job_futures]
+
+    if args.pack_runs:
+        for job, _ in job_commands:
+            if job.sweep_parameter is not None:
+                continue
+            for _, _, csv_dir, _ in job.steps(log_root_dir, run_tag):
+                if os.path.isdir(csv_dir):
+                    archive_path = pack_run_dir(csv_dir)
+                    archive_mb = os.path.getsize(archive_path) / (1024 * 1024)
+                    print(
+                        f"Packed {csv_dir} into {archive_path} ({archive_mb:.1f} MB)."
+                    )
+
+    print("\nSummary:")
+    for job, (outcome, elapsed) in outcomes:
+        print(f"    * {job.workload:<30} {outcome:<12} ({elapsed:.0f} s)")
+    if any(outcome != "OK" for _, (outcome, _) in outcomes):
+        print("** Some jobs did not complete successfully.")
+        sys.exit(1)
+
+    open(TESTS_FINISHED_FILENAME, "w").close()
+
+
+if __name__ == "__main__":
+    main()